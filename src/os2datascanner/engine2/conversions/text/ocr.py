@@ -5,12 +5,15 @@
 
 import os
 import sys
+from hashlib import blake2b
+from typing import Optional
 import structlog
 from subprocess import PIPE, DEVNULL, CalledProcessError, TimeoutExpired
 from tempfile import TemporaryDirectory
 from ... import settings as engine2_settings
 from ....utils.system_utilities import run_custom
 from ..abort import current_abort_check
+from ..utilities.ocr_server import get_ocr_server
 from ..types import OutputType
 from ..registry import conversion
 
@@ -21,20 +24,75 @@ logger = structlog.get_logger("engine2")
 _OCR_CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
                         "utilities", "_ocr_cli.py")
 
+OCR_TYPES = (
+    "image/png", "image/jpeg", "image/gif", "image/x-ms-bmp",
+    "image/bmp", "image/x-bmp",)
+"""The MIME types of the images that image_processor recognises text in."""
+
+_recognised: dict[bytes, Optional[str]] = {}
+"""The text of images that have already been recognised by recognise_ahead,
+keyed by a digest of their content."""
+
+
+def _digest(image_bytes: bytes) -> bytes:
+    return blake2b(image_bytes, digest_size=16).digest()
+
+
+def recognise_ahead(images: list[bytes], *, should_abort=None):
+    """Recognises the text in several images in a single batch, so that the
+    OCR server can handle them all with the same OCR engine. When
+    tesseract_pymupdf is later asked about one of these images, it returns its
+    text without asking the OCR server again.
+
+    (Callers should call forget_recognised once they're done with the
+    images.)"""
+    if not engine2_settings.tesseract["server"]:
+        return
+    wanted = [i for i in dict.fromkeys(images) if _digest(i) not in _recognised]
+    if len(wanted) < 2:
+        # A batch of one image is no better than recognising it on demand
+        return
+
+    logger.info("Running tesseract with pymupdf (in the OCR server, in a batch)",
+                images=len(wanted))
+    texts = get_ocr_server().recognise_many(wanted, should_abort=should_abort)
+    if should_abort and should_abort():
+        # (The results of a cancelled batch are meaningless)
+        return
+    for image, text in zip(wanted, texts):
+        _recognised[_digest(image)] = text
+
+
+def forget_recognised():
+    """Forgets the text of all images recognised by recognise_ahead."""
+    _recognised.clear()
+
 
 def tesseract_pymupdf(image_bytes, filetype=None):
     """Performs OCR on in-memory image bytes via a subprocess pymupdf
     worker.
 
     The actual Tesseract/MuPDF work happens in a subprocess so that f.e. a
-    segfault in either library cannot kill the engine2 worker.
+    segfault in either library cannot kill the engine2 worker. By default,
+    this is a long-lived OCRServer; otherwise, a new subprocess is started for
+    each image.
 
-    Timeout and process-group cleanup are enforced by run_custom().
+    Timeout and process-group cleanup are enforced by OCRServer or by
+    run_custom().
     """
     should_abort = current_abort_check.get()
     if should_abort and should_abort():
         return None
 
+    if engine2_settings.tesseract["server"]:
+        if (digest := _digest(image_bytes)) in _recognised:
+            return _recognised.pop(digest)
+        logger.info("Running tesseract with pymupdf (in the OCR server)")
+        text = get_ocr_server().recognise(image_bytes, should_abort=should_abort)
+        if text is None:
+            logger.debug("OCR server produced no text", filetype=filetype)
+        return text
+
     logger.info("Running tesseract with pymupdf (in a subprocess)")
     with TemporaryDirectory() as tmpdir:
         in_path = os.path.join(tmpdir, "in.bin")
@@ -95,9 +153,7 @@ def tesseract_cli(path, dest="stdout", *args):
         return None
 
 
-@conversion(OutputType.Text,
-            "image/png", "image/jpeg", "image/gif", "image/x-ms-bmp",
-            "image/bmp", "image/x-bmp")
+@conversion(OutputType.Text, *OCR_TYPES)
 def image_processor(r):
     """
     Uses pymupdf's tesseract bindings to extract text from common image types using in-memory OCR.
@@ -5,10 +5,17 @@
 
 from ..types import OutputType
 from ..registry import conversion
+from ..utilities.windows import (
+        STREAMABLE_TYPES, WindowedText, exceeds_stream_threshold)
 
 
-@conversion(OutputType.Text, "text/plain", "text/csv", "application/csv",)
+@conversion(OutputType.Text, *STREAMABLE_TYPES)
 def plain_text_processor(r, **kwargs):
+    # Very large texts are matched one window at a time instead of being read
+    # into memory all at once
+    if exceeds_stream_threshold(r):
+        return WindowedText(r.handle, opener=r.make_stream)
+
     with r.make_stream() as t:
         try:
             return t.read().decode()
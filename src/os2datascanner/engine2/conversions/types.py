@@ -12,6 +12,7 @@ from dataclasses import dataclass, field
 from os2datascanner.engine2.model.core.handle import Handle
 from os2datascanner.engine2.utilities.datetime import (
         parse_datetime, unparse_datetime)
+from .utilities.windows import WindowedText
 
 
 @dataclass
@@ -82,6 +83,18 @@ def decode_db_row(row):
     return {key: _decode_element(value) for key, value in row.items()}
 
 
+def dump_text(v):
+    if isinstance(v, WindowedText):
+        return v.to_json_object()
+    return str(v)
+
+
+def load_text(v):
+    if isinstance(v, dict):
+        return WindowedText.from_json_object(v, Handle.from_json_object)
+    return str(v)
+
+
 def wrap_none(fn):
     """Decorator. Returns a wrapped version of the given single-argument
     function that unconditionally returns None when its argument is None."""
@@ -97,8 +110,8 @@ class OutputType(Enum):
     """Conversion functions return a typed result, and the type is a member of
     the OutputType enumeration. The values associated with these members are
     simple string identifiers that can be used in serialisation formats."""
-    Text = (  # str
-            "text", str, str)
+    Text = (  # str | WindowedText
+            "text", dump_text, load_text)
     LastModified = (  # datetime.datetime
             "last-modified", unparse_datetime, parse_datetime)
     ImageDimensions = (
@@ -8,16 +8,33 @@ Loads an image file from IN_PATH, runs pymupdf's Tesseract bindings on it,
 and writes the resulting OCR text (UTF-8) to OUT_PATH. Should be invoked via
 run_custom() so that any errors thrown by pymupdf or Tesseract won't kill the entire worker.
 (Like a SIGSEGV or alike)
+
+When invoked with the single argument --serve, instead runs as a long-lived
+OCR server (see OCRServer): it reads batches of images from standard input and
+writes their text to standard output until standard input is closed. Each
+batch is framed by a four-byte big-endian image count, and each image in it by
+a four-byte big-endian length; there is one response for every image, in the
+same order, each framed by a status byte (0 for success) and a four-byte
+big-endian length.
+
+All of the images in a batch are recognised by the same Tesseract instance, so
+its language models are only loaded once per batch.
 """
 
+import os
+import struct
 import sys
+from functools import cache
 
 import pymupdf
+from pymupdf import mupdf
 
 
-def main(in_path: str, out_path: str) -> None:
-    pix = pymupdf.Pixmap(in_path)
+LANGUAGE = "dan+eng"
+
 
+def prepare(pix: pymupdf.Pixmap) -> pymupdf.Pixmap:
+    """Returns a version of a Pixmap that Tesseract can safely recognise."""
     # Tesseract (apparently especially ran multi-language) can segfault on large images.
     # pix.shrink(1) halves each dimension, so loop until both fit:
     # one halving still leaves an 8000px image over the limit.
@@ -30,14 +47,117 @@ def main(in_path: str, out_path: str) -> None:
     # Tesseract also can't handle an alpha channel - remove if needed.
     if pix.alpha:
         pix = pymupdf.Pixmap(pix, 0)
+    return pix
 
+
+def ocr(pix: pymupdf.Pixmap) -> bytes:
     # Create a 1-page PDF in memory with an OCR text layer
-    ocr_pdf_bytes = pix.pdfocr_tobytes(language="dan+eng")
+    ocr_pdf_bytes = prepare(pix).pdfocr_tobytes(language=LANGUAGE)
 
     with pymupdf.open("pdf", ocr_pdf_bytes) as ocr_doc:
-        with open(out_path, "wb") as f:
-            f.write(ocr_doc[0].get_text().encode("utf-8"))
+        return ocr_doc[0].get_text().encode("utf-8")
+
+
+@cache
+def _tessdata() -> str:
+    # (Finding Tesseract's data directory might mean running Tesseract, so
+    # only do it once)
+    return pymupdf.get_tessdata()
+
+
+def ocr_many(pixmaps: list[pymupdf.Pixmap]) -> list[bytes]:
+    """Recognises the text in several Pixmaps with a single Tesseract
+    instance. (Pixmap.pdfocr_tobytes starts a new one every time it's called,
+    but a pdfocr band writer keeps the same one for every page it writes.)"""
+    options = mupdf.FzPdfocrOptions()
+    options.compress = 1
+    options.language_set2(LANGUAGE)
+    options.datadir_set2(_tessdata())
+
+    buffer = mupdf.FzBuffer(0)
+    output = mupdf.FzOutput(buffer)
+    writer = mupdf.FzBandWriter(output, options)
+    for page, pix in enumerate(prepare(p).this for p in pixmaps):
+        writer.fz_write_header(
+                pix.w(), pix.h(), pix.n(), pix.alpha(), pix.xres(), pix.yres(),
+                page, pix.colorspace(), pix.seps())
+        writer.fz_write_band(pix.stride(), pix.h(), pix.samples())
+    writer.fz_close_band_writer()
+    output.fz_close_output()
+
+    with pymupdf.open("pdf", pymupdf.JM_BinFromBuffer(buffer)) as ocr_doc:
+        return [page.get_text().encode("utf-8") for page in ocr_doc]
+
+
+def main(in_path: str, out_path: str) -> None:
+    text = ocr(pymupdf.Pixmap(in_path))
+    with open(out_path, "wb") as f:
+        f.write(text)
+
+
+def _read_exactly(fp, n: int) -> bytes | None:
+    data = fp.read(n)
+    return data if len(data) == n else None
+
+
+def serve() -> None:
+    # Keep the real standard output for responses, and send anything that
+    # pymupdf or Tesseract might print there to standard error instead
+    out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    pymupdf.TOOLS.mupdf_display_errors(False)
+
+    inp = sys.stdin.buffer
+    while (batch := _read_batch(inp)) is not None:
+        for status, text in _recognise_batch(batch):
+            out.write(struct.pack(">BI", status, len(text)) + text)
+        out.flush()
+
+
+def _read_batch(fp) -> list[bytes] | None:
+    if (header := _read_exactly(fp, 4)) is None:
+        return None
+    batch = []
+    for _ in range(struct.unpack(">I", header)[0]):
+        if (length := _read_exactly(fp, 4)) is None:
+            return None
+        if (image := _read_exactly(fp, struct.unpack(">I", length)[0])) is None:
+            return None
+        batch.append(image)
+    return batch
+
+
+def _recognise_batch(batch: list[bytes]) -> list[tuple[int, bytes]]:
+    """Returns a (status, text) pair for every image in a batch."""
+    results = [(1, b"")] * len(batch)
+    pixmaps = {}
+    for i, image in enumerate(batch):
+        try:
+            pixmaps[i] = pymupdf.Pixmap(image)
+        except Exception:
+            pass
+
+    if not pixmaps:
+        return results
+
+    try:
+        texts = ocr_many(list(pixmaps.values()))
+    except Exception:
+        # Don't let one image that Tesseract doesn't like spoil the others
+        texts = None
+    for n, (i, pix) in enumerate(pixmaps.items()):
+        if texts is not None:
+            results[i] = (0, texts[n])
+            continue
+        try:
+            results[i] = (0, ocr(pix))
+        except Exception:
+            pass
+    return results
 
 
 if __name__ == "__main__":
-    main(sys.argv[1], sys.argv[2])
+    if sys.argv[1:] == ["--serve"]:
+        serve()
+    else:
+        main(sys.argv[1], sys.argv[2])
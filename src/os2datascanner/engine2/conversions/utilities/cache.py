@@ -3,13 +3,17 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, you can
 # obtain one at http://mozilla.org/MPL/2.0/.
 
+import os
 import gzip
 import json
-from typing import Optional
+import hashlib
+from typing import Iterable, Optional
 import structlog
 from pathlib import Path
 from datetime import datetime
-from functools import cached_property
+from contextlib import nullcontext
+from functools import cache, cached_property
+from nacl.secret import SecretBox
 
 import os2datascanner.engine2.settings as settings
 from ...model.core import Resource
@@ -17,6 +21,8 @@ from ...utilities.datetime import make_datetime_aware
 from ...utilities.cryptography import make_secret_box
 from ..types import OutputType
 from ..registry import convert
+from .navigable import make_navigable
+from .windows import STREAMABLE_TYPES, WindowedText, exceeds_stream_threshold
 
 
 logger = structlog.get_logger("engine2")
@@ -149,6 +155,211 @@ class CacheManager:
         return self.Representation(self, output_type)
 
 
+class ContentCache:
+    """A ContentCache maintains a size-bounded disk cache of representations
+    keyed by the content of the Resource they were made from, so that the same
+    attachment found in three thousand emails is only converted once.
+
+    Cached representations are stored in files named for a hash of the
+    Resource's content identifier, its type and the OutputType, and are
+    encrypted with a key derived from the content identifier. As with
+    CacheManager, you can only decrypt a cached representation if you already
+    have the content it was made from.
+
+    When the cache grows beyond its maximum size, the least recently used
+    representations are removed."""
+
+    def __init__(
+            self, directory: Path | str, *,
+            max_size: int, min_size: int = 0,
+            output_types: Iterable[OutputType] = (OutputType.Text,)):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_size = max_size
+        self._min_size = min_size
+        self._output_types = frozenset(output_types)
+        self._size = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _identifiable(self, resource: Resource) -> bool:
+        if (type(resource).compute_content_identifier
+                is Resource.compute_content_identifier):
+            # This Resource can't identify its content, and would complain
+            # about being asked to
+            return False
+        elif not self._min_size:
+            return True
+        elif not hasattr(resource, "get_size"):
+            return False
+
+        # Avoid asking the server for the size of the object if it's already
+        # known
+        size = (getattr(resource, "get_observed_size", lambda: None)()
+                or resource.handle.hint("size"))
+        if size is None:
+            size = resource.get_size()
+        return int(size or 0) >= self._min_size
+
+    @staticmethod
+    def _box(identifier: str) -> SecretBox:
+        # Content identifiers are already hashes (or otherwise unguessable),
+        # so, unlike make_secret_box, this doesn't need to stretch them
+        if not settings.secret_value:
+            raise ValueError(
+                    "settings.secret_value is missing; can't derive a key")
+        return SecretBox(hashlib.blake2b(
+                identifier.encode(), digest_size=SecretBox.KEY_SIZE,
+                key=settings.secret_value.encode()[:64]).digest())
+
+    def _path(self, identifier: str, mime_type: str, output_type: OutputType) -> Path:
+        name = hashlib.blake2b(
+                f"{identifier}\0{mime_type}\0{output_type.value}".encode(),
+                digest_size=32).hexdigest()
+        return self._directory / name
+
+    def convert(
+            self, resource: Resource, output_type: OutputType,
+            mime_override: str = None):
+        """As the convert function, but returns a cached representation if an
+        object with the same content has already been converted to the given
+        OutputType."""
+        if output_type not in self._output_types:
+            return convert(resource, output_type, mime_override)
+
+        mime_type = mime_override or resource.compute_type()
+        if (output_type == OutputType.Text
+                and mime_type in STREAMABLE_TYPES
+                and exceeds_stream_threshold(resource)):
+            # This text will be streamed, so there'll be nothing to store;
+            # don't read the whole object just to compute its identifier
+            return convert(resource, output_type, mime_override)
+        elif not self._identifiable(resource):
+            return convert(resource, output_type, mime_override)
+
+        # Identifying a FileResource means reading all of it; keep what's
+        # read, so that converting it on a miss doesn't read it all again
+        with getattr(resource, "kept_content", nullcontext)():
+            identifier = resource.compute_content_identifier()
+            if not identifier:
+                return convert(resource, output_type, mime_override)
+
+            path = self._path(identifier, mime_type, output_type)
+            box = self._box(identifier)
+            if (cached := self._load(path, box)) is not None:
+                raw_json, = cached
+                self.hits += 1
+                logger.debug(
+                        "content cache hit", handle=resource.handle,
+                        output_type=output_type.value,
+                        hits=self.hits, misses=self.misses)
+                representation = output_type.decode_json_object(raw_json)
+                return (make_navigable(representation)
+                        if representation is not None else None)
+
+            self.misses += 1
+            representation = convert(resource, output_type, mime_override)
+        if not isinstance(representation, WindowedText):
+            self._store(path, box, output_type.encode_json_object(representation))
+        return representation
+
+    @staticmethod
+    def _load(path: Path, box: SecretBox) -> Optional[tuple]:
+        """Returns a 1-tuple containing the JSON form of the representation
+        stored at the given path, or None if there isn't a usable one there.
+        (The JSON form of a representation can itself be None.)"""
+        try:
+            with path.open("rb") as fp:
+                raw_json = json.loads(
+                        gzip.decompress(box.decrypt(fp.read())).decode())
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning(
+                    "discarding unreadable content cache entry",
+                    path=str(path), exc_info=True)
+            path.unlink(missing_ok=True)
+            return None
+        # Mark this representation as recently used
+        os.utime(path)
+        return (raw_json,)
+
+    def _store(self, path: Path, box: SecretBox, json_form):
+        data = box.encrypt(gzip.compress(json.dumps(json_form).encode()))
+        # (Work out the size of the cache before the new entry appears in it)
+        size = self.size
+
+        # Write to a temporary file first, so that other processes sharing
+        # this cache never see a partial entry
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        with temporary.open("wb") as fp:
+            fp.write(data)
+        os.replace(temporary, path)
+
+        self._size = size + len(data)
+        if self._size > self._max_size:
+            self._evict()
+
+    @property
+    def size(self) -> int:
+        """Returns the (approximate) total size of this cache in bytes."""
+        if self._size is None:
+            self._size = sum(e.stat().st_size for e in self._entries())
+        return self._size
+
+    def _entries(self) -> Iterable[os.DirEntry]:
+        with os.scandir(self._directory) as it:
+            return [e for e in it if e.is_file() and "." not in e.name]
+
+    def _evict(self):
+        """Removes the least recently used representations from this cache
+        until it fits within its maximum size."""
+        entries = []
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                # Another process has already evicted this entry
+                continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+
+        # (Recompute the size from scratch, as other processes might be
+        # sharing this cache)
+        size = sum(sz for _, sz, _ in entries)
+        removed = 0
+        for _, sz, p in entries:
+            if size <= self._max_size:
+                break
+            Path(p).unlink(missing_ok=True)
+            size -= sz
+            removed += 1
+        self._size = size
+        logger.debug("content cache evicted entries", count=removed, size=size)
+
+
+@cache
+def get_content_cache() -> Optional[ContentCache]:
+    """Returns the ContentCache configured in the engine settings, or None if
+    content-addressed caching is disabled."""
+    config = settings.conversions["content_cache"]
+    if not config["directory"]:
+        return None
+    elif not settings.secret_value:
+        logger.warning(
+                "content cache directory is set, but settings.secret_value"
+                " is missing; not caching representations")
+        return None
+    return ContentCache(
+            config["directory"],
+            max_size=config["max_size"],
+            min_size=config["min_size"],
+            output_types=(OutputType(ot) for ot in config["output_types"]))
+
+
 __all__ = (
         "CacheManager",
+        "ContentCache",
+        "get_content_cache",
 )
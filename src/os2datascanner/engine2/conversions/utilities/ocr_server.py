@@ -0,0 +1,229 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""A long-lived OCR process.
+
+Starting a new Python interpreter and importing pymupdf for every image costs
+more than recognising the text in a typical small image does. An OCRServer
+keeps one OCR subprocess (see _ocr_cli.py) running and feeds it batches of
+images over a pipe, while keeping the isolation of the per-image subprocess: if
+the server crashes or takes too long over a batch, it's killed and the images
+in that batch are tried again one by one, and if that happens to a single
+image, a new server is started for the next one. (If the server turns out to
+have died before it was given a batch, the batch is sent to a new server
+instead.)"""
+
+import atexit
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from tempfile import TemporaryDirectory
+from typing import Optional
+import structlog
+
+from ... import settings as engine2_settings
+
+logger = structlog.get_logger("engine2")
+
+_OCR_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_ocr_cli.py")
+
+# How often (in seconds) to check whether or not the scan has been cancelled
+# while waiting for a result
+_ABORT_POLL_INTERVAL = 1.0
+
+
+class OCRServer:
+    """An OCRServer manages a long-lived OCR subprocess. (OCRServers are not
+    thread-safe; each worker process should have its own.)"""
+
+    def __init__(self, *, timeout: float, max_images: int = 0):
+        self._timeout = timeout
+        self._max_images = max_images
+        self._process = None
+        self._tmpdir = None
+        self._served = 0
+
+    def _start(self):
+        self._tmpdir = TemporaryDirectory()
+        self._process = subprocess.Popen(
+                [sys.executable, _OCR_CLI, "--serve"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                # Run the server in its own process group, so that we can
+                # kill anything it might have started, too
+                start_new_session=True,
+                env=os.environ | {
+                    # Disables multithreading for tesseract, which may lead to
+                    # better performance
+                    "OMP_THREAD_LIMIT": "1",
+                    "TMP": self._tmpdir.name,
+                    "TMPDIR": self._tmpdir.name,
+                    "TEMP": self._tmpdir.name,
+                })
+        # (Writes to the server are made with a deadline, so they mustn't
+        # block)
+        os.set_blocking(self._process.stdin.fileno(), False)
+        self._served = 0
+        logger.info("started OCR server", pid=self._process.pid)
+
+    def stop(self):
+        """Stops the OCR subprocess, if it's running. (A new one will be
+        started when it's next needed.)"""
+        if self._process is not None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            for pipe in (self._process.stdin, self._process.stdout):
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+            self._process.wait()
+            self._process = None
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def _read(self, n: int, deadline: float, should_abort) -> Optional[bytes]:
+        fd = self._process.stdout.fileno()
+        data = b""
+        while len(data) < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select(
+                    [fd], [], [], min(remaining, _ABORT_POLL_INTERVAL))
+            if not ready:
+                if should_abort and should_abort():
+                    return None
+                continue
+            if not (chunk := os.read(fd, n - len(data))):
+                raise EOFError
+            data += chunk
+        return data
+
+    def _write(self, data: bytes, deadline: float):
+        fd = self._process.stdin.fileno()
+        view = memoryview(data)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            _, ready, _ = select.select([], [fd], [], remaining)
+            if ready:
+                try:
+                    view = view[os.write(fd, view):]
+                except BlockingIOError:
+                    pass
+
+    def _send(self, images: list[bytes], deadline: float):
+        self._write(
+                struct.pack(">I", len(images))
+                + b"".join(struct.pack(">I", len(i)) + i for i in images),
+                deadline)
+        self._served += len(images)
+
+    def _prepare(self):
+        if self._process is not None and (
+                self._process.poll() is not None
+                or self._max_images and self._served >= self._max_images):
+            # Replace a server that has died since the last batch, and guard
+            # against slow leaks in the OCR libraries
+            self.stop()
+        if self._process is None:
+            self._start()
+
+    def _exchange(
+            self, images: list[bytes], should_abort) -> Optional[list]:
+        """Sends a batch of images to the server and returns its responses,
+        or None if the scan was cancelled in the meantime. Raises an OSError
+        if the server fails or takes too long."""
+        self._prepare()
+        # (Every image gets its own share of the time limit)
+        deadline = time.monotonic() + self._timeout * len(images)
+        try:
+            self._send(images, deadline)
+        except BrokenPipeError:
+            # The server died before it could read the batch, so the images
+            # themselves aren't to blame: try once more with a new server
+            logger.warning("OCR server gone; restarting it")
+            self.stop()
+            self._start()
+            self._send(images, deadline)
+
+        results = []
+        for _ in images:
+            if (header := self._read(5, deadline, should_abort)) is None:
+                return None
+            status, length = struct.unpack(">BI", header)
+            text = self._read(length, deadline, None) if length else b""
+            results.append(
+                    # errors=replace inserts "U+FFFD" on invalid bytes instead
+                    # of crashing
+                    text.decode("utf-8", errors="replace").strip() or None
+                    if status == 0 else None)
+        return results
+
+    def recognise_many(
+            self, images: list[bytes], *,
+            should_abort: Callable[[], bool] = None) -> list[Optional[str]]:
+        """Returns the text in each of the given images, in order. (An image
+        that couldn't be recognised in time has no text, and nor do any of
+        them if the scan was cancelled in the meantime.)
+
+        The images are sent to the server as a single batch, so that they can
+        share a single OCR engine. If that batch fails, each of its images is
+        tried again on its own, so that one bad image doesn't cost the others
+        their text."""
+        if not images or (should_abort and should_abort()):
+            return [None] * len(images)
+
+        try:
+            results = self._exchange(images, should_abort)
+        except (OSError, EOFError) as e:
+            # Corrupted image, segfault inside pymupdf/Tesseract, or a hang
+            # (TimeoutError is an OSError): treat as "this image isn't
+            # OCRable" rather than failing the whole conversion
+            logger.warning(
+                    "OCR server failed", images=len(images), exc_info=e)
+            self.stop()
+            if len(images) == 1:
+                return [None]
+            return [self.recognise(image, should_abort=should_abort)
+                    for image in images]
+
+        if results is None:
+            logger.info("OCR aborted; stopping OCR server")
+            self.stop()
+            return [None] * len(images)
+        return results
+
+    def recognise(
+            self, image: bytes, *,
+            should_abort: Callable[[], bool] = None) -> Optional[str]:
+        """Returns the text in the given image, or None if the image couldn't
+        be recognised in time (or if the scan was cancelled in the
+        meantime)."""
+        return self.recognise_many([image], should_abort=should_abort)[0]
+
+
+_server: Optional[OCRServer] = None
+
+
+def get_ocr_server() -> OCRServer:
+    """Returns this process's OCRServer, creating it if necessary."""
+    global _server
+    if _server is None:
+        _server = OCRServer(
+                timeout=engine2_settings.subprocess["timeout"],
+                max_images=engine2_settings.tesseract["server_max_images"])
+        atexit.register(_server.stop)
+    return _server
@@ -0,0 +1,214 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Streaming text representations.
+
+Most text representations are just Python strings, which is fine until the
+text in question is a multi-gigabyte log file. A WindowedText is a text that is
+never held in memory all at once: iterating over it yields a sequence of
+overlapping TextWindows, each of which has a stable offset into the text as a
+whole, and only one of which is in memory at a time.
+
+    >>> for window in WindowedText(handle, opener=resource.make_stream):
+    ...     window.offset, len(window.text), window.owns(0)
+    (0, 1052672, True)
+    (1044480, 1056768, False)
+    ...
+"""
+
+import codecs
+from typing import Iterator, NamedTuple
+import structlog
+
+from ... import settings
+
+logger = structlog.get_logger("engine2")
+
+
+STREAMABLE_TYPES = ("text/plain", "text/csv", "application/csv",)
+"""The MIME types whose text can be converted to a WindowedText."""
+
+
+def exceeds_stream_threshold(resource) -> bool:
+    """Indicates whether or not the text of a FileResource of one of the
+    STREAMABLE_TYPES is large enough to be converted to a WindowedText rather
+    than being read into memory all at once."""
+    threshold = settings.conversions["streaming"]["threshold"]
+    return bool(threshold
+                and (size := resource.get_size()) is not None
+                and size > threshold)
+
+
+class TextWindow(NamedTuple):
+    """A TextWindow is a part of a larger text.
+
+    Each window owns a region of the text, and every position in the text is
+    owned by exactly one window. The text of a window also includes up to
+    WindowedText.overlap characters of its neighbours on either side, so that
+    matches that cross the edge of the owned region can still be found in
+    full, and so that their context can still be extracted."""
+    offset: int
+    """The position, in the text as a whole, of the first character of this
+    window."""
+    text: str
+    own_start: int
+    """The position, in this window's text, of the start of the owned
+    region."""
+    own_end: int
+    """The position, in this window's text, of the end of the owned region."""
+    final: bool
+    """Whether or not this is the last window of the text."""
+
+    def owns(self, position: int) -> bool:
+        """Indicates whether or not this window is responsible for a match
+        that starts at the given position in its text."""
+        return (self.own_start <= position < self.own_end
+                or (self.final and position == self.own_end))
+
+
+class WindowedText:
+    """A WindowedText is a text representation backed by a stream of bytes.
+    Iterating over it (which can be done more than once) opens the stream
+    and decodes it, one window at a time.
+
+    As with a plain text that is read all at once, content that can't be
+    decoded isn't treated as text: iteration raises a UnicodeDecodeError when
+    it reaches it. (Later iterations raise it again straight away, so the
+    content is only checked once, however many rules are matched against
+    it.)"""
+
+    parent = None
+    """(WindowedTexts have no related values, but the conversion machinery
+    expects all representations to be navigable.)"""
+
+    def __init__(
+            self, handle, *,
+            opener=None, encoding: str = "utf-8",
+            window_size: int = None, overlap: int = None):
+        streaming = settings.conversions["streaming"]
+        self._handle = handle
+        self._opener = opener
+        self._encoding = encoding
+        self._window_size = window_size or streaming["window_size"]
+        self._overlap = overlap if overlap is not None else streaming["overlap"]
+        self._decode_error = None
+
+    @property
+    def handle(self):
+        """Returns the Handle of the object whose content this WindowedText
+        decodes."""
+        return self._handle
+
+    @property
+    def overlap(self) -> int:
+        return self._overlap
+
+    def bind(self, sm) -> 'WindowedText':
+        """Makes this WindowedText read its content by following its Handle in
+        the given SourceManager. (WindowedTexts that have been deserialised
+        must be bound before they can be iterated over.)"""
+        self._opener = lambda: self._handle.follow(sm).make_stream()
+        return self
+
+    def __iter__(self) -> Iterator[TextWindow]:
+        if self._opener is None:
+            raise ValueError(f"{self!r} must be bound before use")
+        elif self._decode_error is not None:
+            raise self._decode_error
+
+        try:
+            yield from self._windows()
+        except UnicodeDecodeError as ex:
+            self._decode_error = ex
+            raise
+
+    def _windows(self) -> Iterator[TextWindow]:  # noqa: CCR001, too high cognitive complexity
+        size, overlap = self._window_size, self._overlap
+        decoder = codecs.getincrementaldecoder(self._encoding)()
+        with self._opener() as fp:
+            buf = ""
+            buf_offset = 0  # the position in the text of the start of buf
+            own_start = 0  # the position in the text of the next owned region
+            eof = False
+            while True:
+                while not eof and buf_offset + len(buf) < own_start + size + overlap:
+                    chunk = fp.read(size)
+                    buf += decoder.decode(chunk, final=not chunk)
+                    eof = not chunk
+
+                text_end = buf_offset + len(buf)
+                final = eof and text_end <= own_start + size + overlap
+                own_end = text_end if final else own_start + size
+                window_start = max(buf_offset, own_start - overlap)
+                window_end = text_end if final else own_end + overlap
+                yield TextWindow(
+                        offset=window_start,
+                        text=buf[window_start - buf_offset:window_end - buf_offset],
+                        own_start=own_start - window_start,
+                        own_end=own_end - window_start,
+                        final=final)
+                if final:
+                    break
+
+                # Throw away everything that the next window won't need
+                own_start = own_end
+                if (keep_from := own_start - overlap) > buf_offset:
+                    buf = buf[keep_from - buf_offset:]
+                    buf_offset = keep_from
+
+    def to_json_object(self) -> dict:
+        return {
+            "windowed": self._handle.to_json_object(),
+            "encoding": self._encoding,
+            "window_size": self._window_size,
+            "overlap": self._overlap,
+        }
+
+    @staticmethod
+    def from_json_object(obj: dict, handle_loader) -> 'WindowedText':
+        return WindowedText(
+                handle_loader(obj["windowed"]),
+                encoding=obj.get("encoding", "utf-8"),
+                window_size=obj.get("window_size"),
+                overlap=obj.get("overlap"))
+
+    def __repr__(self):
+        return f"WindowedText({self._handle!r})"
+
+
+def match_windows(rule, windows: WindowedText) -> Iterator[dict]:
+    """Yields the matches of a SimpleRule that operates on text against a
+    WindowedText, by running the rule over each window in turn.
+
+    Only matches that start in the region owned by a window are reported, and
+    their offsets are adjusted to be relative to the whole text. (The rule
+    must report the offset of every match in the text it was given; see
+    SimpleRule.reports_offsets.)"""
+    for window in windows:
+        yield from match_window(rule, window)
+
+
+def match_window(rule, window: TextWindow) -> Iterator[dict]:
+    """Yields the matches of a SimpleRule that start in the region owned by a
+    single TextWindow, with their offsets adjusted to be relative to the whole
+    text."""
+    for m in rule.match(window.text):
+        if window.owns(m["offset"]):
+            m["offset"] += window.offset
+            yield m
+
+
+def match_whole_text(rule, windows: WindowedText) -> Iterator[dict]:
+    """Yields the matches of a SimpleRule that operates on text against a
+    WindowedText by reassembling the whole text and running the rule over
+    that. This is always correct, but it holds the whole text in memory, so
+    it's only used for rules whose matches can't be placed in the text (see
+    SimpleRule.reports_offsets)."""
+    logger.warning(
+            "rule can't report the offsets of its matches, so can't be"
+            " matched one window at a time; reading the whole text into"
+            " memory instead", rule=type(rule).__name__, handle=windows.handle)
+    yield from rule.match(
+            "".join(w.text[w.own_start:w.own_end] for w in windows))
@@ -8,14 +8,16 @@ from sys import stderr
 from typing import Any, Generator, override
 import magic
 import inspect
+import shutil
 import warnings
-import hashlib
 from traceback import print_exc
+from functools import wraps
 from contextlib import contextmanager
 
 from os2datascanner.utils.system_utilities import time_now
 from ...utilities.datetime import unparse_datetime
 from ..utilities.temp_resource import NamedTemporaryResource
+from ..utilities.tee_stream import HEAD_SIZE, TeeStream
 
 
 class Resource(ABC):
@@ -122,6 +124,50 @@ class TimestampedResource(Resource):
         return self._lm_timestamp
 
 
+def _observed(make_stream):
+    """Decorates an implementation of FileResource.make_stream so that the
+    content read through its streams is observed by a TeeStream. (Every
+    subclass's implementation is decorated automatically.)"""
+    @wraps(make_stream)
+    @contextmanager
+    def _make_stream(self):
+        if "kept" in (observations := self._observations):
+            # There's already a local copy of this content; read that instead
+            with open(observations["kept"], "rb") as fp:
+                yield fp
+            return
+
+        with make_stream(self) as stream:
+            observations = self._observations
+            identify = observations.get("identify", False)
+            observed = (isinstance(stream, TeeStream)
+                        and stream.observations is observations)
+            if (observed or "content_identifier" in observations
+                    or ("size" in observations and not identify)):
+                # Either this stream is already being observed or there's
+                # nothing left to learn from it
+                yield stream
+            else:
+                yield TeeStream(stream, observations, identify=identify)
+    return _make_stream
+
+
+def _kept(make_path):
+    """Decorates an implementation of FileResource.make_path so that it returns
+    the path to the local copy of the content made by FileResource.kept_content,
+    if there is one. (Every subclass's implementation is decorated
+    automatically.)"""
+    @wraps(make_path)
+    @contextmanager
+    def _make_path(self):
+        if "kept" in (observations := self._observations):
+            yield observations["kept"]
+        else:
+            with make_path(self) as path:
+                yield path
+    return _make_path
+
+
 class FileResource(TimestampedResource):
     """A FileResource is a TimestampedResource that can be viewed as a file: a
     sequence of bytes with a size."""
@@ -144,6 +190,7 @@ class FileResource(TimestampedResource):
         same as the *actual* size of that content: some Sources support
         transparent compression and decompression.)"""
 
+    @_kept
     @contextmanager
     def make_path(self):
         """Returns a context manager that, when entered, returns a path through
@@ -161,6 +208,7 @@ class FileResource(TimestampedResource):
 
     DOWNLOAD_CHUNK_SIZE = None
 
+    @_observed
     @contextmanager
     def make_stream(self):
         """Returns a context manager that, when entered, returns a read-only
@@ -170,6 +218,20 @@ class FileResource(TimestampedResource):
             with open(path, "rb") as fp:
                 yield fp
 
+    @property
+    def _observations(self) -> dict:
+        """Returns the dictionary of facts observed about this FileResource's
+        content while reading it."""
+        if (observations := getattr(self._sm, "observations", None)):
+            return observations(self.handle)
+        return self.__dict__.setdefault("_local_observations", {})
+
+    def get_observed_size(self) -> int | None:
+        """Returns the number of bytes in this FileResource's content if it has
+        already been read in full, or None otherwise. (Unlike get_size, this
+        never requires any I/O.)"""
+        return self._observations.get("size")
+
     @override
     def _generate_metadata(self):
         yield "last-modified", unparse_datetime(self.get_last_modified())
@@ -177,10 +239,15 @@ class FileResource(TimestampedResource):
     def compute_type(self):
         """Guesses the type of this file, possibly examining its content in the
         process. By default, this is computed by giving libmagic the first 512
-        bytes of the file."""
+        bytes of the file (which are reused if they've already been read)."""
         guessed = self.handle.guess_type()
-        with self.make_stream() as s:
-            computed = magic.from_buffer(s.read(512), True)
+        if (head := self._observations.get("head")) is None:
+            with self.make_stream() as s:
+                head = s.read(HEAD_SIZE)
+            # (A stream can't tell that a short object has been read to the
+            # end until it's read again, so record the head here, too)
+            self._observations.setdefault("head", head)
+        computed = magic.from_buffer(head, True)
         if guessed == computed:
             # If the guess and the computed values agree, then this isn't a
             # hard problem
@@ -195,19 +262,60 @@ class FileResource(TimestampedResource):
             # Otherwise, we prefer the computed type
             return computed
 
+    def want_content_identifier(self):
+        """Indicates that this FileResource's content identifier will be asked
+        for later, so that it should be computed as a side effect of the next
+        full read of its content. (Content isn't hashed unless something has
+        asked for this.)"""
+        self._observations["identify"] = True
+
     def compute_content_identifier(self):
         """Returns a unique identifier for the Resource's content.
-        The default for FileResources will be the hexdigest of a file's hash."""
-        hasher = hashlib.blake2b()
-        with self.make_stream() as stream:
-            while chunk := stream.read(8192):
-                hasher.update(chunk)
-        return hasher.hexdigest()
+        The default for FileResources will be the hexdigest of a file's hash,
+        which is computed as a side effect of reading the file in full."""
+        observations = self._observations
+        if "content_identifier" not in observations:
+            self.want_content_identifier()
+            with self.make_stream() as stream:
+                while stream.read(8192):
+                    pass
+        return observations["content_identifier"]
+
+    @contextmanager
+    def kept_content(self):
+        """Returns a context manager that reads this FileResource's content in
+        full, computing its content identifier along the way, and then keeps
+        a local copy of it until the context is exited. The streams and paths
+        made for this object in the meantime refer to that copy, so that
+        content that must be identified before it's converted is still only
+        fetched once.
+
+        (If the content identifier is already known, nothing is read or
+        kept.)"""
+        observations = self._observations
+        if "kept" in observations or "content_identifier" in observations:
+            yield
+            return
+
+        with NamedTemporaryResource(self.handle.name) as ntr:
+            self.want_content_identifier()
+            with ntr.open("wb") as f, self.make_stream() as rf:
+                shutil.copyfileobj(rf, f, self.DOWNLOAD_CHUNK_SIZE or 0)
+            observations["kept"] = ntr.get_path()
+            try:
+                yield
+            finally:
+                observations.pop("kept", None)
 
     @classmethod
     def __init_subclass__(subclass, **kwargs):
         super().__init_subclass__(*kwargs)
 
+        if "make_stream" in subclass.__dict__:
+            subclass.make_stream = _observed(subclass.make_stream)
+        if "make_path" in subclass.__dict__:
+            subclass.make_path = _kept(subclass.make_path)
+
         # The make_path and make_stream methods have default implementations in
         # terms of each other. Make sure that concrete subclasses override at
         # least one of these!
@@ -78,6 +78,12 @@ class Source(TypePropertyEquality, JSONSerialisable):
             timestamp of that rule could be used as a pre-filter when selecting
             Handles to yield.
 
+            scan_time: datetime | None
+            The time at which the scan exploring this Source was started.
+            Sources that remember what they found in earlier scans can compare
+            this with the timestamp of a LastModifiedRule in the Rule to work
+            out which of those scans must have been completed.
+
         All keyword arguments not supported by a subclass should be ignored.
 
         Note that this method can yield Handles that correspond to
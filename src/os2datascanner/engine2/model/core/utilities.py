@@ -3,6 +3,7 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, you can
 # obtain one at http://mozilla.org/MPL/2.0/.
 
+from collections import OrderedDict
 import structlog
 
 logger = structlog.get_logger("engine2")
@@ -53,6 +54,10 @@ class SourceManager:
         # Configuration obtained from a ScanSpec
         self.configuration = configuration
 
+        # Facts learned about the content of recently read objects, keyed by
+        # Handle (see FileResource.make_stream)
+        self._observations = OrderedDict()
+
     def _make_descriptor(self, source):
         return self._opened.setdefault(
                 source, _SourceDescriptor(source=source, parent=self._top))
@@ -161,6 +166,28 @@ class SourceManager:
                 desc.parent.children.remove(desc)
             del self._opened[source]
 
+    OBSERVATION_LIMIT = 64
+    """The number of objects whose observed facts are remembered."""
+
+    def observations(self, handle) -> dict:
+        """Returns the dictionary of facts observed about the content of the
+        object behind the given Handle while reading it. All of the Resources
+        for that Handle that are followed in this SourceManager share this
+        dictionary, so a fact observed through one of them need not be
+        computed again by another."""
+        if (observed := self._observations.get(handle)) is not None:
+            self._observations.move_to_end(handle)
+        else:
+            observed = self._observations[handle] = {}
+            while len(self._observations) > self.OBSERVATION_LIMIT:
+                self._observations.popitem(last=False)
+        return observed
+
+    def forget_observations(self):
+        """Forgets all of the facts observed about the content of objects (for
+        example, because those objects might have been modified since)."""
+        self._observations.clear()
+
     def __enter__(self):
         return self
 
@@ -173,6 +200,7 @@ class SourceManager:
     def clear(self):
         """Closes all of the Sources presently open in this SourceManager."""
         logger.debug("SourceManager.clear")
+        self.forget_observations()
         for child in self._top.children.copy():
             source = child.source
             try:
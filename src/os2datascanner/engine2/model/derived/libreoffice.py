@@ -17,7 +17,7 @@ from ..core import Handle, Source
 from ..file import FilesystemResource
 from .derived import DerivedSource
 from .msg import MsgSource
-from .utilities import office_metadata
+from .utilities import office_metadata, libreoffice_pool
 from .utilities.extraction import TinyImageFilter
 
 logger = structlog.get_logger("engine2")
@@ -42,9 +42,18 @@ src/engine2/conversions folder
 
 
 def libreoffice(*args):
-    """Invokes LibreOffice with a fresh settings directory (which will be
-    deleted as soon as the program finishes) and returns a CompletedProcess
-    with both stdout and stderr captured."""
+    """Invokes LibreOffice and returns a CompletedProcess with both stdout and
+    stderr captured.
+
+    If the [model.libreoffice] servers setting is greater than zero, the
+    arguments are handled by one of this process's long-running
+    LibreOfficeServers; otherwise, they're handled by a new instance of
+    LibreOffice with a fresh settings directory (which will be deleted as soon
+    as the program finishes)."""
+    if engine2_settings.model["libreoffice"]["servers"] > 0:
+        with libreoffice_pool.server() as server:
+            return server.run(*args)
+
     with TemporaryDirectory() as tmpdir:
         return run_custom(
                 ["libreoffice",
@@ -10,6 +10,7 @@ import string
 import sys
 from subprocess import DEVNULL
 import structlog
+from contextlib import contextmanager
 from tempfile import TemporaryDirectory
 from os2datascanner.utils.system_utilities import run_custom
 from ... import settings as engine2_settings
@@ -36,11 +37,46 @@ _PDF_CLEAN_CLI = os.path.join(_CLI_DIR, "_pdf_clean_cli.py")
 _PDF_PAGE_EXTRACT_CLI = os.path.join(_CLI_DIR, "_pdf_page_extract_cli.py")
 
 
+class _PDFState:
+    """The state of an open PDFSource: the path to the (possibly preprocessed)
+    document and, once something has asked for it, the document as parsed by
+    pymupdf.
+
+    Everything that looks at a PDF through the same SourceManager -- the
+    explorer counting its pages, page checks and page metadata -- shares the
+    parsed document, which is closed when the PDFSource is (for example, when
+    the SourceManager evicts it to make room for another document)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._document = None
+
+    @property
+    def document(self):
+        if self._document is None:
+            self._document = open_pdf_wrapped(self.path)
+        return self._document
+
+    def close(self):
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+
 @Source.mime_handler("application/pdf")
 class PDFSource(DerivedSource):
     type_label = "pdf"
 
     def _generate_state(self, sm):
+        with self._prepare(sm) as path:
+            state = _PDFState(path)
+            try:
+                yield state
+            finally:
+                state.close()
+
+    @contextmanager
+    def _prepare(self, sm):
         with self.handle.follow(sm).make_path() as path:
             # Explicitly download the file here for the sake of PDFPageSource,
 
@@ -67,26 +103,22 @@ class PDFSource(DerivedSource):
                 yield converted_path
 
     def handles(self, sm, **kwargs):
-        pdf = open_pdf_wrapped(sm.open(self))
-        for page_num in range(len(pdf)):
+        for page_num in range(len(sm.open(self).document)):
             yield PDFPageHandle(self, str(page_num + 1))
 
 
 class PDFPageResource(Resource):
     def _generate_metadata(self):
-        pdf = open_pdf_wrapped(self._sm.open(self.handle.source))
+        pdf = self._sm.open(self.handle.source).document
         # Some PDF authoring tools helpfully stick null bytes into the
         # author field. Make sure we remove these
         author = pdf.metadata.get("author", "").strip(WHITESPACE_PLUS)
-        pdf.close()
         if author:
             yield "pdf-author", str(author)
 
     def check(self) -> bool:
         page = int(self.handle.relative_path)
-        with self.handle.source._make_stream(self._sm) as fp:
-            reader = open_pdf_wrapped(fp)
-            return 0 < page <= len(reader)
+        return 0 < page <= len(self._sm.open(self.handle.source).document)
 
     def compute_type(self):
         return PAGE_TYPE
@@ -135,7 +167,10 @@ class PDFPageSource(DerivedSource):
         # byte content. This avoids writing temporary files to disk.
         page = int(self.handle.relative_path) - 1
         skip_images = should_skip_images(sm.configuration)
-        path = sm.open(self.handle.source)
+        # (The page is extracted in a separate process, which has to parse
+        # the document again for itself, so that a document that crashes
+        # pymupdf or takes too long to handle can't take the worker with it)
+        path = sm.open(self.handle.source).path
 
         extracted_data: dict[str, bytes] = {}
         with TemporaryDirectory() as outputdir:
@@ -0,0 +1,167 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""A per-process pool of long-running LibreOffice instances.
+
+Starting LibreOffice, and building a new settings directory for it to use,
+takes a second or more, which is usually much longer than converting the
+document itself. LibreOffice only lets one instance at a time use a settings
+directory, though: starting LibreOffice again with the settings directory of
+an instance that's already running just passes the new command line on to that
+instance and waits for it to be handled.
+
+A LibreOfficeServer is a headless instance that's kept running in the
+background for that purpose. Running an ordinary LibreOffice command line
+against its settings directory gives exactly the same results as running it in
+a new instance, but doesn't pay the cost of starting one."""
+
+import os
+import atexit
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from glob import glob
+from subprocess import DEVNULL, Popen, TimeoutExpired
+from tempfile import TemporaryDirectory
+from uuid import uuid4
+import structlog
+
+from .....utils.system_utilities import run_custom
+from .... import settings as engine2_settings
+
+logger = structlog.get_logger("engine2")
+
+
+class LibreOfficeServer:
+    """A LibreOfficeServer is a headless LibreOffice instance with a settings
+    directory and a temporary directory of its own, listening for requests on
+    a private named pipe."""
+
+    def __init__(self):
+        self._directory = TemporaryDirectory()
+        self._tmp = os.path.join(self._directory.name, "tmp")
+        os.mkdir(self._tmp)
+        self._env = os.environ | dict(
+                TMP=self._tmp, TMPDIR=self._tmp, TEMP=self._tmp)
+        self._pipe = f"osds-{uuid4().hex}"
+
+        self.owner = os.getpid()
+        self.conversions = 0
+
+        self._process = Popen(
+                ["libreoffice", self._user_installation,
+                 "--headless", "--invisible", "--nologo", "--norestore",
+                 f"--accept=pipe,name={self._pipe};urp;"],
+                stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL,
+                env=self._env, start_new_session=True)
+        self._wait_until_ready()
+
+    @property
+    def _user_installation(self) -> str:
+        return "-env:UserInstallation=file://{0}".format(
+                os.path.join(self._directory.name, "profile"))
+
+    def _wait_until_ready(self):
+        # LibreOffice creates its pipes once it's ready to handle requests. (A
+        # command line run before then isn't lost -- it just starts a separate
+        # instance of its own -- but that's exactly what we want to avoid)
+        timeout = engine2_settings.model["libreoffice"]["start_timeout"]
+        deadline = time.monotonic() + timeout
+        while self.is_healthy() and time.monotonic() < deadline:
+            for directory in (self._tmp, "/tmp", "/var/tmp",):
+                if glob(os.path.join(directory, f"OSL_PIPE_*{self._pipe}")):
+                    return
+            time.sleep(0.1)
+        logger.warning(
+                "LibreOffice server not ready",
+                pid=self._process.pid, timeout=timeout)
+
+    def is_healthy(self) -> bool:
+        return self._process.poll() is None
+
+    def run(self, *args):
+        """Runs LibreOffice with the given arguments against this server and
+        returns a CompletedProcess. Raises subprocess.TimeoutExpired if the
+        server takes longer than the [subprocess] timeout to handle them."""
+        self.conversions += 1
+        return run_custom(
+                ["libreoffice", self._user_installation, *args],
+                stdout=DEVNULL, stderr=DEVNULL, check=True,
+                timeout=engine2_settings.subprocess["timeout"],
+                kill_group=True, env=self._env)
+
+    def stop(self):
+        """Stops this server and deletes its directories."""
+        if self.is_healthy():
+            try:
+                os.killpg(self._process.pid, signal.SIGTERM)
+                self._process.wait(timeout=5)
+            except TimeoutExpired:
+                os.killpg(self._process.pid, signal.SIGKILL)
+                self._process.wait()
+            except ProcessLookupError:
+                pass
+        self._directory.cleanup()
+
+
+_lock = threading.Lock()
+_idle: list[LibreOfficeServer] = []
+
+
+def _take_idle() -> LibreOfficeServer | None:
+    """Removes a healthy server that belongs to this process from the pool and
+    returns it, or returns None if there isn't one."""
+    with _lock:
+        while _idle:
+            candidate = _idle.pop()
+            if candidate.owner != os.getpid():
+                # (A server inherited from our parent process belongs to it)
+                continue
+            elif not candidate.is_healthy():
+                logger.info("replacing stopped LibreOffice server")
+                candidate.stop()
+                continue
+            return candidate
+    return None
+
+
+@contextmanager
+def server():
+    """Lends out an idle LibreOfficeServer from this process's pool, starting a
+    new one if there isn't one.
+
+    When the server is returned, it goes back into the pool unless it has
+    stopped running, it has handled as many documents as the
+    [model.libreoffice] recycle_after setting allows, the pool is already
+    full, or the block raised an exception (which might mean that the server
+    is stuck on a document). In those cases it's stopped instead."""
+    config = engine2_settings.model["libreoffice"]
+    candidate = _take_idle() or LibreOfficeServer()
+
+    try:
+        yield candidate
+    except BaseException:
+        candidate.stop()
+        raise
+
+    with _lock:
+        if (candidate.is_healthy()
+                and candidate.conversions < config["recycle_after"]
+                and len(_idle) < config["servers"]):
+            _idle.append(candidate)
+            candidate = None
+    if candidate is not None:
+        candidate.stop()
+
+
+@atexit.register
+def stop_all():
+    """Stops every idle LibreOfficeServer in this process's pool."""
+    with _lock:
+        servers = [s for s in _idle if s.owner == os.getpid()]
+        _idle.clear()
+    for s in servers:
+        s.stop()
@@ -15,6 +15,7 @@ from exchangelib.errors import (
         ErrorServerBusy, ErrorItemNotFound, ErrorNonExistentMailbox)
 from exchangelib.protocol import BaseProtocol
 
+from .. import settings as engine2_settings
 from ..utilities.backoff import DefaultRetrier
 from ..conversions.email_headers import email_headers_hint
 from .core import Source, Handle, FileResource
@@ -65,18 +66,80 @@ def _dictify_headers(headers):
         return None
 
 
+class _EWSAccount(Account):
+    """An Account that also remembers the Folders that have been retrieved
+    through it, the order of the items in those Folders, and the messages that
+    have been fetched in bulk but not yet used."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.folders: dict[str, Folder] = {}
+        self.listings: dict[str, tuple[list[str], dict[str, int]]] = {}
+        self.prefetched: dict[str, Message] = {}
+
+
 def _retrieve_folder(account, folder_id):
+    if (folder := account.folders.get(folder_id)) is not None:
+        return folder
     # exchangelib>=4.0.0 requires that you pass a Folder object to
     # the function that... returns a Folder object?... okay, fine,
     # let's do that...
     folder_object = Folder(id=folder_id)
     folder = account.root.get_folder(folder_object)
     if folder:
+        account.folders[folder_id] = folder
         return folder
     else:
         raise ErrorItemNotFound("Folder not found")
 
 
+_MESSAGE_FIELDS = (
+        "message_id", "mime_content", "size",
+        "datetime_created", "datetime_received", "datetime_sent",)
+"""The fields of a message that EWSMailResource needs."""
+
+
+def _prefetch_messages(account, folder_id, mail_id):
+    """Makes sure that a message is in the prefetch buffer of an Account,
+    fetching it if necessary, and returns it (or the exception that EWS gave
+    instead of it).
+
+    Messages are fetched in bulk: the message is fetched together with the
+    ones that follow it in its folder, which are usually the next ones that a
+    worker will be asked for. (Fetching a new batch empties the buffer, so it
+    never holds more than one batch of messages; messages are also removed
+    from it once EWSMailResource.get_message_object has used them.)"""
+    if (message := account.prefetched.get(mail_id)) is not None:
+        return message
+
+    batch_size = engine2_settings.model["ews"]["batch_size"]
+    ids = [mail_id]
+    if batch_size > 1:
+        if (listing := account.listings.get(folder_id)) is None:
+            folder = _retrieve_folder(account, folder_id)
+            order = [item.id for item in folder.all().only("id")]
+            listing = account.listings[folder_id] = (
+                    order, {item_id: idx for idx, item_id in enumerate(order)})
+        order, positions = listing
+        if (position := positions.get(mail_id)) is not None:
+            ids = order[position:position + batch_size]
+        else:
+            # The message is newer than our record of its folder, so build a
+            # new one the next time it's needed
+            del account.listings[folder_id]
+
+    account.prefetched.clear()
+    for item_id, item in zip(
+            ids, account.fetch(
+                    ids=[(item_id, None) for item_id in ids],
+                    only_fields=_MESSAGE_FIELDS)):
+        if item_id == mail_id and isinstance(item, ErrorServerBusy):
+            raise item
+        elif item_id == mail_id or not isinstance(item, Exception):
+            account.prefetched[item_id] = item
+    return account.prefetched[mail_id]
+
+
 class InsensitiveDict(dict):
     def __getitem__(self, key):
         return super().__getitem__(key.lower())
@@ -153,7 +216,7 @@ class EWSAccountSource(Source):
     def _generate_state(self, sm):
         match self._make_credentials():
             case Credentials() as c:
-                account = Account(
+                account = _EWSAccount(
                         primary_smtp_address=self.address,
                         credentials=c,
                         config=Configuration(
@@ -162,7 +225,7 @@ class EWSAccountSource(Source):
                         autodiscover=not bool(self._server),
                         access_type=IMPERSONATION)
             case OAuth2Credentials() as c:
-                account = Account(
+                account = _EWSAccount(
                         primary_smtp_address=self.address,
                         config=Configuration(
                                 service_endpoint=self._server,
@@ -280,11 +343,8 @@ class EWSMailResource(FileResource):
         try:
             account = self._get_cookie()
 
-            def _retrieve_message():
-                folder = _retrieve_folder(account, folder_id)
-                return folder.all().only("message_id").get(id=mail_id)
-
-            m = DefaultRetrier(ErrorServerBusy).run(_retrieve_message)
+            m = DefaultRetrier(ErrorServerBusy).run(
+                    _prefetch_messages, account, folder_id, mail_id)
             # exchangelib is slightly inconsistent about whether it *returns*
             # or *raises* exceptions, so we err on the side of caution here
             return not isinstance(
@@ -297,11 +357,12 @@ class EWSMailResource(FileResource):
             folder_id, mail_id = self._ids
             account = self._get_cookie()
 
-            def _retrieve_message():
-                folder = _retrieve_folder(account, folder_id)
-                return folder.get(id=mail_id)
-            self._message = DefaultRetrier(
-                    ErrorServerBusy, fuzz=0.25).run(_retrieve_message)
+            message = DefaultRetrier(ErrorServerBusy, fuzz=0.25).run(
+                    _prefetch_messages, account, folder_id, mail_id)
+            account.prefetched.pop(mail_id, None)
+            if isinstance(message, Exception):
+                raise message
+            self._message = message
         return self._message
 
     @contextmanager
@@ -14,6 +14,8 @@ from contextlib import contextmanager
 from ..rules.rule import Rule
 from ..conversions.types import OutputType
 from ..conversions.utilities.navigable import make_values_navigable
+from ..utilities.datetime import parse_datetime, unparse_datetime
+from .utilities.stat_hints import trusted_hints
 
 from os2datascanner.engine2.rules.utilities.analysis import compute_mss
 
@@ -34,19 +36,22 @@ class FilesystemSource(Source):
             self, f: Path, base_path: Path, cutoff: datetime | None):
         if f.is_file():
             stat = f.stat()
+            mod_ts = datetime.fromtimestamp(stat.st_mtime, gettz())
             if cutoff:
                 # Note that this is *not* a good implementation of rule
                 # pre-execution: Python filesystem traversal doesn't give us
                 # the result of a stat(2) call. This trivial one is enough to
                 # satisfy the test suite, though
-                mod_ts = datetime.fromtimestamp(stat.st_mtime, gettz())
                 if mod_ts < cutoff:
                     return
 
             yield FilesystemHandle(
                 self,
                 str(f.relative_to(base_path)),
-                hints={"size": stat.st_size},
+                hints={
+                    "size": stat.st_size,
+                    "mtime": unparse_datetime(mod_ts),
+                },
             )
 
     def handles(self, sm, *, rule: Rule | None = None, **kwargs):
@@ -119,9 +124,13 @@ class FilesystemResource(FileResource):
         return self._mr
 
     def get_size(self):
+        if not self._mr and (hinted := trusted_hints(self, "size")):
+            return hinted[0]
         return self.unpack_stat()["st_size"]
 
     def get_last_modified(self):
+        if not self._mr and (hinted := trusted_hints(self, "mtime")):
+            return parse_datetime(hinted[0])
         return self.unpack_stat().setdefault(
                 OutputType.LastModified, super().get_last_modified())
 
@@ -176,7 +176,9 @@ class WebSource(Source):
         session = sm.open(self)
         wc = crawler.WebCrawler(
                 self._url, session=session, ttl=TTL,
-                allow_element_hints=self._extended_hints)
+                allow_element_hints=self._extended_hints,
+                workers=engine2_settings.model["http"]["crawl_workers"],
+                per_host=engine2_settings.model["http"]["crawl_per_host"])
         if self._exclude:
             wc.exclude(*self._exclude)
 
@@ -24,25 +24,15 @@ class MSGraphCalendarSource(MSGraphSource):
         super().__init__(client_id, tenant_id, client_secret)
         self._userlist = userlist
 
-    def handles(self, sm, **kwargs):  # noqa
-        if self._userlist is None:
-            for user in self._list_users(sm):
-                pn = user["userPrincipalName"]
-
-                with warn_on_httperror(f"calendar check for {pn}"):
-                    any_events = sm.open(self).get(
-                        "users/{0}/events?$select=id&$top=1".format(pn)).json()
-                    if not any_events["value"]:
-                        continue
-
+    def handles(self, sm, **kwargs):
+        probes = sm.open(self).batch_get(
+                (pn, f"users/{pn}/events?$select=id&$top=1")
+                for pn in self._list_principal_names(sm))
+        for pn, response in probes:
+            with warn_on_httperror(f"calendar check for {pn}"):
+                response.raise_for_status()
+                if response.json()["value"]:
                     yield MSGraphCalendarAccountHandle(self, pn)
-        else:
-            for pn in self._userlist:
-                with warn_on_httperror(f"calendar check for {pn}"):
-                    any_events = sm.open(self).get(
-                        "users/{0}/events?$select=id&$top=1".format(pn)).json()
-                    if any_events["value"]:
-                        yield MSGraphCalendarAccountHandle(self, pn)
 
     def to_json_object(self):
         return dict(
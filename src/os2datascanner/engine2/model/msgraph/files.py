@@ -5,19 +5,24 @@
 
 from contextlib import contextmanager
 from dateutil.parser import isoparse
+import structlog
 from requests import HTTPError
 from datetime import datetime, timezone
 from typing import override
 
+from ...utilities.datetime import parse_datetime, unparse_datetime
 from ...utilities.i18n import gettext as _
 from ..core import Handle, Source, Resource, FileResource
 from ..derived.derived import DerivedSource
+from ..utilities.stat_hints import trusted_hints
 from ..utilities.temp_resource import NamedTemporaryResource
-from .utilities import MSGraphSource, warn_on_httperror
+from .utilities import DeltaLinkStore, MSGraphSource, warn_on_httperror
 from ...rules.rule import Rule
 
 from os2datascanner.engine2.rules.utilities.analysis import compute_mss
 
+logger = structlog.get_logger("engine2")
+
 
 class MSGraphFilesSource(MSGraphSource):
     type_label = "msgraph-files"
@@ -70,18 +75,13 @@ class MSGraphFilesSource(MSGraphSource):
                             yield self._make_drive_handle(drive)
 
         if self._user_drives:
-            if self._userlist is None:
-                for user in self._list_users(sm):
-                    pn = user["userPrincipalName"]
-                    with warn_on_httperror(f"drive check for {pn}"):
-                        drive = sm.open(self).get("users/{0}/drive".format(pn)).json()
-                        yield self._make_drive_handle(drive)
-
-            else:
-                for pn in self._userlist:
-                    with warn_on_httperror(f"drive check for {pn}"):
-                        drive = sm.open(self).get(f"users/{pn}/drive").json()
-                        yield self._make_drive_handle(drive)
+            lookups = sm.open(self).batch_get(
+                    (pn, f"users/{pn}/drive")
+                    for pn in self._list_principal_names(sm))
+            for pn, response in lookups:
+                with warn_on_httperror(f"drive check for {pn}"):
+                    response.raise_for_status()
+                    yield self._make_drive_handle(response.json())
 
     def to_json_object(self):
         return dict(
@@ -190,12 +190,35 @@ class MSGraphDriveSource(DerivedSource):
         ts = cutoff.astimezone(timezone.utc)
         return [
             obj for obj in folder
-            if datetime.strptime(obj['lastModifiedDateTime'],
-                                 "%Y-%m-%dT%H:%M:%SZ").replace(
-                tzinfo=timezone.utc) >= ts
+            if isoparse(obj['lastModifiedDateTime']).astimezone(
+                timezone.utc) >= ts
         ]
 
-    def handles(self, sm, *, rule: Rule | None = None, **kwargs):  # noqa CCR001 Cognitive complexity
+    def _delta(self, gc, link: str | None):
+        """Yields the pages of a delta query on this drive, starting from the
+        given delta link (or from scratch, if it's None). The last page
+        contains the delta link for the next query."""
+        if link:
+            try:
+                page = gc.follow_next_link(link).json()
+            except HTTPError as ex:
+                # An expired delta link is answered with 410 Gone; start
+                # again from scratch
+                if ex.response.status_code != 410:
+                    raise
+                logger.info("delta link expired", drive=self.drive_path)
+                page = gc.get(f"{self.drive_path}/root/delta").json()
+        else:
+            page = gc.get(f"{self.drive_path}/root/delta").json()
+
+        yield page
+        while "@odata.nextLink" in page:
+            page = gc.follow_next_link(page["@odata.nextLink"]).json()
+            yield page
+
+    def handles(  # noqa CCR001 Cognitive complexity
+            self, sm, *, rule: Rule | None = None,
+            scan_time: datetime | None = None, **kwargs):
         gc: MSGraphSource.GraphCaller = sm.open(self)
 
         cutoff = None
@@ -206,42 +229,96 @@ class MSGraphDriveSource(DerivedSource):
                 after = essential_rule.after
                 cutoff = (after if not cutoff else max(cutoff, after))
 
-        def _explore_folder(
-                components, folder, parent_weblink=None, is_root=False):
-
-            # Since filtering on lastModifiedDateTime is not supported in MSGraph on this resource
-            # this is the earliest we can filter.
-            if cutoff:
-                folder = self.filter_last_modified(folder, cutoff)
-
-            for obj in folder:
-                name = obj["name"]
-                web_url = obj.get("webUrl", None)
-                if is_root:
-                    # Microsoft appears to have changed the default home page
-                    # of OneDrive from an actual list of files (which we want)
-                    # to some sort of fuzzy recent overview (which we don't)
-                    # without updating webUrl accordingly. Groan; attempt to
-                    # correct for that by requesting the file list view
-                    web_url += "?view=0"
-                here = components + ([name] if not is_root else [])
-                if "file" in obj:
-                    yield MSGraphFileHandle(
-                        self,
-                        "/".join(here),
-                        weblink=web_url,
-                        parent_weblink=parent_weblink,
-                        hints={"size": obj.get("size")},
-                    )
-                elif "folder" in obj:
-                    folder_id: str = obj["id"]
-                    subfolder = gc.get(
-                        f"{self.drive_path}/items/"
-                        f"{folder_id}/children").json()
-                    yield from _explore_folder(
-                        here, subfolder["value"], parent_weblink=web_url)
-        root = [gc.get(f"{self.drive_path}/root").json()]
-        yield from _explore_folder([], root, is_root=True)
+        # If an earlier scan has seen everything up to the cutoff, then we
+        # only need to ask for what's changed since then
+        store = DeltaLinkStore.for_drive(self.handle.source, self.drive_path)
+        link = store.find(cutoff) if store and cutoff else None
+
+        # Delta queries don't give the paths of items, so we build them from
+        # the names and parents of the folders we see: this maps folder IDs to
+        # (name, parent ID, web URL) triples (and the root's name is None)
+        folders: dict[str, tuple[str | None, str | None, str | None]] = {}
+
+        def _folder(folder_id):
+            if folder_id not in folders:
+                # This folder hasn't changed recently, so we'll have to ask
+                # for it (and its parents) separately
+                f = gc.get(
+                        f"{self.drive_path}/items/{folder_id}"
+                        "?$select=id,name,webUrl,parentReference,root").json()
+                _remember(f)
+            return folders[folder_id]
+
+        def _remember(folder):
+            if "root" in folder:
+                # Microsoft appears to have changed the default home page
+                # of OneDrive from an actual list of files (which we want)
+                # to some sort of fuzzy recent overview (which we don't)
+                # without updating webUrl accordingly. Groan; attempt to
+                # correct for that by requesting the file list view
+                web_url = folder.get("webUrl")
+                folders[folder["id"]] = (
+                        None, None, web_url + "?view=0" if web_url else None)
+            else:
+                folders[folder["id"]] = (
+                        folder["name"],
+                        folder.get("parentReference", {}).get("id"),
+                        folder.get("webUrl"))
+
+        def _components(folder_id) -> list[str]:
+            components = []
+            while folder_id is not None:
+                name, folder_id, _ = _folder(folder_id)
+                if name is not None:
+                    components.append(name)
+            return components[::-1]
+
+        def _is_known(folder_id) -> bool:
+            while folder_id is not None:
+                if folder_id not in folders:
+                    return False
+                _, folder_id, _ = folders[folder_id]
+            return True
+
+        def _make_handle(obj):
+            parent_id = obj.get("parentReference", {}).get("id")
+            hints = {"size": obj.get("size")}
+            if (lm := obj.get("lastModifiedDateTime")):
+                hints["mtime"] = unparse_datetime(isoparse(lm))
+            return MSGraphFileHandle(
+                self,
+                "/".join(_components(parent_id) + [obj["name"]]),
+                weblink=obj.get("webUrl"),
+                parent_weblink=_folder(parent_id)[2] if parent_id else None,
+                hints=hints,
+            )
+
+        # Files are normally listed after their folders, but that isn't
+        # guaranteed; hold back any whose folders we haven't seen yet
+        deferred = []
+        page = {}
+        for page in self._delta(gc, link):
+            for obj in page["value"]:
+                if "deleted" in obj:
+                    continue
+                elif "folder" in obj or "root" in obj:
+                    _remember(obj)
+                elif "file" in obj:
+                    # Since filtering on lastModifiedDateTime is not supported
+                    # in MSGraph on this resource, this is the earliest we can
+                    # filter
+                    if cutoff and not self.filter_last_modified([obj], cutoff):
+                        continue
+                    if _is_known(obj.get("parentReference", {}).get("id")):
+                        yield _make_handle(obj)
+                    else:
+                        deferred.append(obj)
+
+        for obj in deferred:
+            yield _make_handle(obj)
+
+        if store and scan_time and (new_link := page.get("@odata.deltaLink")):
+            store.add(scan_time, new_link)
 
 
 class MSGraphFileResource(FileResource):
@@ -278,11 +355,15 @@ class MSGraphFileResource(FileResource):
 
     @override
     def get_last_modified(self):
+        if not self._metadata and (hinted := trusted_hints(self, "mtime")):
+            return parse_datetime(hinted[0])
         timestamp = self.get_file_metadata().get("lastModifiedDateTime")
         return isoparse(timestamp) if timestamp else None
 
     @override
     def get_size(self):
+        if not self._metadata and (hinted := trusted_hints(self, "size")):
+            return hinted[0]
         return self.get_file_metadata()["size"]
 
     @override
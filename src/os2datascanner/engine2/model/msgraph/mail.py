@@ -47,28 +47,19 @@ class MSGraphMailSource(MSGraphSource):
         self._scan_syncissues_folder = scan_syncissues_folder
         self._scan_attachments = scan_attachments
 
-    def handles(self, sm, **kwargs):  # noqa
-        if self._userlist is None:
-            for user in self._list_users(sm):
-                pn = user["userPrincipalName"]  # e.g. dan@contoso.onmicrosoft.com
-                # Getting a HTTP 404 response from the /messages endpoint means
-                # that this user doesn't have a mail account at all
-                with warn_on_httperror(f"mail check for {pn}"):
-                    any_mails = sm.open(self).get(
-                        "users/{0}/messages?$select=id&$top=1".format(pn)).json()
-                    if not any_mails["value"]:
-                        # This user has a mail account that contains no mails
-                        continue
-                    else:
-                        yield MSGraphMailAccountHandle(self, pn)
-
-        else:
-            for pn in self._userlist:
-                with warn_on_httperror(f"mail check for {pn}"):
-                    any_mails = sm.open(self).get(
-                        "users/{0}/messages?$select=id&$top=1".format(pn)).json()
-                    if any_mails["value"]:
-                        yield MSGraphMailAccountHandle(self, pn)
+    def handles(self, sm, **kwargs):
+        probes = sm.open(self).batch_get(
+                (pn, f"users/{pn}/messages?$select=id&$top=1")
+                for pn in self._list_principal_names(sm))
+        for pn, response in probes:
+            # Getting a HTTP 404 response from the /messages endpoint means
+            # that this user doesn't have a mail account at all
+            with warn_on_httperror(f"mail check for {pn}"):
+                response.raise_for_status()
+                if response.json()["value"]:
+                    yield MSGraphMailAccountHandle(self, pn)
+                # (otherwise this user has a mail account that contains no
+                # mails)
 
     def to_json_object(self):
         return dict(
@@ -5,13 +5,23 @@
 
 from dataclasses import dataclass
 from contextlib import contextmanager
+from datetime import datetime
+from hashlib import blake2b
+from itertools import batched
+from tempfile import NamedTemporaryFile
+from typing import Any, Iterable, Iterator, Optional
+import json
+import os
 import structlog
 import requests
+from requests.structures import CaseInsensitiveDict
 
 from os2datascanner.utils.oauth2 import mint_cc_token
 from os2datascanner.utils.token_caller import TokenCaller
 from os2datascanner.engine2 import settings as engine2_settings
 from os2datascanner.engine2.utilities.backoff import WebRetrier
+from os2datascanner.engine2.utilities.datetime import (
+        parse_datetime, unparse_datetime)
 
 from ..core import Source
 
@@ -71,7 +81,21 @@ class MSGraphSource(Source):
     def _list_users(self, sm):
         yield from sm.open(self).paginated_get("users")
 
+    def _list_principal_names(self, sm):
+        """Yields the principal names of the users covered by this Source:
+        those in its user list, if it has one, or otherwise every user in the
+        organisation."""
+        if (userlist := getattr(self, "_userlist", None)) is not None:
+            yield from userlist
+        else:
+            for user in self._list_users(sm):
+                yield user["userPrincipalName"]
+
     class GraphCaller(TokenCaller):
+        BATCH_LIMIT = 20
+        """The largest number of requests that MSGraph accepts in a single
+        JSON batch."""
+
         def __init__(self, token_creator, session=None):
             super().__init__(
                     token_creator, "https://graph.microsoft.com/v1.0/",
@@ -90,6 +114,56 @@ class MSGraphSource(Source):
                 result = self.follow_next_link(result["@odata.nextLink"]).json()
                 yield from result.get('value')
 
+        def batch_get(
+                self, calls: Iterable[tuple[Any, str]]
+                ) -> Iterator[tuple[Any, requests.Response]]:
+            """Performs GET requests on several MSGraph endpoints, combining
+            them into JSON batches of up to BATCH_LIMIT requests each. Each
+            request is given as a (key, endpoint) pair.
+
+            Yields a (key, response) pair for each request, in the order in
+            which they were given. Responses are not checked for errors, except
+            that a request that was throttled (HTTP 429 or 503) is retried on
+            its own, respecting its Retry-After header."""
+            for chunk in batched(calls, self.BATCH_LIMIT):
+                result = self.post("$batch", json={
+                    "requests": [
+                        {
+                            "id": str(idx),
+                            "method": "GET",
+                            "url": "/" + endpoint.lstrip("/"),
+                        } for idx, (_, endpoint) in enumerate(chunk)
+                    ]
+                }).json()
+                responses = {
+                    r["id"]: r for r in result.get("responses", [])}
+
+                for idx, (key, endpoint) in enumerate(chunk):
+                    yield key, self._unbatch(endpoint, responses.get(str(idx)))
+
+        def _unbatch(self, endpoint: str, item: dict | None) -> requests.Response:
+            """Converts an item from the response to a JSON batch into a
+            requests.Response, retrying the request if necessary."""
+            if item is None:
+                # This shouldn't happen, but MSGraph owes us a response
+                return self.get(endpoint, check=False)
+
+            response = requests.Response()
+            response.status_code = item["status"]
+            response.headers = CaseInsensitiveDict(item.get("headers") or {})
+            response.url = self.join(endpoint)
+            response.encoding = "utf-8"
+            response._content = json.dumps(item.get("body")).encode()
+            if response.status_code not in WebRetrier.RETRY_CODES:
+                return response
+
+            # The first attempt is the batched response, which WebRetrier
+            # will back off from; later attempts are made individually
+            attempts = [response]
+            return WebRetrier().run(
+                    lambda: (attempts.pop() if attempts
+                             else self.get(endpoint, check=False)))
+
         def delete_message(self, owner, msg_id):
             return self.delete(f"users/{owner}/messages/{msg_id}")
 
@@ -149,6 +223,72 @@ def warn_on_httperror(label):
             exc_info=True)
 
 
+class DeltaLinkStore:
+    """A DeltaLinkStore remembers the delta links that MSGraph returned at the
+    end of complete delta queries on a drive, along with the start time of
+    the scan that made each query. A later scan can follow one of these links
+    to fetch only the items that have changed since.
+
+    A scan that started after a Last-Modified cutoff might not have been
+    completed successfully, so the changes that it saw can't be assumed to
+    have been scanned. DeltaLinkStore.find therefore only returns links from
+    scans that started no later than the cutoff."""
+
+    LIMIT = 8
+    """The number of delta links to remember for each drive."""
+
+    def __init__(self, path: str):
+        self._path = path
+
+    @classmethod
+    def for_drive(
+            cls, source: MSGraphSource,
+            drive_path: str) -> Optional["DeltaLinkStore"]:
+        """Returns the DeltaLinkStore for a drive, or None if delta links
+        shouldn't be stored."""
+        directory = engine2_settings.model["msgraph"]["delta_directory"]
+        if not directory:
+            return None
+        key = blake2b(
+                json.dumps([source._tenant_id, drive_path]).encode(),
+                digest_size=16).hexdigest()
+        return cls(os.path.join(directory, f"{key}.json"))
+
+    def _read(self) -> list[tuple[datetime, str]]:
+        try:
+            with open(self._path) as fp:
+                links = json.load(fp)["links"]
+            return [(parse_datetime(ts), link) for ts, link in links]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def find(self, cutoff: datetime) -> Optional[str]:
+        """Returns the delta link from the latest scan that started no later
+        than the given cutoff, if there is one."""
+        candidates = [(ts, link) for ts, link in self._read() if ts <= cutoff]
+        return max(candidates)[1] if candidates else None
+
+    def add(self, scan_time: datetime, link: str):
+        """Remembers the delta link returned to the scan that started at the
+        given time, forgetting the oldest link if there are too many."""
+        scan_time = parse_datetime(unparse_datetime(scan_time))
+        links = sorted(
+                [(ts, lk) for ts, lk in self._read() if ts != scan_time]
+                + [(scan_time, link)])[-self.LIMIT:]
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with NamedTemporaryFile(
+                    "w", dir=os.path.dirname(self._path), delete=False) as fp:
+                json.dump({
+                    "links": [[unparse_datetime(ts), lk] for ts, lk in links]
+                }, fp)
+            os.replace(fp.name, self._path)
+        except OSError:
+            logger.warning(
+                    "couldn't store delta link", path=self._path,
+                    exc_info=True)
+
+
 class MailFSBuilder:
     """Utility class to construct folder system for MS Graph mailscanner"""
 
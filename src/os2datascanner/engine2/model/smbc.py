@@ -5,6 +5,9 @@
 
 import io
 import warnings
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from os import stat_result, O_RDONLY
 import enum
 import errno
@@ -21,6 +24,7 @@ from contextlib import contextmanager
 
 from os2datascanner.engine2.rules.utilities.analysis import find_cutoff
 
+from .. import settings as engine2_settings
 from ..utilities.backoff import DefaultRetrier
 from ..utilities.datetime import parse_datetime, unparse_datetime
 from ..conversions.types import OutputType
@@ -28,6 +32,7 @@ from ..conversions.utilities.navigable import make_values_navigable
 from .core import Source, Handle, FileResource
 from .core.errors import UncontactableError
 from .file import stat_attributes
+from .utilities.stat_hints import trusted_hints
 
 
 logger = structlog.get_logger("engine2")
@@ -300,6 +305,51 @@ class SMBCSource(Source):
             # owner
             return None
 
+    def _describe(
+            self, context: smbc.Context, base_url: str,
+            chain_here: list[smbc.FileInfo], owner_sid: str = None):
+        """Returns a (handle, URL, is_directory, updated_timestamp) tuple for
+        the object identified by the last FileInfo in the given chain, or None
+        if that object should be skipped."""
+        *parents, here = chain_here
+
+        if here.name in (".", ".."):
+            return None
+
+        path_here: str = '/'.join([h.name for h in chain_here])
+        url_here: str = base_url + "/" + quote(path_here)
+
+        attrs = self.get_attrs(context, here, url_here)
+        if self._skip_super_hidden and self.is_skippable(here.name, attrs):
+            return None
+
+        hints = {
+            "ctime": unparse_datetime(
+                    ctime := here.ctime.astimezone(gettz())),
+            "mtime": unparse_datetime(
+                    mtime := here.mtime.astimezone(gettz())),
+            "size": here.size,
+        }
+        if owner_sid:
+            hints["owner_sid"] = owner_sid
+        handle_here: 'SMBCHandle' = SMBCHandle(
+                self, path_here, hints=hints)
+
+        # Pick whichever one is newer of the content and metadata change
+        # timestamps
+        return (handle_here, url_here,
+                bool(attrs & smbc.Attribute.DIRECTORY), max(ctime, mtime))
+
+    @staticmethod
+    def _is_before_cutoff(url_here, updated_timestamp, cutoff) -> bool:
+        if cutoff and updated_timestamp <= cutoff:
+            logger.debug(
+                    "skipping file not updated after cutoff",
+                    url_here=url_here,
+                    cutoff=cutoff, updated=updated_timestamp)
+            return True
+        return False
+
     def handles(self, sm, *, rule=None, **kwargs):  # noqa: C901,CCR001
         base_url, context = sm.open(self)
 
@@ -308,31 +358,13 @@ class SMBCSource(Source):
         def handle_fileinfo(  # noqa: C901,CCR001
                 chain_here: list[smbc.FileInfo],
                 owner_sid: str = None):
-            *parents, here = chain_here
-
-            if here.name in (".", ".."):
+            described = self._describe(
+                    context, base_url, chain_here, owner_sid)
+            if described is None:
                 return
+            handle_here, url_here, is_directory, updated = described
 
-            path_here: str = '/'.join([h.name for h in chain_here])
-            url_here: str = base_url + "/" + quote(path_here)
-
-            attrs = self.get_attrs(context, here, url_here)
-            if self._skip_super_hidden and self.is_skippable(here.name, attrs):
-                return
-
-            hints = {
-                "ctime": unparse_datetime(
-                        ctime := here.ctime.astimezone(gettz())),
-                "mtime": unparse_datetime(
-                        mtime := here.mtime.astimezone(gettz())),
-                "size": here.size,
-            }
-            if owner_sid:
-                hints["owner_sid"] = owner_sid
-            handle_here: 'SMBCHandle' = SMBCHandle(
-                    self, path_here, hints=hints)
-
-            if attrs & smbc.Attribute.DIRECTORY:
+            if is_directory:
                 # On every filesystem we care about, creating or deleting
                 # a/b/c.txt will update the modification timestamp on a/b/ but
                 # not on a/, so we always need to explore the complete
@@ -354,21 +386,9 @@ class SMBCSource(Source):
                     return
                 except (ValueError, *IGNORABLE_SMBC_EXCEPTIONS):
                     pass
-            else:
+            elif not self._is_before_cutoff(url_here, updated, cutoff):
                 # We assume anything not tagged as a directory is (scannable as
                 # if it were) a normal file
-
-                if cutoff:
-                    # Pick whichever one is newer of the content and metadata
-                    # change timestamps
-                    updated_timestamp = max(ctime, mtime)
-                    if updated_timestamp <= cutoff:
-                        logger.debug(
-                                "skipping file not updated after cutoff",
-                                url_here=url_here,
-                                cutoff=cutoff, updated=updated_timestamp)
-                        return
-
                 yield handle_here
 
         try:
@@ -380,12 +400,19 @@ class SMBCSource(Source):
             else:
                 raise ex
 
+        workers = engine2_settings.model["smbc"]["workers"]
+        top_level = []
         # Iterate over every folder lying directly under the provided UNC
         while (fileinfo_raw := obj.readdirplus()):
             fileinfo = smbc.FileInfo.from_raw_tuple(fileinfo_raw)
             if fileinfo.name in (".", "..",):
                 continue
 
+            if workers > 1:
+                # Leave this folder to the parallel enumerator below
+                top_level.append(fileinfo)
+                continue
+
             # If we know that the provided UNC is a folder containing user home
             # folders, then compute the owner of each folder here.
             # handle_fileinfo can use this as a hint so SMBCResource doesn't
@@ -396,6 +423,99 @@ class SMBCSource(Source):
                 owner = None
             yield from handle_fileinfo([fileinfo], owner)
 
+        if top_level:
+            yield from self._handles_parallel(
+                    context, base_url, top_level, cutoff, workers)
+
+    def _handles_parallel(  # noqa: C901,CCR001
+            self, context: smbc.Context, base_url: str,
+            top_level: list[smbc.FileInfo], cutoff, workers: int):
+        """Yields the handles below the given top-level FileInfos, listing up
+        to @workers directories at once (each with its own smbc.Context).
+
+        Handles are yielded as soon as the directory that contains them has
+        been listed, so they don't come out in the same order as they would
+        from a sequential walk, but the same handles are produced."""
+        threads = threading.local()
+
+        def _start_thread():
+            threads.context = smbc.Context(auth_fn=self.__auth_handler)
+
+        def _list(url_here):
+            entries = []
+            try:
+                obj = threads.context.opendir(url_here)
+                while (fileinfo_raw := obj.readdirplus()):
+                    entries.append(smbc.FileInfo.from_raw_tuple(fileinfo_raw))
+            except MemoryError as e:
+                return entries, e
+            except (ValueError, *IGNORABLE_SMBC_EXCEPTIONS):
+                pass
+            return entries, None
+
+        def _owner(name):
+            return self._get_owner_for(base_url, threads.context, name)
+
+        # Jobs that haven't been submitted yet, as (function, argument,
+        # callback) tuples. Jobs are taken from the right, so the walk goes
+        # depth-first and this queue doesn't get longer than it needs to
+        pending = deque()
+        running = {}
+
+        def visit(chain_here, owner_sid):
+            described = self._describe(
+                    context, base_url, chain_here, owner_sid)
+            if described is None:
+                return
+            handle_here, url_here, is_directory, updated = described
+
+            if is_directory:
+                def listed(result):
+                    entries, error = result
+                    for fileinfo in entries:
+                        yield from visit(chain_here + [fileinfo], owner_sid)
+                    if error:
+                        # A memory error here means that the path is using
+                        # deprecated encoding. Skip the path and keep going!
+                        logger.warning(
+                                "Skipping handle with memory error",
+                                url_here=url_here)
+                        yield (handle_here, error)
+                pending.append((_list, url_here, listed))
+            elif not self._is_before_cutoff(url_here, updated, cutoff):
+                yield handle_here
+
+        for fileinfo in reversed(top_level):
+            if self._unc_is_home_root:
+                # Work out the owner of each home folder in the background,
+                # too
+                pending.append((
+                        _owner, fileinfo.name,
+                        lambda owner, fi=fileinfo: visit([fi], owner)))
+            else:
+                pending.append((
+                        None, None, lambda _, fi=fileinfo: visit([fi], None)))
+
+        pool = ThreadPoolExecutor(
+                workers, thread_name_prefix="smbc-enumerator",
+                initializer=_start_thread)
+        try:
+            while pending or running:
+                # Keep every thread busy, plus a few jobs in reserve
+                while pending and len(running) < 2 * workers:
+                    function, argument, callback = pending.pop()
+                    if function is None:
+                        yield from callback(None)
+                        continue
+                    running[pool.submit(function, argument)] = callback
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from running.pop(future)(future.result())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
     # For our own purposes, we need to be able to make a "smb://" URL to give
     # to pysmbc. That URL doesn't need to contain authentication details,
     # though, as our __auth_handler function takes care of that
@@ -540,6 +660,8 @@ class SMBCResource(FileResource):
         return self._mr
 
     def get_size(self):
+        if not self._mr and (hinted := trusted_hints(self, "size")):
+            return hinted[0]
         return self.unpack_stat()["st_size"]
 
     def get_last_modified(self):
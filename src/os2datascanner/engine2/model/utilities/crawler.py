@@ -4,14 +4,19 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 
 import re
+import copy
+import threading
 from abc import ABC, abstractmethod
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from lxml.html import HtmlElement, document_fromstring
 from lxml.etree import ParserError
 from urllib.parse import urlsplit, urlunsplit, SplitResult
 import structlog
 import requests
 
-from os2datascanner.engine2.factory import make_webretrier
+from os2datascanner.engine2.factory import make_session, make_webretrier
 from os2datascanner.engine2.conversions.types import Link
 
 logger = structlog.get_logger("engine2")
@@ -23,7 +28,7 @@ class Crawler(ABC):
     def __init__(self, ttl=10):
         self.ttl = ttl
         self.visited = set()
-        self.to_visit = list()
+        self.to_visit = deque()
         self._visiting = None
         self._frozen = False
 
@@ -70,7 +75,7 @@ class Crawler(ABC):
     def visit(self):
         """Recursively visits all of the objects added to this Crawler."""
         while self.to_visit:
-            (head, ttl, hints), *self.to_visit = self.to_visit
+            head, ttl, hints = self.to_visit.popleft()
             self._visiting = head
             try:
                 adapted = self._adapt(head)
@@ -119,9 +124,23 @@ def simplify_mime_type(mime):
 
 
 class WebCrawler(Crawler):
+    """A WebCrawler is a Crawler that explores a website by following the links
+    in its HTML pages.
+
+    Objects are always visited one at a time, in the order in which they were
+    discovered, but a WebCrawler with more than one worker will also fetch the
+    objects at the front of its queue in the background while it's waiting for
+    the current one, at most per_host of them at a time from any one host.
+
+    (requests.Session objects aren't safe to share between threads, so each of
+    those background threads makes its own by calling session_factory and
+    copying the given session's headers into it.)"""
+
     def __init__(
             self, url: str, session: requests.Session,
-            *args, allow_element_hints=False, retrier=None, **kwargs):
+            *args, allow_element_hints=False, retrier=None,
+            workers: int = 1, per_host: int = 1,
+            session_factory=make_session, **kwargs):
         super().__init__(*args, **kwargs)
         self._url = url
         self._split_url = urlsplit(url)
@@ -130,11 +149,41 @@ class WebCrawler(Crawler):
         self._allow_element_hints = allow_element_hints
         self.exclusions = set()
 
+        self._workers = workers
+        self._per_host = per_host
+        self._session_factory = session_factory
+        self._thread_sessions = []
+        self._executor = None
+        self._prefetched = {}
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_retrier(self):
+        # Retriers keep track of their attempts, so each thread needs its own
+        if self._executor is None:
+            return self._retrier
+        if (retrier := getattr(self._local, "retrier", None)) is None:
+            retrier = self._local.retrier = copy.copy(self._retrier)
+        return retrier
+
+    def _start_thread(self):
+        session = self._session_factory()
+        session.headers.update(self._session.headers)
+        self._local.session = session
+        with self._hosts_lock:
+            self._thread_sessions.append(session)
+
+    def _get_session(self) -> requests.Session:
+        return getattr(self._local, "session", self._session)
+
     def get(self, *args, **kwargs):
-        return self._retrier.run(self._session.get, *args, **kwargs)
+        return self._get_retrier().run(
+                self._get_session().get, *args, **kwargs)
 
     def head(self, *args, **kwargs):
-        return self._retrier.run(self._session.head, *args, **kwargs)
+        return self._get_retrier().run(
+                self._get_session().head, *args, **kwargs)
 
     def exclude(self, *exclusions):
         self.exclusions.update(exclusions)
@@ -192,8 +241,19 @@ class WebCrawler(Crawler):
                     extra_hints["true_url"] = true_url
             self.add(link.url, new_ttl, **extra_hints)
 
-    def visit_one(self, url: str, ttl: int, hints):  # noqa CCR001
-        if ttl > 0 and self.is_crawlable(url) and not self._frozen:
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        netloc = urlsplit(url).netloc
+        with self._hosts_lock:
+            if (slot := self._hosts.get(netloc)) is None:
+                slot = self._hosts[netloc] = threading.BoundedSemaphore(
+                        self._per_host)
+            return slot
+
+    def _fetch(self, url: str) -> requests.Response:
+        """Retrieves the response that visiting a URL should examine: the
+        response to a HEAD request, or to a GET request if that's needed to
+        find the URL's outlinks."""
+        with self._host_slot(url):
             response = self.head(url)
 
             if response.status_code == 405:
@@ -201,6 +261,62 @@ class WebCrawler(Crawler):
                 # well, let's use GET instead
                 response = self.get(url)
 
+            if (response.status_code == 200
+                    and simplify_mime_type(response.headers.get(
+                            "Content-Type", "application/octet-stream")
+                    ).lower() == "text/html"
+                    and not response.content):
+                response = self.get(url)
+        return response
+
+    def _lookahead(self):
+        """Starts fetching, in the background, the objects at the front of the
+        queue that are likely to be visited soon."""
+        if self._executor is None or self._frozen:
+            return
+        # (Many of the objects at the front of the queue will have been
+        # visited already, so look a little further ahead than that)
+        for url, ttl, _ in islice(self.to_visit, 8 * self._workers):
+            if len(self._prefetched) >= self._workers:
+                break
+            adapted = self._adapt(url)
+            if (ttl > 0 and adapted not in self._prefetched
+                    and adapted not in self.visited
+                    and self.is_crawlable(url)):
+                self._prefetched[adapted] = self._executor.submit(
+                        self._fetch, url)
+
+    def _fetched(self, url: str) -> requests.Response:
+        if (future := self._prefetched.pop(self._adapt(url), None)):
+            return future.result()
+        return self._fetch(url)
+
+    def visit(self):
+        if self._workers <= 1:
+            yield from super().visit()
+            return
+
+        self._executor = ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix="WebCrawler",
+                initializer=self._start_thread)
+        try:
+            yield from super().visit()
+        finally:
+            # Don't leave requests running in the background once the caller
+            # has stopped listening
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._prefetched.clear()
+            for session in self._thread_sessions:
+                session.close()
+            self._thread_sessions.clear()
+
+    def visit_one(self, url: str, ttl: int, hints):  # noqa CCR001
+        if ttl > 0 and self.is_crawlable(url) and not self._frozen:
+            self._lookahead()
+            response = self._fetched(url)
+
             if response.status_code == 200:
                 ct = response.headers.get(
                         "Content-Type", "application/octet-stream")
@@ -212,8 +328,6 @@ class WebCrawler(Crawler):
                         pass
 
                 if simplify_mime_type(ct).lower() == "text/html":
-                    if not response.content:
-                        response = self.get(url)
                     doc = parse_html(response.content, url)
 
                     if self._allow_element_hints and not hints.get("title"):
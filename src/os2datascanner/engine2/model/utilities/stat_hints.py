@@ -0,0 +1,53 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from collections import Counter
+from datetime import timedelta
+import threading
+from typing import Optional
+
+from os2datascanner.utils.system_utilities import time_now
+from ... import settings as engine2_settings
+from ...utilities.datetime import parse_datetime
+
+
+_lock = threading.Lock()
+stats_avoided: Counter[str] = Counter()
+"""The number of times that each type of Resource has answered a question from
+its Handle's hints instead of asking the server for the object's metadata.
+(Every call to trusted_hints that returns values counts as one of these, so
+Resources should only call it when they don't already have that metadata.)"""
+
+
+def trusted_hints(resource, *names: str) -> Optional[tuple]:
+    """Returns the values of the named hints of a Resource's Handle, or None if
+    any of them is missing or if the hints can't be trusted.
+
+    Hints are recorded when a Source is explored, so they describe an object as
+    it was at that point. The [model.hints] settings decide whether or not
+    they can stand in for the object's current metadata: if trust is false,
+    they never do, and if min_age is greater than zero, they only do for
+    objects whose hinted modification time is at least that many seconds
+    before now (as an object that was modified just before it was found may
+    not have settled yet, and may have changed again since)."""
+    policy = engine2_settings.model["hints"]
+    if not policy["trust"]:
+        return None
+
+    handle = resource.handle
+    values = tuple(handle.hint(name) for name in names)
+    if any(v is None for v in values):
+        return None
+
+    if (min_age := policy["min_age"]) > 0:
+        mtime = handle.hint("mtime")
+        if (mtime is None
+                or time_now() - parse_datetime(mtime)
+                < timedelta(seconds=min_age)):
+            return None
+
+    with _lock:
+        stats_avoided[type(resource).__name__] += 1
+    return values
@@ -0,0 +1,110 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import hashlib
+
+
+HEAD_SIZE = 512
+"""The number of bytes at the start of an object that libmagic needs to see to
+compute its type."""
+
+
+class TeeStream:
+    """A TeeStream wraps a read-only binary stream, passing everything read
+    through it on to its reader unchanged while also recording facts about the
+    content in a dictionary:
+
+    * "head", the first HEAD_SIZE bytes of the content (or all of it, if it's
+      shorter than that);
+    * "size", the number of bytes in the content; and
+    * "content_identifier", the hexdigest of the BLAKE2b hash of the content
+      (only if the identify flag is set, as hashing every byte of every
+      object isn't free).
+
+    The last two are only recorded once the content has been read from start
+    to end without any seeking. Reading the content in any other way is
+    harmless, but means that these facts won't be recorded."""
+
+    def __init__(self, stream, observations: dict, *, identify: bool = False):
+        self._stream = stream
+        self._observations = observations
+
+        self._observing = True
+        self._head = bytearray()
+        self._size = 0
+        self._hasher = hashlib.blake2b() if identify else None
+
+    @property
+    def observations(self) -> dict:
+        return self._observations
+
+    def _observe(self, data: bytes, *, eof: bool) -> bytes:
+        if not self._observing:
+            return data
+
+        if len(self._head) < HEAD_SIZE:
+            self._head += data[:HEAD_SIZE - len(self._head)]
+            if len(self._head) == HEAD_SIZE or eof:
+                self._observations.setdefault("head", bytes(self._head))
+        self._size += len(data)
+        if self._hasher:
+            self._hasher.update(data)
+
+        if eof:
+            self._observations["size"] = self._size
+            if self._hasher:
+                self._observations["content_identifier"] = (
+                        self._hasher.hexdigest())
+            self._observing = False
+        return data
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if data is None:
+            # (A non-blocking stream with nothing to read yet)
+            return data
+        return self._observe(
+                data, eof=not data or size is None or size < 0)
+
+    def read1(self, size=-1):
+        read1 = getattr(self._stream, "read1", self._stream.read)
+        data = read1(size)
+        return self._observe(data, eof=not data and size != 0)
+
+    def readinto(self, b):
+        count = self._stream.readinto(b)
+        if count is None:
+            return count
+        self._observe(
+                bytes(memoryview(b)[:count]), eof=not count and len(b) > 0)
+        return count
+
+    def readline(self, size=-1):
+        data = self._stream.readline(size)
+        return self._observe(data, eof=not data and size != 0)
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def seek(self, offset, whence=0):
+        position = self._stream.seek(offset, whence)
+        if position != self._size:
+            # Whatever is read next won't follow on from what's been observed
+            self._observing = False
+        return position
+
+    def __getattr__(self, name):
+        # Everything else (tell, seekable, close, name, and so on) comes
+        # straight from the wrapped stream
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, backtrace):
+        self._stream.close()
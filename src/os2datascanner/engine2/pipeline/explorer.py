@@ -3,18 +3,22 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, you can
 # obtain one at http://mozilla.org/MPL/2.0/.
 from collections.abc import Generator
+import time
 import structlog
 
 from os2datascanner.engine2.model.core.utilities import SourceManager
 from os2datascanner.engine2.utilities.i18n import gettext as _
+from .. import settings
 from ..model.core import (Source, UnknownSchemeError, DeserialisationError)
 from ..model.core.errors import (ModelException,
                                  UncontactableError,
                                  UnauthorisedError,
                                  UnavailableError)
+from ..rules.utilities.analysis import find_cutoff
 from . import messages
 from .utilities.stage import dispatch
 from .utilities.filtering import is_handle_relevant
+from .utilities.manifest import open_manifest
 
 logger = structlog.get_logger("explorer")
 
@@ -43,11 +47,48 @@ def process_exploration_error(scan_spec, handle_candidate, ex):
             scan_tag=scan_spec.scan_tag, handle=handle_candidate)
 
 
+class _ObjectCounter:
+    """Sums up the objects that an explorer has published, so that they can be
+    reported to the admin system in a StatusMessage every so often rather than
+    in one StatusMessage per object. (A count is reported once the
+    [pipeline.explorer] status_batch setting's number of objects has been
+    published or status_interval seconds have passed since the last report,
+    whichever comes first.)"""
+
+    def __init__(self, scan_tag: messages.ScanTagFragment):
+        self._scan_tag = scan_tag
+        self._pending = 0
+        self._reported_at = time.monotonic()
+
+    def add(self) -> messages.StatusMessage | None:
+        """Counts a published object, returning a StatusMessage if it's time
+        to report the count."""
+        config = settings.pipeline["explorer"]
+        self._pending += 1
+        if (self._pending >= config["status_batch"]
+                or time.monotonic() - self._reported_at
+                >= config["status_interval"]):
+            return self.flush()
+        return None
+
+    def flush(self) -> messages.StatusMessage | None:
+        """Returns a StatusMessage reporting every object that has been
+        counted but not yet reported, if there are any."""
+        if not self._pending:
+            return None
+        message = messages.StatusMessage(
+                scan_tag=self._scan_tag, new_objects=self._pending)
+        self._pending = 0
+        self._reported_at = time.monotonic()
+        return message
+
+
 def message_received(  # noqa: CCR001
         message: messages.ScanSpecMessage,
         sm: SourceManager) -> Generator[messages.SerialisableMessage]:
     error_count = 0
     handle_count = 0
+    unchanged_count = 0
     source_count = None
     exception_message = ""
 
@@ -71,7 +112,17 @@ def message_received(  # noqa: CCR001
 
     log = logger.bind(scan_tag=message.scan_tag)
 
-    handle_iterator = message.source.handles(sm, rule=progress.rule)
+    # Only incremental scans (which have a Last-Modified cutoff) may skip
+    # objects that haven't changed since they were last scanned; a forced scan
+    # should look at everything again
+    manifest = None
+    if find_cutoff(message.rule) is not None:
+        manifest = open_manifest(
+                message.source, message.rule, message.configuration)
+
+    counter = _ObjectCounter(message.scan_tag)
+    handle_iterator = message.source.handles(
+            sm, rule=progress.rule, scan_time=message.scan_tag.time)
     try:
         for handle in handle_iterator:
             if isinstance(handle, tuple) and handle[1]:
@@ -89,20 +140,26 @@ def message_received(  # noqa: CCR001
 
             if not message.source.yields_independent_sources:
                 # This Handle is just a normal reference to a scannable object.
-                # Send it on to be processed
+                # Send it on to be processed, unless it hasn't changed since
+                # it was last scanned
+                if manifest and manifest.is_unchanged(handle):
+                    unchanged_count += 1
+                    continue
 
                 yield messages.ConversionMessage(
                         scan_spec=message,
                         handle=handle,
                         progress=progress)
                 handle_count += 1
-                # Count it now that it is out, and never before. This message is
+                # Count it now that it is out, and never before. The count is
                 # published after the ConversionMessage of the object it counts.
                 # Opposite order would send a count for work that was never
                 # published, which nothing later can retract, and the scanner
-                # would never complete.
-                yield messages.StatusMessage(
-                        scan_tag=message.scan_tag, new_objects=1)
+                # would never complete. (Counts may be held back for a while,
+                # but they're always published before the terminal message,
+                # and so before this Source can be considered explored.)
+                if (status := counter.add()):
+                    yield status
             else:
                 # This Handle is a thin wrapper around an independent Source.
                 # Construct that Source and enqueue it for further exploration.
@@ -120,7 +177,7 @@ def message_received(  # noqa: CCR001
         log.info(
                 "finished",
                 error_count=error_count, handle_count=handle_count,
-                source_count=source_count)
+                unchanged_count=unchanged_count, source_count=source_count)
     except Exception as e:
         exp_args = {
             "type": type(e).__name__,
@@ -156,6 +213,10 @@ def message_received(  # noqa: CCR001
         # good form to clean up
         if hasattr(handle_iterator, "close"):
             handle_iterator.close()
+        if manifest:
+            manifest.close()
+        if (status := counter.flush()):
+            yield status
         # Objects and sub-Sources were both reported one by one as they were
         # found, so the totals here are only for admin systems that don't
         # understand those reports: pre 3.32.4
@@ -10,13 +10,16 @@ import structlog
 from os2datascanner.engine2.model.core.utilities import SourceManager
 from os2datascanner.engine2.model.ewscalendar import EWSCalendarContentHandle
 
-from ..conversions.types import decode_dict
+from ..conversions.types import OutputType
+from ..conversions.utilities.windows import WindowedText
 from ...utils.replace_regions import replace_regions
 from . import messages
 from .utilities.stage import dispatch
 from .. import settings
 from os2datascanner.engine2.rules.last_modified import LastModifiedRule
 from os2datascanner.engine2.rules.rule import Rule, SimpleRule
+from os2datascanner.engine2.rules.utilities.memo import MatchMemo
+from os2datascanner.engine2.rules.utilities.plan import TextRulePlan
 
 logger = structlog.get_logger("matcher")
 
@@ -87,22 +90,36 @@ def postprocess_match(
 
 def message_received(  # noqa: CCR001,E501 too high cognitive complexity
         message: messages.RepresentationMessage,
-        sm: SourceManager) -> Generator[messages.SerialisableMessage]:
-    representations = decode_dict(message.representations)
+        sm: SourceManager,
+        *, memo: MatchMemo = None) -> Generator[messages.SerialisableMessage]:
+    # (Rule.try_match modifies the dictionary it's given, so take a shallow
+    # copy; the representations themselves are not copied)
+    representations = dict(message.representations)
+    if isinstance(text := representations.get(OutputType.Text.value), WindowedText):
+        # Windowed texts are read straight from the source as they're matched
+        text.bind(sm)
     rule = message.progress.rule
     logger.debug(f"{message.handle} with rules [{rule.presentation}] "
                  f"and representation [{list(representations.keys())}]")
 
     try:
+        # If we have a text, let text rules that can share a pass over it be
+        # evaluated together
+        plan = (TextRulePlan.compile(rule)
+                if isinstance(representations.get(OutputType.Text.value), str)
+                else None)
+
         # Keep executing rules for as long as we can with the representations
         # we have
         conclusion, new_matches = rule.try_match(
                 representations,
-                obj_limit=max(1, settings.pipeline["matcher"]["obj_limit"]))
+                obj_limit=max(1, settings.pipeline["matcher"]["obj_limit"]),
+                plan=plan, memo=memo)
 
         # Convoluted way of checking if we _did not_ match on LastModifiedRule,
         # meaning that we won't be scanning its content again.
-        if not conclusion and isinstance(new_matches[0][0], LastModifiedRule):
+        if (not conclusion and new_matches
+                and isinstance(new_matches[0][0], LastModifiedRule)):
             yield messages.StatusMessage(
                 scan_tag=message.scan_spec.scan_tag,
                 skipped_by_last_modified=1)
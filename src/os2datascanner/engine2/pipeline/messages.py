@@ -19,6 +19,9 @@ from ..utilities.datetime import parse_datetime
 from ..model.core import Handle, Source
 from ..model.core.errors import DeserialisationError
 from ..rules.rule import Rule, SimpleRule
+from ..rules.utilities.rule_cache import get_rule_cache
+from ..conversions.types import encode_dict, decode_dict
+from .utilities.spec_store import SpecStore, resolve
 
 
 logger = structlog.get_logger("engine2")
@@ -82,7 +85,7 @@ class MatchFragment:
     def from_json_object(cls, obj: dict) -> MatchFragment:
         require_fields(cls, obj, "rule", "matches")
         return MatchFragment(
-                rule=Rule.from_json_object(obj["rule"]),
+                rule=get_rule_cache().from_json_object(obj["rule"]),
                 matches=obj["matches"])
 
 
@@ -94,9 +97,10 @@ class ProgressFragment:
     rule: Rule
     matches: list[MatchFragment]
 
-    def to_json_object(self):
+    def to_json_object(self, *, store: Optional[SpecStore] = None):
         return {
-            "rule": self.rule.to_json_object(),
+            "rule": (store.reference(self.rule)
+                     if store else self.rule.to_json_object()),
             "matches": [m.to_json_object() for m in self.matches]
         }
 
@@ -104,7 +108,7 @@ class ProgressFragment:
     def from_json_object(cls, obj: dict) -> ProgressFragment:
         require_fields(cls, obj, "rule", "matches")
         return ProgressFragment(
-                rule=Rule.from_json_object(obj["rule"]),
+                rule=resolve(obj["rule"], get_rule_cache().from_json_object),
                 matches=[MatchFragment.from_json_object(mf)
                          for mf in obj["matches"]])
 
@@ -345,6 +349,10 @@ class ScanSpecMessage:
 
     @classmethod
     def from_json_object(cls, obj: dict) -> ScanSpecMessage:
+        if "interned" in obj:
+            # This is a reference to a scan spec in the SpecStore (see
+            # ConversionMessage.to_json_object)
+            return resolve(obj, cls.from_json_object)
         require_fields(cls, obj, "scan_tag", "source", "rule")
         # The progress fragment is only present when a scan spec is based on a
         # derived source and so already contains scan progress information
@@ -353,13 +361,13 @@ class ScanSpecMessage:
         return ScanSpecMessage(
                 scan_tag=ScanTagFragment.from_json_object(obj["scan_tag"]),
                 source=Source.from_json_object(obj["source"]),
-                rule=Rule.from_json_object(obj["rule"]),
+                rule=get_rule_cache().from_json_object(obj["rule"]),
                 # The configuration dictionary was added fairly late to scan
                 # specs, so not all clients will send it. Add an empty one if
                 # necessary
                 configuration=obj.get("configuration", {}),
                 filter_rule=(
-                    SimpleRule.from_json_object(filter_rule)
+                    get_rule_cache().from_json_object(filter_rule)
                     if filter_rule
                     else None),
                 progress=(
@@ -394,11 +402,15 @@ class ConversionMessage:
     progress: ProgressFragment
     """The progress made through the evaluation of the rule so far."""
 
-    def to_json_object(self):
+    def to_json_object(self, *, store: Optional[SpecStore] = None):
+        """Returns the JSON representation of this message. If a SpecStore is
+        given, the scan spec and the Rule are recorded in it, and the JSON
+        representation refers to them instead of containing them."""
         return {
-            "scan_spec": self.scan_spec.to_json_object(),
+            "scan_spec": (store.reference(self.scan_spec)
+                          if store else self.scan_spec.to_json_object()),
             "handle": self.handle.to_json_object(),
-            "progress": self.progress.to_json_object()
+            "progress": self.progress.to_json_object(store=store)
         }
 
     @classmethod
@@ -429,14 +441,22 @@ class RepresentationMessage:
 
     representations: dict
     """The representations of the object made available to the pipeline's
-    matcher stage."""
+    matcher stage, as a dictionary mapping OutputType values to objects.
 
-    def to_json_object(self):
+    These objects are only converted to and from their JSON-friendly forms
+    when this message is serialised, so stages that run in the same process
+    can pass them along (including their navigable parent values) without
+    copying them."""
+
+    def to_json_object(self, *, store: Optional[SpecStore] = None):
+        """Returns the JSON representation of this message. (See
+        ConversionMessage.to_json_object for the meaning of store.)"""
         return {
-            "scan_spec": self.scan_spec.to_json_object(),
+            "scan_spec": (store.reference(self.scan_spec)
+                          if store else self.scan_spec.to_json_object()),
             "handle": self.handle.to_json_object(),
-            "progress": self.progress.to_json_object(),
-            "representations": self.representations
+            "progress": self.progress.to_json_object(store=store),
+            "representations": encode_dict(self.representations)
         }
 
     @classmethod
@@ -447,7 +467,7 @@ class RepresentationMessage:
                 scan_spec=ScanSpecMessage.from_json_object(obj["scan_spec"]),
                 handle=Handle.from_json_object(obj["handle"]),
                 progress=ProgressFragment.from_json_object(obj["progress"]),
-                representations=obj["representations"])
+                representations=decode_dict(obj["representations"]))
 
 
 @dataclass(frozen=True, slots=True, kw_only=True)
@@ -741,6 +761,11 @@ class StatusMessage:
     This is usually the hash value of the object's content or another string that
     uniquely identifies the content of an object."""
 
+    rule_cache_hits: Optional[int] = None
+    """The number of rule evaluations that were avoided while scanning the
+    object that has just been scanned, because the same rule had already been
+    evaluated against the same object."""
+
     def to_json_object(self):
         return {
             "scan_tag": self.scan_tag.to_json_object(),
@@ -760,6 +785,7 @@ class StatusMessage:
             "content_identifier": self.content_identifier,
 
             "process_time_worker": self.process_time_worker,
+            "rule_cache_hits": self.rule_cache_hits,
         }
 
     @classmethod
@@ -781,7 +807,8 @@ class StatusMessage:
                 object_size=obj.get("object_size"),
                 object_type=obj.get("object_type"),
                 process_time_worker=obj.get("process_time_worker"),
-                content_identifier=obj.get("content_identifier"))
+                content_identifier=obj.get("content_identifier"),
+                rule_cache_hits=obj.get("rule_cache_hits"))
 
 
 @dataclass(frozen=True, slots=True, kw_only=True)
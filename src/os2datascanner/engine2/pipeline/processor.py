@@ -6,6 +6,8 @@
 from collections.abc import Generator
 from typing import Any
 import random
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 import structlog
 from urllib.error import HTTPError
 
@@ -16,12 +18,37 @@ from ..model.core import Source
 from ..utilities.backoff import TimeoutRetrier
 from ..conversions import convert, conversion_exists
 from ..conversions.abort import current_abort_check
-from ..conversions.types import OutputType, encode_dict
+from ..conversions.types import OutputType
+from ..conversions.utilities.cache import get_content_cache
 from ..conversions.utilities.navigable import make_navigable
 from . import messages
 logger = structlog.get_logger("processor")
 
 
+class ContentCacheCollector:
+    """Exports the statistics of this process's ContentCache, if there is
+    one."""
+
+    def collect(self):
+        if (content_cache := get_content_cache()) is None:
+            return
+        yield CounterMetricFamily(
+                "os2datascanner_pipeline_processor_content_cache_hits",
+                "Representations reused from the content cache",
+                value=content_cache.hits)
+        yield CounterMetricFamily(
+                "os2datascanner_pipeline_processor_content_cache_misses",
+                "Representations converted and added to the content cache",
+                value=content_cache.misses)
+        yield GaugeMetricFamily(
+                "os2datascanner_pipeline_processor_content_cache_size",
+                "Approximate size of the content cache in bytes",
+                value=content_cache.size)
+
+
+REGISTRY.register(ContentCacheCollector())
+
+
 def check(source_manager, handle):
     """
     Runs Resource.check() on the top-level Handle behind a given Handle.
@@ -123,25 +150,40 @@ def message_received_raw(body, channel, source_manager, *, _check=True):
             (messages.ScanSpecMessage, ["os2ds_scan_specs"]))
 
 
+def convert_cached(resource, output_type):
+    """Converts a Resource to the specified OutputType, reusing a previous
+    conversion of identical content if the content cache is enabled."""
+    if (content_cache := get_content_cache()) is not None:
+        return content_cache.convert(resource, output_type)
+    return convert(resource, output_type)
+
+
+def is_skipped(configuration: dict, mime_type: str) -> bool:
+    """Indicates whether or not a scan configuration asks for objects of the
+    given type not to be converted to text."""
+    for mt in configuration.get("skip_mime_types", []):
+        if (mt.endswith("*") and mime_type.startswith(mt[:-1])) or (mime_type == mt):
+            # mt is a simple wildcard ("image/*") that matches the
+            # computed MIME type of this file.
+            # If that, or mt matches the computed MIME type of this file exactly then ...
+            return True
+    return False
+
+
 def do_conversion(resource, conversion, retrier, source_manager):  # noqa, CCR001 Cognitive complexity
     required = conversion.progress.rule.split()[0].operates_on
     configuration = conversion.scan_spec.configuration
-    skip_mime_types = configuration.get("skip_mime_types", [])
 
     mime_type = resource.compute_type()
 
     # Check if we're supposed to handle images (OCR)
-    if required in (OutputType.Text, OutputType.MRZ):
-        for mt in skip_mime_types:
-            if (mt.endswith("*") and mime_type.startswith(mt[:-1])) or (mime_type == mt):
-                # mt is a simple wildcard ("image/*") that matches the
-                # computed MIME type of this file.
-                # If that, or mt matches the computed MIME type of this file exactly then ...
-                return None  # ... skip conversion
+    if (required in (OutputType.Text, OutputType.MRZ)
+            and is_skipped(configuration, mime_type)):
+        return None  # ... skip conversion
 
     # If we have an appropriate conversion registered, go ahead.
     if conversion_exists(resource, required):
-        return retrier.run(convert, resource, required)
+        return retrier.run(convert_cached, resource, required)
 
     else:
         # Hm, we didn't have any appropriate conversion at hand.
@@ -165,7 +207,7 @@ def do_conversion(resource, conversion, retrier, source_manager):  # noqa, CCR00
                          rewound_handle=handle,
                          output_type=required
                 )
-                return retrier.run(convert, resource, required)
+                return retrier.run(convert_cached, resource, required)
 
         # Size has no generic converter; a missing size should NOT trigger Source reinterpretation
         if required == OutputType.Size:
@@ -198,7 +240,7 @@ def emit_representation(
             scan_spec=conversion.scan_spec,
             handle=conversion.handle,
             progress=conversion.progress,
-            representations=encode_dict(dv))
+            representations=dv)
 
 
 def handle_conversion_key_error(
@@ -5,7 +5,6 @@
 
 import os
 import sys
-import gzip
 import json
 from typing import override
 
@@ -28,7 +27,8 @@ from . import explorer, exporter, matcher, messages, processor, tagger, worker
 from .utilities.pika import (ANON_QUEUE,
                              RejectMessage,
                              PikaPipelineThread,
-                             HandleMessageType)
+                             HandleMessageType,
+                             decode_body)
 
 logger = structlog.get_logger("run_stage")
 
@@ -220,10 +220,9 @@ class GenericRunner(PikaPipelineThread):
                 or method.routing_key == anon_queue)
         if is_command:
             try:
-                raw = gzip.decompress(body) if getattr(
-                        properties, "content_encoding", None) == "gzip" else body
                 self._dispatch_command(
-                        messages.CommandMessage.from_json_object(json.loads(raw)))
+                        messages.CommandMessage.from_json_object(
+                                json.loads(decode_body(properties, body))))
             except Exception:
                 logger.warning("Couldn't parse command message! Discarding and moving on..")
                 pass  # Parsing failed; log a warning and discard silently
@@ -450,6 +449,9 @@ class GenericRunner(PikaPipelineThread):
                         "ignoring")
                 raise RejectMessage(requeue=False)
 
+        # The content of objects seen in previous messages might have changed
+        # since, so what was observed about it can't be relied upon
+        self._source_manager.forget_observations()
         for result in self._module.message_received_raw(
                 body, routing_key, self._source_manager):
             if scan_tag and scan_tag in self._cancelled:
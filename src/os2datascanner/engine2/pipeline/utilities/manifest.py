@@ -0,0 +1,163 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Persistent records of the objects found in each Source, so that incremental
+scans can skip objects that haven't changed since they were last scanned."""
+
+from hashlib import blake2b
+import json
+import os
+import sqlite3
+from typing import Optional
+import structlog
+
+from ... import settings
+from ...model.core import Handle, Source
+from ...rules.rule import Rule
+
+logger = structlog.get_logger("engine2")
+
+
+VERDICTS = ("matched", "clean", "problem",)
+"""The possible outcomes of scanning an object. Objects whose last scan ended
+with a problem are always scanned again."""
+
+
+def _is_cutoff(obj) -> bool:
+    return isinstance(obj, dict) and obj.get("type") == "last-modified"
+
+
+def _without_cutoffs(obj):
+    """Removes the LastModifiedRules from the JSON representation of a Rule.
+    (Their timestamps change from scan to scan, and they're left out entirely
+    when a scan is forced, but they don't affect whether or not an object that
+    has been scanned would match.)"""
+    match obj:
+        case {"type": "and", "components": list(components)}:
+            kept = [_without_cutoffs(c) for c in components
+                    if not _is_cutoff(c)]
+            return kept[0] if len(kept) == 1 else obj | {"components": kept}
+        case {"type": "last-modified"}:
+            return None
+        case dict():
+            return {k: _without_cutoffs(v) for k, v in obj.items()}
+        case list():
+            return [_without_cutoffs(v) for v in obj]
+        case _:
+            return obj
+
+
+class Manifest:
+    """A Manifest records, for every object in a Source that has been scanned
+    with a particular Rule and configuration, the size and modification time
+    hints that the object had when it was found and the verdict of the last
+    scan of it.
+
+    Objects are recorded under their path relative to the Source, so an object
+    that has been moved or renamed since it was last scanned is scanned again.
+    (Recognising it by its content would mean reading it, which is what
+    skipping it is meant to avoid.)
+
+    Manifests are stored as SQLite databases in the directory named by the
+    [pipeline.manifest] settings, one for each scope (see Manifest.scope). The
+    worker writes to them, and the explorer reads them."""
+
+    def __init__(self, path: str):
+        # (Workers keep Manifests open from one message to the next, and
+        # needn't handle every message on the same thread)
+        self._db = sqlite3.connect(
+                path, timeout=settings.pipeline["manifest"]["timeout"],
+                check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS objects ("
+                    " path TEXT PRIMARY KEY,"
+                    " size INTEGER,"
+                    " mtime TEXT,"
+                    " verdict TEXT NOT NULL)")
+
+    @staticmethod
+    def scope(source: Source, rule: Rule, configuration: dict) -> str:
+        """Returns a fingerprint of a Source, a Rule and a scan configuration.
+        A verdict recorded under one scope says nothing about any other one."""
+        canonical = json.dumps(
+                [
+                    source.to_json_object(),
+                    _without_cutoffs(rule.to_json_object()),
+                    configuration or {},
+                ],
+                sort_keys=True, separators=(",", ":"), default=str)
+        return blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, handle: Handle) -> Optional[dict]:
+        """Returns the record of a Handle in this Manifest, if there is one."""
+        row = self._db.execute(
+                "SELECT size, mtime, verdict FROM objects WHERE path = ?",
+                (handle.relative_path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime", "verdict"), row))
+
+    def is_unchanged(self, handle: Handle) -> bool:
+        """Indicates whether or not a freshly found Handle refers to an object
+        that was successfully scanned when it had the same size and
+        modification time as it has now."""
+        if handle.hint("mtime") is None or handle.hint("size") is None:
+            return False
+        try:
+            record = self.get(handle)
+        except sqlite3.Error:
+            logger.warning(
+                    "couldn't read manifest", handle=handle, exc_info=True)
+            return False
+        return (record is not None
+                and record["verdict"] != "problem"
+                and record["mtime"] == handle.hint("mtime")
+                and record["size"] == int(handle.hint("size")))
+
+    def record(self, handle: Handle, verdict: str):
+        """Records the outcome of scanning the object referred to by a
+        Handle, along with the hints that the Handle carried when the object
+        was found. (Handles without size and modification time hints can
+        never be skipped, so they aren't recorded.)"""
+        if verdict not in VERDICTS:
+            raise ValueError(verdict)
+        if handle.hint("mtime") is None or handle.hint("size") is None:
+            return
+        try:
+            with self._db:
+                self._db.execute(
+                        "INSERT OR REPLACE INTO objects"
+                        " (path, size, mtime, verdict)"
+                        " VALUES (?, ?, ?, ?)",
+                        (handle.relative_path, int(handle.hint("size")),
+                         handle.hint("mtime"), verdict))
+        except sqlite3.Error:
+            logger.warning(
+                    "couldn't write to manifest", handle=handle, exc_info=True)
+
+    def close(self):
+        self._db.close()
+
+
+def open_manifest(
+        source: Source, rule: Rule,
+        configuration: dict) -> Optional[Manifest]:
+    """Opens the Manifest for a Source scanned with a Rule and configuration.
+    Returns None if manifests are disabled or if the Manifest couldn't be
+    opened; scans should then carry on as though it were empty."""
+    directory = settings.pipeline["manifest"]["directory"]
+    if not directory:
+        return None
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return Manifest(os.path.join(
+                directory,
+                Manifest.scope(source, rule, configuration) + ".sqlite3"))
+    except (OSError, sqlite3.Error):
+        logger.warning(
+                "couldn't open manifest", source=source, exc_info=True)
+        return None
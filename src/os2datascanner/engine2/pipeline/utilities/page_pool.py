@@ -0,0 +1,242 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""A pool of processes for handling the pages of a large PDF in parallel.
+
+Each page of a PDF is extracted, converted (including OCR) and matched by the
+worker independently of the others, so a worker with idle cores can hand them
+out to child processes. The worker stays in charge of everything else: pages
+are submitted in order, and their results come back in the same order.
+
+The child processes are started when the first large PDF comes along and are
+then reused for every later one, so that they only pay the cost of starting a
+Python interpreter and importing the engine once."""
+
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+import os
+import signal
+from typing import Optional
+import structlog
+
+from ...model.core import SourceManager
+from .. import messages
+
+logger = structlog.get_logger("worker")
+
+
+PageOutcome = tuple[list[tuple[str, dict]], int, int]
+"""The result of handling one page in a child process: the JSON forms of the
+messages produced (along with the names of their types), the number of
+matched objects, and the number of rule evaluations saved by MatchMemos."""
+
+
+_sm: Optional[SourceManager] = None
+
+
+class _AbortableTags(set):
+    """The set of cancelled scan tags in a child process. While the parent has
+    aborted the pool's current document, every scan tag counts as cancelled
+    (so the worker's abort checkpoints stop the page being handled)."""
+
+    def __init__(self, abort):
+        super().__init__()
+        self._abort = abort
+
+    def __contains__(self, tag):
+        return self._abort.is_set() or super().__contains__(tag)
+
+
+def _initialise(abort, pids):
+    global _sm
+    from .. import worker
+
+    # Pages are never split further, whatever the settings say
+    worker._in_page_pool = True
+    worker._cancelled_tags = _AbortableTags(abort)
+    _sm = SourceManager()
+
+    # Let the parent know who we are, so that it can stop us if we hang
+    pids.put(os.getpid())
+
+
+def _process(body: dict, check: bool) -> PageOutcome:
+    from .. import worker
+
+    worker.total_matches = 0
+    worker._memos.clear()
+    results = [
+        (type(m).__name__, m.to_json_object())
+        for m in worker.process(
+                _sm, messages.ConversionMessage.from_json_object(body),
+                check=check)
+        # The parent reports on progress through the document itself
+        if not isinstance(m, messages.ObjectProgressMessage)]
+    # Don't let the temporary files and resources of one page outlive it
+    _sm.clear_dependents()
+    return (
+            results,
+            worker.total_matches,
+            sum(m.hits for m in worker._memos.values()))
+
+
+class _Processes:
+    """The long-lived child processes behind every PagePool in a worker."""
+
+    def __init__(self, count: int):
+        context = get_context("spawn")
+        self.count = count
+        self.abort = context.Event()
+        self._pids = context.SimpleQueue()
+        self._known_pids = set()
+        self.executor = ProcessPoolExecutor(
+                max_workers=count, mp_context=context,
+                initializer=_initialise, initargs=(self.abort, self._pids))
+        self.broken = False
+
+    def terminate(self):
+        """Stops every child process, even those stuck in the middle of a
+        page, and shuts down the executor. (Shutting it down normally would
+        wait forever for a hung process to finish its page.)"""
+        self.broken = True
+        while not self._pids.empty():
+            self._known_pids.add(self._pids.get())
+        for pid in self._known_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_processes: Optional[_Processes] = None
+
+
+def _get_processes(count: int) -> _Processes:
+    """Returns this worker's child processes for handling pages, starting them
+    if they aren't already running (or if they've broken since)."""
+    global _processes
+    if _processes is None or _processes.broken or _processes.count != count:
+        if _processes is not None:
+            _processes.terminate()
+        _processes = _Processes(count)
+    return _processes
+
+
+class PagePool:
+    """A PagePool hands the ConversionMessages for the pages of a single PDF
+    to this worker's child processes.
+
+    At most twice as many pages as there are processes are in flight at any
+    one time. Pages that can't be handled in the pool (because a child process
+    has died or has taken more than timeout seconds to produce a result, for
+    example) are handed back to the caller to be handled in-process."""
+
+    def __init__(self, processes: int, *, timeout: Optional[float] = None):
+        self._processes = _get_processes(processes)
+        self._limit = 2 * processes
+        self._timeout = timeout
+        self._pending = deque()
+
+    @property
+    def _broken(self) -> bool:
+        return self._processes.broken
+
+    def submit(self, message: messages.ConversionMessage, *, check=True):
+        future = None
+        if not self._broken:
+            try:
+                future = self._processes.executor.submit(
+                        _process, message.to_json_object(), check)
+            except BrokenProcessPool:
+                self._processes.broken = True
+        self._pending.append((message, check, future))
+
+    def hold(self, message: messages.SerialisableMessage):
+        """Queues a message that isn't a page behind the pages that have
+        already been submitted, so that completed() hands it back to the
+        caller in the same position that it was explored in."""
+        self._pending.append((message, True, None))
+
+    def completed(
+            self, *, drain=False) -> Iterator[
+                tuple[messages.SerialisableMessage, bool,
+                      Optional[PageOutcome]]]:
+        """Yields (message, check, outcome) tuples for pages (and held
+        messages), in the order in which they were submitted, until there's
+        room for another page in the pool (or, if drain is set, until no pages
+        are left).
+
+        An outcome of None means that the message was not handled, and that
+        the caller should handle it instead."""
+        while self._pending and (drain or len(self._pending) >= self._limit):
+            message, check, future = self._pending.popleft()
+            outcome = None
+            if future is not None:
+                try:
+                    outcome = future.result(timeout=self._timeout)
+                except TimeoutError:
+                    logger.warning(
+                            "page timed out in pool, abandoning pool",
+                            handle=message.handle, timeout=self._timeout)
+                    self._give_up()
+                except Exception as ex:
+                    logger.warning(
+                            "page could not be handled in pool",
+                            handle=message.handle, exc_info=True)
+                    if isinstance(ex, BrokenProcessPool):
+                        self._processes.broken = True
+            yield message, check, outcome
+
+    def _give_up(self):
+        """Stops using the pool: pages that haven't already been handled by it
+        will be handed back to the caller."""
+        pending = deque()
+        for message, check, future in self._pending:
+            if future is not None and not future.done():
+                future.cancel()
+                future = None
+            pending.append((message, check, future))
+        self._pending = pending
+
+        # A hung child process will never finish its current page, so stop
+        # all of them; the next document will get a fresh pool
+        self._processes.terminate()
+
+    def abort(self):
+        """Tells the pool's processes to abort their current pages, and
+        forgets about all of the pages still waiting to be handled."""
+        self._processes.abort.set()
+        for _, _, future in self._pending:
+            if future is not None:
+                future.cancel()
+
+    def close(self):
+        """Waits for the pages of this document that are still being handled
+        to finish, so that the pool's processes are ready for the next one."""
+        running = [future for _, _, future in self._pending
+                   if future is not None and not future.cancelled()]
+        self._pending.clear()
+        if self._broken:
+            return
+
+        _, not_done = wait(running, timeout=self._timeout)
+        if not_done:
+            logger.warning(
+                    "pages still running in pool after document finished,"
+                    " abandoning pool", timeout=self._timeout)
+            self._processes.terminate()
+        self._processes.abort.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, backtrace):
+        if exc_type is not None:
+            self.abort()
+        self.close()
@@ -0,0 +1,163 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Interning of the scan specifications and Rules that pipeline messages carry,
+so that messages can refer to them by fingerprint instead of repeating them."""
+
+from collections import OrderedDict
+from functools import cache
+from hashlib import blake2b
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+import structlog
+
+from ... import settings
+from ...model.core.errors import DeserialisationError
+
+logger = structlog.get_logger("engine2")
+
+T = TypeVar("T")
+
+
+class SpecStore:
+    """A SpecStore records the JSON representations of scan specifications and
+    Rules under fingerprints of their canonical forms.
+
+    Every ConversionMessage for an object carries the scan specification of the
+    scan that found it, including the complete Rule, and the part of that Rule
+    still to be evaluated. For all of the objects in a Source, these are the
+    same. A stage that sends such a message can instead record them here once
+    and send a reference to them (see SpecStore.reference); a stage that
+    receives one builds the object from this record once, and then reuses it
+    for every later reference (see SpecStore.resolve).
+
+    SpecStores are stored as an SQLite database in the directory named by the
+    [pipeline.spec_store] settings, which every stage must share. Records that
+    haven't been written for max_age days are removed when a process opens the
+    database."""
+
+    def __init__(self, path: str):
+        config = settings.pipeline["spec_store"]
+        self._max_size = config["max_size"]
+        self._db = sqlite3.connect(
+                path, timeout=config["timeout"], check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS specs ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " stored REAL NOT NULL)")
+            self._db.execute(
+                    "DELETE FROM specs WHERE stored < ?",
+                    (time.time() - config["max_age"] * 86400,))
+
+        # Objects that this process has recently sent references to, by
+        # identity, together with their keys
+        self._sent: OrderedDict[int, tuple[Any, str]] = OrderedDict()
+        # Keys that this process has recently written to the database
+        self._written: OrderedDict[str, None] = OrderedDict()
+        # Objects that this process has recently built from references, by key
+        self._received: OrderedDict[str, Any] = OrderedDict()
+
+    @staticmethod
+    def fingerprint(obj: dict) -> str:
+        canonical = json.dumps(
+                obj, sort_keys=True, separators=(",", ":"),
+                ensure_ascii=False)
+        return blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        while len(cache) > self._max_size:
+            cache.popitem(last=False)
+
+    def reference(self, obj) -> dict:
+        """Records the JSON representation of an object (a ScanSpecMessage or a
+        Rule) in this SpecStore, if it isn't already there, and returns a JSON
+        object that refers to it. (If the record can't be written, the JSON
+        representation itself is returned instead.)"""
+        with self._lock:
+            if (sent := self._sent.get(id(obj))) and sent[0] is obj:
+                self._sent.move_to_end(id(obj))
+                return {"interned": sent[1]}
+
+        json_form = obj.to_json_object()
+        key = self.fingerprint(json_form)
+        try:
+            with self._lock:
+                # (An equal object might have been written already, for
+                # example by the matcher, which makes a new remainder Rule for
+                # every message it handles)
+                if key not in self._written:
+                    with self._db:
+                        self._db.execute(
+                                "INSERT INTO specs (key, value, stored)"
+                                " VALUES (?, ?, ?) ON CONFLICT (key)"
+                                " DO UPDATE SET stored = excluded.stored",
+                                (key, json.dumps(json_form), time.time()))
+                self._remember(self._written, key, None)
+                # (Keeping a reference to the object itself here makes sure
+                # that its identity can't be reused by another object)
+                self._remember(self._sent, id(obj), (obj, key))
+        except sqlite3.Error:
+            logger.warning("couldn't write to spec store", exc_info=True)
+            return json_form
+        return {"interned": key}
+
+    def resolve(self, key: str, factory: Callable[[dict], T]) -> T:
+        """Returns the object recorded in this SpecStore under the given key,
+        using the given factory to build it from its JSON representation if it
+        hasn't been built recently. Raises a DeserialisationError if there is
+        no such record."""
+        with self._lock:
+            if (obj := self._received.get(key)) is not None:
+                self._received.move_to_end(key)
+                return obj
+            row = self._db.execute(
+                    "SELECT value FROM specs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise DeserialisationError("SpecStore", key)
+
+        obj = factory(json.loads(row[0]))
+        with self._lock:
+            self._remember(self._received, key, obj)
+        return obj
+
+    def close(self):
+        self._db.close()
+
+
+@cache
+def get_spec_store() -> Optional[SpecStore]:
+    """Returns this process's SpecStore, or None if interning is disabled or
+    the SpecStore couldn't be opened. (Messages should then carry their scan
+    specifications and Rules in full.)"""
+    directory = settings.pipeline["spec_store"]["directory"]
+    if not directory:
+        return None
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return SpecStore(os.path.join(directory, "specs.sqlite3"))
+    except (OSError, sqlite3.Error):
+        logger.warning(
+                "couldn't open spec store", directory=directory, exc_info=True)
+        return None
+
+
+def resolve(obj: dict, factory: Callable[[dict], T]) -> T:
+    """Builds an object from a JSON representation with the given factory,
+    unless the JSON representation is a reference made by SpecStore.reference,
+    in which case the referenced object is returned instead."""
+    if "interned" not in obj:
+        return factory(obj)
+    elif (store := get_spec_store()) is None:
+        raise DeserialisationError("SpecStore", obj["interned"])
+    return store.resolve(obj["interned"], factory)
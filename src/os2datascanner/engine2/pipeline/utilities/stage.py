@@ -6,17 +6,33 @@
 from typing import Generator
 
 from .. import messages
+from .spec_store import get_spec_store
+
+
+# Messages that are only ever consumed by other stages of the pipeline, and so
+# can refer to their scan specs and Rules through the SpecStore
+_INTERNABLE = (messages.ConversionMessage, messages.RepresentationMessage,)
+
+
+def _serialise(message: messages.SerialisableMessage, store) -> dict:
+    if store and isinstance(message, _INTERNABLE):
+        return message.to_json_object(store=store)
+    return message.to_json_object()
 
 
 def dispatch(
         generator: Generator[messages.SerialisableMessage],
         *mapping: tuple[type, list[str]]) -> Generator[tuple[str, dict]]:
     """Converts messages produced by a generator into (queue_name, dict) pairs.
-    (Intended to serve as a generic implementation of message_received_raw.)"""
+    (Intended to serve as a generic implementation of message_received_raw.)
+
+    If this process has a SpecStore, ConversionMessages and
+    RepresentationMessages refer to their scan specs and Rules through it."""
+    store = get_spec_store()
     for message in generator:
         for type_, queues in mapping:
             if isinstance(message, type_):
-                json_form = message.to_json_object()
+                json_form = _serialise(message, store)
                 yield from ((q, json_form) for q in queues)
                 break
         else:
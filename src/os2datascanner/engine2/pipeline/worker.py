@@ -5,19 +5,32 @@
 
 import hashlib
 import json
-from collections.abc import Generator
+from collections import OrderedDict
+from collections.abc import Generator, Iterable
+from itertools import batched, chain
 from typing import Optional
+from prometheus_client import REGISTRY, Summary
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 import structlog
 
 from os2datascanner.engine2.model.core.utilities import SourceManager
 from os2datascanner.engine2 import settings
 
+from ..conversions.text.ocr import (
+        OCR_TYPES, forget_recognised, recognise_ahead)
+from ..conversions.types import OutputType
+from ..model.derived.pdf import PDFSource
+from ..model.utilities.stat_hints import stats_avoided
 from ..utilities.backoff import TimeoutRetrier
+from .utilities.manifest import Manifest, open_manifest
+from .utilities.page_pool import PagePool
 from .utilities.stage import dispatch
 from .explorer import message_received as explorer_handler
-from .processor import message_received as processor_handler
+from .processor import message_received as processor_handler, is_skipped
 from .matcher import message_received as matcher_handler
 from .tagger import message_received as tagger_handler
+from ..rules.utilities.memo import MatchMemo
+from ..rules.utilities.rule_cache import get_rule_cache
 from . import messages
 import time
 
@@ -33,6 +46,49 @@ WRITES_QUEUES = (
     "os2ds_status",)
 PROMETHEUS_DESCRIPTION = "Messages handled by worker"
 
+DESERIALISATION_SUMMARY = Summary(
+        "os2datascanner_pipeline_worker_deserialisation",
+        "Time spent deserialising messages received by the worker")
+
+
+class RuleCacheCollector:
+    """Exports the statistics of this process's RuleCache."""
+
+    def collect(self):
+        rule_cache = get_rule_cache()
+        yield CounterMetricFamily(
+                "os2datascanner_pipeline_worker_rule_cache_hits",
+                "Rules reused instead of being deserialised again",
+                value=rule_cache.hits)
+        yield CounterMetricFamily(
+                "os2datascanner_pipeline_worker_rule_cache_misses",
+                "Rules deserialised and added to the rule cache",
+                value=rule_cache.misses)
+        yield GaugeMetricFamily(
+                "os2datascanner_pipeline_worker_rule_cache_size",
+                "Rules currently held by the rule cache",
+                value=len(rule_cache))
+
+
+REGISTRY.register(RuleCacheCollector())
+
+
+class StatHintCollector:
+    """Exports the number of times that this process has used exploration-time
+    hints instead of asking a server for an object's metadata."""
+
+    def collect(self):
+        family = CounterMetricFamily(
+                "os2datascanner_pipeline_worker_stats_avoided",
+                "Remote stat operations avoided by trusting Handle hints",
+                labels=["resource_type"])
+        for resource_type, count in stats_avoided.copy().items():
+            family.add_metric([resource_type], count)
+        yield family
+
+
+REGISTRY.register(StatHintCollector())
+
 # Let the Pika background thread aggressively collect tasks. Workers should
 # always be doing something -- every centisecond of RabbitMQ overhead is time
 # wasted!
@@ -48,6 +104,22 @@ a large scan (e.g. a 1000-page PDF) stops between pages rather than running
 to completion."""
 
 
+_manifests: OrderedDict = OrderedDict()
+"""The Manifests that this worker has recently recorded verdicts in, keyed by
+the manifest directory, the scan tag and the Source. (A scan's rule and
+configuration never change, so these identify a Manifest's scope without
+having to compute it again for every object.)"""
+
+
+MANIFEST_LIMIT = 8
+"""The number of Manifests that a worker may keep open at once."""
+
+
+_in_page_pool: bool = False
+"""Whether or not this process is a child of a PagePool (in which case it
+should never start one of its own)."""
+
+
 def notify_abort(scan_tag) -> None:
     """Register a scan tag as cancelled so that in-progress processing stops
     at the next inter-page boundary in explore()."""
@@ -130,7 +202,54 @@ def determine_channel(scan_spec, for_type: str) -> str:
 def explore(
         sm: SourceManager, msg: messages.ScanSpecMessage,
         *, check=True) -> Generator[messages.SerialisableMessage]:
-    for m in explorer_handler(msg, sm):
+    explored = explorer_handler(msg, sm)
+    if (isinstance(msg.source, PDFSource) and not _in_page_pool
+            and settings.pipeline['worker']['PDF_PAGE_PROCESSES'] > 0):
+        yield from explore_pages(sm, msg, explored, check=check)
+    else:
+        yield from handle_explored(sm, msg, explored, check=check)
+
+
+def _ocr_candidate(sm: SourceManager, m) -> Optional[bytes]:
+    """Returns the content of the image that a message asks to be converted
+    to text, or None if it doesn't do that (as far as can be cheaply told)."""
+    if (not isinstance(m, messages.ConversionMessage)
+            or m.progress.rule.split()[0].operates_on != OutputType.Text
+            or (mime_type := m.handle.guess_type()) not in OCR_TYPES
+            or is_skipped(m.scan_spec.configuration, mime_type)):
+        return None
+    try:
+        with m.handle.follow(sm).make_stream() as fp:
+            return fp.read()
+    except Exception:
+        # (We'll find out what went wrong when we process the message)
+        return None
+
+
+def _recognising_ahead(
+        sm: SourceManager, msg: messages.ScanSpecMessage,
+        explored: Iterable[messages.SerialisableMessage]):
+    """Yields the messages produced by exploring a Source, but first sends the
+    images that they refer to to the OCR server in batches of up to
+    [tesseract] server_batch_size, so that they can share an OCR engine."""
+    size = settings.tesseract["server_batch_size"]
+    if size <= 1 or not settings.tesseract["server"]:
+        yield from explored
+        return
+
+    for group in batched(explored, size):
+        images = [image for m in group
+                  if (image := _ocr_candidate(sm, m)) is not None]
+        recognise_ahead(
+                images, should_abort=lambda: msg.scan_tag in _cancelled_tags)
+        yield from group
+
+
+def handle_explored(
+        sm: SourceManager, msg: messages.ScanSpecMessage,
+        explored: Iterable[messages.SerialisableMessage],
+        *, check=True) -> Generator[messages.SerialisableMessage]:
+    for m in _recognising_ahead(sm, msg, explored):
         if msg.scan_tag in _cancelled_tags:
             # Scan has been cancelled, stop processing
             return
@@ -151,6 +270,71 @@ def explore(
             yield m
 
 
+def explore_pages(  # noqa: CCR001, too high cognitive complexity
+        sm: SourceManager, msg: messages.ScanSpecMessage,
+        explored: Iterable[messages.SerialisableMessage],
+        *, check=True) -> Generator[messages.SerialisableMessage]:
+    """As handle_explored, but for the pages of a PDF: if the document is long
+    enough, then its pages are handled in parallel by a PagePool, and their
+    results are yielded in page order."""
+    config = settings.pipeline['worker']
+
+    # Starting a pool isn't worth it for short documents, so look ahead
+    head = []
+    pages = 0
+    for m in explored:
+        head.append(m)
+        if isinstance(m, messages.ConversionMessage):
+            pages += 1
+            if pages >= config['PDF_PAGE_THRESHOLD']:
+                break
+    else:
+        yield from handle_explored(sm, msg, head, check=check)
+        return
+
+    def collect(pool, *, drain=False):
+        global total_matches
+        for page, page_check, outcome in pool.completed(drain=drain):
+            if msg.scan_tag in _cancelled_tags:
+                pool.abort()
+                return
+            if not isinstance(page, messages.ConversionMessage):
+                yield from handle_explored(sm, msg, (page,), check=check)
+                continue
+            elif outcome is None:
+                yield from process(sm, page, check=page_check)
+                continue
+
+            results, matches, hits = outcome
+            total_matches += matches
+            _memos.setdefault(page.handle, MatchMemo()).hits += hits
+            for type_name, body in results:
+                yield getattr(messages, type_name).from_json_object(body)
+
+    logger.info(
+            "handling PDF pages in parallel",
+            source=msg.source, processes=config['PDF_PAGE_PROCESSES'])
+    with PagePool(
+            config['PDF_PAGE_PROCESSES'],
+            timeout=config['PDF_PAGE_TIMEOUT'] or None) as pool:
+        for m in chain(head, explored):
+            if msg.scan_tag in _cancelled_tags:
+                # Scan has been cancelled, stop processing
+                pool.abort()
+                return
+            if isinstance(m, messages.ConversionMessage):
+                heartbeat = _progress.tick(str(m.handle))
+                if heartbeat is not None:
+                    yield heartbeat
+                pool.submit(m, check=check)
+            else:
+                # (Keep everything in the order that the explorer produced
+                # it, as handle_explored would)
+                pool.hold(m)
+            yield from collect(pool)
+        yield from collect(pool, drain=True)
+
+
 def process(
         sm: SourceManager, msg: messages.ConversionMessage,
         *, check=True) -> Generator[messages.SerialisableMessage]:
@@ -182,12 +366,17 @@ def process(
 
 
 total_matches = 0
+_memos: dict = {}
+"""The MatchMemo of each object under the top-level object currently being
+handled, keyed by Handle. (Cleared whenever a new top-level object comes
+in.)"""
 
 
 def match(
         sm: SourceManager, msg: messages.RepresentationMessage,
         *, check=True) -> Generator[messages.SerialisableMessage]:
-    for m in matcher_handler(msg, sm):
+    memo = _memos.setdefault(msg.handle, MatchMemo())
+    for m in matcher_handler(msg, sm, memo=memo):
         if isinstance(m, messages.HandleMessage):
             global total_matches
             total_matches += 1
@@ -202,13 +391,49 @@ def tag(sm, msg):
     yield from tagger_handler(msg, sm)
 
 
+def _get_manifest(message: messages.ConversionMessage) -> Optional[Manifest]:
+    """Returns the Manifest of the Source of a top-level object, opening it if
+    it isn't already open, or None if manifests are disabled."""
+    directory = settings.pipeline["manifest"]["directory"]
+    if not directory:
+        return None
+
+    key = (directory, message.scan_spec.scan_tag, message.handle.source)
+    if key in _manifests:
+        _manifests.move_to_end(key)
+        return _manifests[key]
+
+    manifest = _manifests[key] = open_manifest(
+            message.handle.source,
+            message.scan_spec.rule, message.scan_spec.configuration)
+    while len(_manifests) > MANIFEST_LIMIT:
+        _, evicted = _manifests.popitem(last=False)
+        if evicted:
+            evicted.close()
+    return manifest
+
+
+def record_verdict(message: messages.ConversionMessage, *, problem: bool):
+    """Records the outcome of scanning a top-level object in the manifest of
+    its Source, if manifests are enabled."""
+    if manifest := _get_manifest(message):
+        manifest.record(
+                message.handle,
+                "problem" if problem
+                else "matched" if total_matches
+                else "clean")
+
+
 def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 too high cognitive complexity
     global total_matches
     total_matches = 0
+    _memos.clear()
+    forget_recognised()
 
     process_time_start = time.perf_counter()
 
-    message = messages.ConversionMessage.from_json_object(body)
+    with DESERIALISATION_SUMMARY.time():
+        message = messages.ConversionMessage.from_json_object(body)
 
     top_handle = message.handle
     _progress.reset(
@@ -216,11 +441,28 @@ def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 t
             object_key=hashlib.sha256(str(top_handle).encode("utf-8")).hexdigest(),
             object_path=str(top_handle))
 
+    if settings.pipeline['worker']['CHECK_DUPLICATION']:
+        # Have the content identifier computed while processing reads the
+        # object, so that it needn't be read again afterwards
+        resource = top_handle.follow(source_manager)
+        if want := getattr(resource, "want_content_identifier", None):
+            want()
+
     content_identifier = None
+    completed = False
+    problem = False
+
+    def _watch(results):
+        nonlocal problem
+        for m in results:
+            if isinstance(m, (messages.ProblemMessage,
+                              messages.ContentMissingMessage)):
+                problem = True
+            yield m
 
     try:
         yield from dispatch(
-                process(source_manager, message),
+                _watch(process(source_manager, message)),
                 (messages.ProblemMessage, ["os2ds_checkups", "os2ds_problems"]),
                 (messages.ContentMissingMessage, ["os2ds_checkups", "os2ds_problems"]),
                 # (messages.ContentSkippedMessage, ["os2ds_checkups", "os2ds_problems"]),
@@ -228,6 +470,7 @@ def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 t
                 (messages.MetadataMessage, ["os2ds_metadata"]),
                 (messages.StatusMessage, ["os2ds_status"]),
                 (messages.ObjectProgressMessage, ["os2ds_status"]))
+        completed = True
     finally:
         process_time_total = time.perf_counter() - process_time_start
 
@@ -235,8 +478,13 @@ def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 t
         computed_type = "application/octet-stream"
         try:
             resource = message.handle.follow(source_manager)
-            object_size = TimeoutRetrier(max_tries=3, seconds=10).run(
-                    resource.get_size)
+            # Processing the object will normally have read all of it, in
+            # which case its size, type and content identifier are already
+            # known and don't need to be fetched again
+            object_size = getattr(resource, "get_observed_size", lambda: None)()
+            if object_size is None:
+                object_size = TimeoutRetrier(max_tries=3, seconds=10).run(
+                        resource.get_size)
             computed_type = TimeoutRetrier(max_tries=3, seconds=10).run(
                     resource.compute_type)
 
@@ -254,6 +502,11 @@ def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 t
             source_manager.clear()
         except Exception:
             pass
+
+        # (An object whose processing was interrupted hasn't been scanned)
+        if completed and message.scan_spec.scan_tag not in _cancelled_tags:
+            record_verdict(message, problem=problem)
+
         yield ("os2ds_status", messages.StatusMessage(
                 scan_tag=message.scan_spec.scan_tag,
                 message="",
@@ -263,7 +516,10 @@ def message_received_raw(body, channel, source_manager):  # noqa: CCR001, E501 t
                 object_type=computed_type,
                 process_time_worker=process_time_total,
                 matches_found=total_matches,
-                content_identifier=content_identifier).to_json_object())
+                content_identifier=content_identifier,
+                rule_cache_hits=sum(m.hits for m in _memos.values())).to_json_object())
+        _memos.clear()
+        forget_recognised()
 
         terminal = _progress.terminal()
         if terminal is not None:
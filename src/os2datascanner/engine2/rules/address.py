@@ -7,7 +7,7 @@ import regex
 import structlog
 
 from .rule import Rule, SimpleTextRule
-from .datasets.loader import common as common_loader
+from .datasets.index import get_index
 
 logger = structlog.get_logger("engine2")
 
@@ -91,11 +91,8 @@ class AddressRule(SimpleTextRule):
 
     def _load_datasets(self):
         if self.street_names is None:
-            # Convert list of str to upper case and to sets for efficient
-            # lookup
-            self.street_names = set(map(str.upper,
-                                        common_loader.load_dataset(
-                                            "addresses", "da_addresses")))
+            self.street_names = get_index(
+                    "addresses", "da_addresses", case="upper")
 
     @property
     def presentation_raw(self):
@@ -4,17 +4,19 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 
 from dataclasses import dataclass
-from typing import Iterator, List, Match, Optional, Tuple, Dict
+from typing import Iterable, Iterator, List, Match, Optional, Tuple, Dict
 import re
 from itertools import chain
 from enum import Enum, unique
 import structlog
 
+from ..conversions.utilities.windows import WindowedText, match_window
 from .rule import Rule
 from .regex import RegexRule
 from .logical import oxford_comma
 from .utilities.context import make_context
-from .utilities.cpr_probability import modulus11_check, CprProbabilityCalculator, cpr_bin_check
+from .utilities.cpr_probability import (
+        modulus11_check_many, CprProbabilityCalculator, cpr_bin_check)
 from .utilities.properties import RuleProperties, RulePrecedence
 
 logger = structlog.get_logger("engine2")
@@ -51,6 +53,10 @@ class Context(Enum):
 
 class CPRRule(RegexRule):
     type_label = "cpr"
+    eq_properties = (
+        "_modulus_11", "_ignore_irrelevant", "_examine_context",
+        "_whitelist", "_blacklist", "_exceptions", "_surrounding_exceptions",
+    )
     WHITELIST_WORDS = {"cpr", }
     BLACKLIST_WORDS = {
         "p-nr", r"p\.nr", "p-nummer", "pnr",
@@ -82,11 +88,15 @@ class CPRRule(RegexRule):
         self._modulus_11 = modulus_11
         self._ignore_irrelevant = ignore_irrelevant
         self._examine_context = examine_context
-        self._whitelist = self.WHITELIST_WORDS if whitelist is None else set(whitelist)
-        self._blacklist = self.BLACKLIST_WORDS if blacklist is None else set(blacklist)
-        self._exceptions = frozenset(exceptions) if exceptions else frozenset()
+        self._whitelist = frozenset(
+            self.WHITELIST_WORDS if whitelist is None else whitelist)
+        self._blacklist = frozenset(
+            self.BLACKLIST_WORDS if blacklist is None else blacklist)
+        # (Empty strings can't match anything, but they do appear when an empty
+        # comma-separated string is split)
+        self._exceptions = frozenset(e for e in (exceptions or ()) if e)
         self._surrounding_exceptions = frozenset(
-            surrounding_exceptions) if surrounding_exceptions else frozenset()
+            e for e in (surrounding_exceptions or ()) if e)
         self._blacklist_pattern = re.compile("|".join(self._blacklist))
 
     @property
@@ -104,26 +114,37 @@ class CPRRule(RegexRule):
         else:
             return "CPR number"
 
-    def match(self, content: str) -> Optional[Iterator[dict]]:  # noqa: CCR001,E501,C901 too high cognitive complexity
-        if content is None:
+    def match_windows(self, windows: WindowedText) -> Iterator[dict]:
+        # The blacklist applies to the whole text, so we need to check every
+        # window for it before we can report anything: hold on to the matches
+        # in each window until they've all been read. (The probability bin
+        # check, on the other hand, is only performed within each window)
+        if not (self._examine_context and self._blacklist):
+            yield from super().match_windows(windows)
             return
 
+        matches = []
+        for window in windows:
+            if (m := self._blacklist_pattern.search(window.text.lower())):
+                logger.debug("Blacklist matched content", matches=m.group(0))
+                return
+            matches.extend(match_window(self, window))
+        yield from matches
+
+    def match_candidates(  # noqa: CCR001,E501,C901 too high cognitive complexity
+            self, candidates: Iterable[Match[str]], content: str) -> Iterator[dict]:
         if self._examine_context and self._blacklist:
             if (m := self._blacklist_pattern.search(content.lower())):
                 logger.debug("Blacklist matched content", matches=m.group(0))
                 return
 
-        def _probability(match: Match[str]):
-            """Given a match, calculates probability of being a cpr number,
-             by using the relevant probability calculations."""
-            cpr = match_to_cpr(match)
-
-            probability = 1.0
-            if self._ignore_irrelevant:
-                probability = calculator.cpr_check(cpr, do_mod11_check=self._modulus_11)
-                if isinstance(probability, str):
-                    logger.debug(f"{cpr} is not valid cpr due to {probability}")
-                    return False
+        def _probability(match: Match[str], cpr: str, probability):
+            """Given a match and its already calculated probability, returns
+            the probability of it being a cpr number, adjusted by its context
+            if relevant."""
+            if isinstance(probability, str):
+                logger.debug(f"{cpr} is not valid cpr due to {probability}")
+                return False
 
             cpr = cpr[0:4] + "XXXXXX"
             low, high = match.span()
@@ -138,25 +159,29 @@ class CPRRule(RegexRule):
 
             return probability
 
-        def _is_cpr(candidate: Match[str]):
-            """Given a match, checks expections, modulus 11 check and calculates probability,
-             to determine if it is a cpr number."""
-            cpr = match_to_cpr(candidate)
-
+        numbers = list(candidates)
+        cprs = [match_to_cpr(m) for m in numbers]
+
+        # Validate all of the candidates at once rather than one at a time
+        mod11_checks = (
+                modulus11_check_many(cprs) if self._modulus_11
+                else [(True, None)] * len(cprs))
+        probabilities = (
+                calculator.cpr_check_many(cprs, do_mod11_check=self._modulus_11)
+                if self._ignore_irrelevant else [1.0] * len(cprs))
+
+        cpr_numbers = []
+        cpr_probabilities = {}
+        for m, cpr, (mod11, reason), probability in zip(
+                numbers, cprs, mod11_checks, probabilities):
             if cpr in self._exceptions:
-                return False
-
-            if self._modulus_11:
-                mod11, reason = modulus11_check(cpr)
-                if not mod11:
-                    logger.debug(f"{cpr} failed modulus11 check due to {reason}")
-                    return False
-
-            return True if _probability(candidate) else False
-
-        numbers = [m for m in self._compiled_expression.finditer(content)]
-
-        cpr_numbers = [m for m in numbers if _is_cpr(m)]
+                continue
+            if not mod11:
+                logger.debug(f"{cpr} failed modulus11 check due to {reason}")
+                continue
+            if (probability := _probability(m, cpr, probability)):
+                cpr_numbers.append(m)
+                cpr_probabilities[m] = probability
 
         if self._examine_context:
             cpr_numbers = cpr_bin_check(numbers, cpr_numbers)
@@ -170,7 +195,7 @@ class CPRRule(RegexRule):
 
                 **make_context(m, content),
 
-                "probability": _probability(m),
+                "probability": cpr_probabilities[m],
             }
 
     def examine_context(  # noqa: CCR001, C901 too high cognitive complexity
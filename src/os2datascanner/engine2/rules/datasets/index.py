@@ -0,0 +1,204 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Compiled, memory-mapped indexes of datasets.
+
+Rules that look things up in a dataset (names, addresses, lists of words)
+used to parse its JSONL file into a Python set for every Rule object. A
+DatasetIndex is instead compiled once into a binary file that every process on
+the machine maps read-only, so they all share a single copy of it and opening
+it costs almost nothing.
+
+An index file consists of a header, an array of offsets into a block of
+UTF-8-encoded keys (which are sorted and unique), and an open-addressing hash
+table whose slots hold the indices of those keys. All integers are unsigned,
+32 bits wide and in the machine's native byte order; index files are not meant
+to be moved between machines."""
+
+from array import array
+from collections.abc import Iterable, Iterator
+from functools import cache
+from hashlib import blake2b
+import mmap
+import os
+from pathlib import Path
+from stat import S_ISDIR
+import struct
+from tempfile import NamedTemporaryFile, gettempdir
+from typing import Literal, Optional
+from zlib import crc32
+import structlog
+
+from ... import settings
+from .loader import DatasetNotFoundError, dataset_path, read_dataset
+
+logger = structlog.get_logger("engine2")
+
+_MAGIC = b"OSDSIDX1"
+_HEADER = struct.Struct("=8sII")
+
+
+def _flatten(entry) -> Iterator[str]:
+    match entry:
+        case list():
+            for e in entry:
+                yield from _flatten(e)
+        case _:
+            yield str(entry)
+
+
+def compile_index(keys: Iterable[str]) -> bytes:
+    """Compiles a collection of strings into the binary form of a
+    DatasetIndex."""
+    encoded = sorted({k.encode() for k in keys})
+
+    offsets = array("I", [0])
+    for k in encoded:
+        offsets.append(offsets[-1] + len(k))
+
+    # Keep the table at most half full, so that lookups rarely have to probe
+    # more than one or two slots
+    size = 1
+    while size < 2 * len(encoded):
+        size *= 2
+    slots = array("I", bytes(4 * size))
+    for i, k in enumerate(encoded):
+        slot = crc32(k) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = i + 1  # (0 marks an empty slot)
+
+    return b"".join((
+            _HEADER.pack(_MAGIC, len(encoded), size),
+            offsets.tobytes(), slots.tobytes(), *encoded))
+
+
+class DatasetIndex:
+    """A DatasetIndex is an immutable set of strings backed by the binary form
+    produced by compile_index (normally a memory-mapped file)."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, count, size = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError("not a dataset index")
+
+        start = _HEADER.size
+        self._offsets = view[start:start + 4 * (count + 1)].cast("I")
+        start += 4 * (count + 1)
+        self._slots = view[start:start + 4 * size].cast("I")
+        start += 4 * size
+        self._keys = view[start:]
+        self._mask = size - 1
+
+    def __contains__(self, key) -> bool:
+        if not isinstance(key, str):
+            return False
+        k = key.encode()
+        offsets, keys = self._offsets, self._keys
+        slot = crc32(k) & self._mask
+        while (i := self._slots[slot]):
+            if keys[offsets[i - 1]:offsets[i]] == k:
+                return True
+            slot = (slot + 1) & self._mask
+        return False
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        offsets, keys = self._offsets, self._keys
+        for i in range(len(self)):
+            yield bytes(keys[offsets[i]:offsets[i + 1]]).decode()
+
+
+def _index_directory() -> Optional[Path]:
+    """Returns the directory in which to store dataset indexes, or None if
+    they shouldn't be stored at all.
+
+    By default, indexes are stored in a directory in the system's temporary
+    directory that belongs to the current user and that nobody else can
+    write to. (Anyone who could put files in it could make our rules match, or
+    not match, whatever they liked.) If that directory already exists but
+    doesn't meet those conditions, it isn't used."""
+    if configured := settings.rules["datasets"]["index_directory"]:
+        return Path(configured)
+
+    path = Path(gettempdir(), f"os2datascanner-datasets-{os.getuid()}")
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        st = path.lstat()
+    except OSError:
+        logger.warning(
+                "couldn't create dataset index directory",
+                path=str(path), exc_info=True)
+        return None
+    if (not S_ISDIR(st.st_mode)
+            or st.st_uid != os.getuid()
+            or st.st_mode & 0o077):
+        logger.warning(
+                "not using untrustworthy dataset index directory",
+                path=str(path), owner=st.st_uid, mode=oct(st.st_mode))
+        return None
+    return path
+
+
+def _open_index(path: Path) -> DatasetIndex:
+    with path.open("rb") as fp:
+        return DatasetIndex(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+@cache
+def get_index(
+        category: str, *datasets: str,
+        case: Literal["upper", "lower"]) -> DatasetIndex:
+    """Returns a DatasetIndex of the (upper- or lower-cased) entries of one or
+    more datasets in the same category, compiling it first if no other process
+    has already done so. Entries that are lists are flattened.
+
+    Indexes are shared by all callers in this process, and, through the index
+    directory, by all processes on this machine."""
+    key = blake2b(repr((_MAGIC, category, case)).encode(), digest_size=16)
+    for ds in datasets:
+        # (Changing a dataset file gives it a new index)
+        try:
+            stat = dataset_path(category, ds).stat()
+        except FileNotFoundError:
+            raise DatasetNotFoundError(category, ds)
+        key.update(repr((ds, stat.st_size, stat.st_mtime_ns)).encode())
+    directory = _index_directory()
+    path = directory.joinpath(key.hexdigest() + ".idx") if directory else None
+
+    if path:
+        try:
+            return _open_index(path)
+        except (OSError, ValueError, struct.error):
+            pass
+
+    normalise = str.upper if case == "upper" else str.lower
+    compiled = compile_index(
+            normalise(w)
+            for ds in datasets
+            for entry in read_dataset(category, ds)
+            for w in _flatten(entry))
+    if not path:
+        return DatasetIndex(compiled)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=path.parent, delete=False) as fp:
+            fp.write(compiled)
+        os.chmod(fp.name, 0o644)
+        # Other processes might be compiling the same index at the same time,
+        # but they'll all produce the same file, so it doesn't matter whose
+        # copy wins
+        os.replace(fp.name, path)
+        return _open_index(path)
+    except OSError:
+        logger.warning(
+                "couldn't store dataset index; keeping it in memory",
+                category=category, datasets=datasets, exc_info=True)
+        return DatasetIndex(compiled)
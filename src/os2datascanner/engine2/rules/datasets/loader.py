@@ -18,6 +18,21 @@ class DatasetNotFoundError(LoaderError):
 _HERE = pathlib.Path(__file__).parent
 
 
+def dataset_path(category, dataset):
+    return _HERE.joinpath(category, dataset + ".jsonl")
+
+
+def read_dataset(category, dataset):
+    """Yields the entries of a dataset one at a time, without keeping them."""
+    try:
+        with dataset_path(category, dataset).open("rt") as f:
+            for line in f:
+                if not line.startswith("#"):
+                    yield json.loads(line)
+    except FileNotFoundError:
+        raise DatasetNotFoundError(category, dataset)
+
+
 class Loader:
     def __init__(self, *categories):
         self._datasets = {}
@@ -48,17 +63,9 @@ class Loader:
             raise DatasetNotFoundError(category, None)
 
     def load_dataset(self, category, dataset):
-        try:
-            dataset_file = _HERE.joinpath(category, dataset + ".jsonl")
-            entries = []
-            with dataset_file.open("rt") as f:
-                for line in f:
-                    if not line.startswith("#"):
-                        entries.append(json.loads(line))
-            self._datasets.setdefault(category, {})[dataset] = entries
-            return entries
-        except FileNotFoundError:
-            raise DatasetNotFoundError(category, dataset)
+        entries = list(read_dataset(category, dataset))
+        self._datasets.setdefault(category, {})[dataset] = entries
+        return entries
 
 
 common = Loader()
@@ -48,6 +48,8 @@ def split_sentences(content):
 @Rule.register_class
 class ExternallyExecutedRegexRule(RegexRule):
     type_label = "external-regex"
+    # (Offsets are relative to the sentence a match was found in)
+    reports_offsets = False
 
     def __init__(self,
                  expression: str,
@@ -104,6 +106,8 @@ class ExternallyExecutedRegexRule(RegexRule):
 @Rule.register_class
 class ExternallyExecutedWordlistRule(OrderedWordlistRule):
     type_label = "external-wordlist"
+    # (Offsets are relative to the sentence a match was found in)
+    reports_offsets = False
 
     properties = RuleProperties(
         precedence=RulePrecedence.RIGHT,
@@ -13,6 +13,7 @@ class DanishLicensePlateRule(SimpleRule):
 
     operates_on = OutputType.Text
     type_label = "license_plate"
+    reports_offsets = True
 
     def __init__(self):
         super().__init__()
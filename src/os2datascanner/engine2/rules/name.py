@@ -6,7 +6,7 @@
 import regex
 
 from .rule import Rule, SimpleTextRule
-from .datasets.loader import common as common_loader
+from .datasets.index import DatasetIndex, get_index
 from .utilities.context import make_context
 
 _whitespace = (
@@ -77,7 +77,7 @@ class NameRule(SimpleTextRule):
             **super_kwargs):
         super().__init__(**super_kwargs)
 
-        # Convert list of str to upper case and to sets for efficient lookup
+        # Upper-case indexes of names, loaded when first needed
         self.last_names = None
         self.first_names = None
 
@@ -89,23 +89,21 @@ class NameRule(SimpleTextRule):
     def presentation_raw(self):
         return "personal name"
 
+    @property
+    def reports_offsets(self):
+        # Standalone names found by expansive matching are reported with
+        # offsets into what's left of the text after removing full names
+        return not self._expansive
+
     def _load_datasets(self):
         if self.first_names is None:
-            # Convert list of str to upper case and to sets for efficient
-            # lookup
-            m = set(map(str.upper,
-                    common_loader.load_dataset(
-                            "names", "da_20140101_dst_fornavne-mænd")))
-            k = set(map(str.upper,
-                    common_loader.load_dataset(
-                            "names", "da_20140101_dst_fornavne-kvinder")))
-            e = set(map(str.upper,
-                    common_loader.load_dataset(
-                            "names", "da_20140101_dst_efternavne")))
-            f = m.union(k)
-
-            self.last_names = e
-            self.first_names = f
+            self.first_names = get_index(
+                    "names",
+                    "da_20140101_dst_fornavne-mænd",
+                    "da_20140101_dst_fornavne-kvinder",
+                    case="upper")
+            self.last_names = get_index(
+                    "names", "da_20140101_dst_efternavne", case="upper")
 
     def match(self, text):  # noqa: CCR001, too high cognitive complexity
         self._load_datasets()
@@ -113,7 +111,7 @@ class NameRule(SimpleTextRule):
 
         def is_name_component(
                 component: str,
-                *candidate_sets: set[str]):
+                *candidate_sets: DatasetIndex):
             component = component.upper()
             if component in self._blacklist:
                 return True
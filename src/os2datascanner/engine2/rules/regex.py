@@ -4,7 +4,7 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 
 import re
-from typing import Iterator, Optional
+from typing import Iterable, Iterator, Optional
 
 from .rule import Rule, SimpleTextRule
 from .utilities.context import make_context
@@ -15,6 +15,7 @@ from .utilities.properties import RulePrecedence, RuleProperties
 class RegexRule(SimpleTextRule):
     type_label = "regex"
     eq_properties = ("_expression",)
+    reports_offsets = True
     properties = RuleProperties(
         precedence=RulePrecedence.RIGHT,
         standalone=True)
@@ -28,12 +29,25 @@ class RegexRule(SimpleTextRule):
     def presentation_raw(self) -> str:
         return 'regular expression matching "{0}"'.format(self._expression)
 
+    @property
+    def expression(self) -> str:
+        return self._expression
+
     def match(self, content: str) -> Optional[Iterator[dict]]:
         if content is None:
             return
 
-        for match in self._compiled_expression.finditer(content):
-            low, high = match.span()
+        yield from self.match_candidates(
+                self._compiled_expression.finditer(content), content)
+
+    def match_candidates(
+            self, candidates: Iterable[re.Match], content: str) -> Iterator[dict]:
+        """Yields matches of this RegexRule given the match objects produced
+        by running its expression over the provided content.
+
+        Splitting match() up like this lets several RegexRules with the same
+        expression share a single pass over a text."""
+        for match in candidates:
             yield {
                 "match": match.string[match.start(): match.end()],
                 **make_context(match, content),
@@ -12,6 +12,8 @@ from .utilities.properties import RulePrecedence, RuleProperties
 from ..utilities.json import JSONSerialisable
 from ..utilities.equality import TypePropertyEquality
 from ..conversions.types import OutputType
+from ..conversions.utilities.windows import (
+        WindowedText, match_whole_text, match_windows)
 
 
 class Rule(TypePropertyEquality, JSONSerialisable):
@@ -73,10 +75,30 @@ class Rule(TypePropertyEquality, JSONSerialisable):
         (Following a chain of continuations will always eventually reduce to
         True, if the rule as a whole has matched, or False if it has not.)"""
 
+    @staticmethod
+    def _evaluate(head, representation, *, obj_limit, plan, planned) -> list:
+        """Evaluates a SimpleRule against a representation, returning a list of
+        (at most obj_limit) match objects."""
+        if isinstance(representation, WindowedText):
+            try:
+                return list(islice(
+                        head.match_windows(representation), obj_limit))
+            except UnicodeDecodeError:
+                # A small file that can't be decoded has no text, so treat a
+                # large one the same way
+                return []
+        elif (plan is not None
+                and head.operates_on == OutputType.Text
+                and head in plan):
+            return plan.evaluate(
+                    head, representation, planned, obj_limit=obj_limit)
+        else:
+            return list(islice(head.match(representation), obj_limit))
+
     def try_match(
             self,
             representations: dict,
-            *, obj_limit=None):
+            *, obj_limit=None, plan=None, memo=None):
         """Reduces this Rule as much as possible, given a dict of representations.
 
         Returns the (possibly trivial) continuation left over, along with a
@@ -86,28 +108,51 @@ class Rule(TypePropertyEquality, JSONSerialisable):
         if you don't care about getting them all, you can set a cut-off with
         the obj_limit keyword argument to improve performance.)
 
+        Text representations might also be WindowedTexts, in which case
+        SimpleRules will be evaluated with SimpleRule.match_windows.
+
         Note that this method can optimise the reduction of this Rule; the
-        result of a SimpleRule might be cached and reused, for example."""
+        result of a SimpleRule might be cached and reused, for example.
+
+        If a TextRulePlan is given with the plan keyword argument, then
+        SimpleTextRules that it covers will be evaluated through it, letting
+        rules that can share a pass over the text do so. This doesn't change
+        the return value of this method.
+
+        If a MatchMemo is given with the memo keyword argument, then the
+        results of SimpleRules already recorded in it are reused, and the
+        results of newly evaluated SimpleRules are recorded in it. (Reused
+        results were reported by an earlier call, so they don't appear in
+        the return value of this one.)"""
 
         representations[OutputType.AlwaysTrue.value] = None
 
         here = self
         matches = {}
+        planned = {}
         while not isinstance(here, bool):
             head, pve, nve = here.split()
-            if head.operates_on.value in representations:
-                if head not in matches:
-                    # We have the form required to match the next part of the rule.
-                    # Hooray! Let's do that
-                    representation = representations[head.operates_on.value]
-                    match_iterator = head.match(representation)
-                    matches[head] = list(islice(match_iterator, obj_limit))
-                here = pve if matches[head] else nve
-            else:
+            if head.operates_on.value not in representations:
                 # We don't have the form required to match the next part. Stop
                 # and report what we have so far to the caller
                 break
 
+            if head in matches:
+                result = matches[head]
+            elif memo is not None and head in memo:
+                memo.hits += 1
+                result = memo[head]
+            else:
+                # We have the form required to match the next part of the rule.
+                # Hooray! Let's do that
+                result = self._evaluate(
+                        head, representations[head.operates_on.value],
+                        obj_limit=obj_limit, plan=plan, planned=planned)
+                matches[head] = result
+                if memo is not None:
+                    memo[head] = result
+            here = pve if result else nve
+
         return (here, list(matches.items()))
 
     @abstractmethod
@@ -163,6 +208,26 @@ class SimpleRule(Rule):
         provided content. Matched content should appear under the dictionary's
         "match" key."""
 
+    reports_offsets: bool = False
+    """Whether or not every match of this SimpleRule reports, under its
+    "offset" key, its position in the content given to SimpleRule.match.
+    (Only these SimpleRules can be run over a large text one window at a
+    time.)"""
+
+    def match_windows(self, windows: WindowedText) -> Iterator[dict]:
+        """As match, but for a text that is too large to be held in memory and
+        so is examined one window at a time.
+
+        The default implementation runs this SimpleRule over every window in
+        turn if it reports the offsets of its matches, and over the whole text
+        (reassembled from its windows, with a warning) if it doesn't;
+        subclasses whose result depends on the text as a whole should override
+        this method."""
+        if self.reports_offsets:
+            yield from match_windows(self, windows)
+        else:
+            yield from match_whole_text(self, windows)
+
     def flatten(self):
         return {self}
 
@@ -3,11 +3,12 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, you can
 # obtain one at http://mozilla.org/MPL/2.0/.
 
-from typing import Union, Tuple
+from typing import Callable, Sequence, Union, Tuple
 from datetime import date
 from math import ceil, log, floor
 from itertools import chain
 from re import Match
+import numpy as np
 
 
 # Updated list of dates with CPR numbers violating the Modulo-11 check. (Last
@@ -112,6 +113,96 @@ def modulus11_check_raw(cpr: str) -> bool:
     return sum([int(c) * v for c, v in zip(cpr, _mod_11_table)]) % 11 == 0
 
 
+# The batch functions below work on arrays of CPR numbers, one row per number
+# and one column per digit
+
+_mod_11_weights = np.array(_mod_11_table, dtype=np.int64)
+_exception_dates = np.array(
+        [d.year * 10000 + d.month * 100 + d.day for d in CPR_EXCEPTION_DATES],
+        dtype=np.int64)
+_days_in_month = np.array(
+        [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+def _serial_ranks() -> np.ndarray:
+    """Returns a table whose [r, s]th entry is the number of three-digit
+    serial numbers below s whose weighted modulus-11 sum is congruent to r."""
+    serials = np.arange(1000)
+    residues = (
+            3 * (serials // 100) + 2 * (serials // 10 % 10) + serials % 10) % 11
+    table = np.zeros((11, 1001), dtype=np.int64)
+    table[:, 1:] = np.cumsum(
+            residues[np.newaxis, :] == np.arange(11)[:, np.newaxis], axis=1)
+    return table
+
+
+_serial_rank = _serial_ranks()
+
+
+def _in_batches(cprs: Sequence[str], batch: Callable, single: Callable) -> list:
+    """Applies a batch function to all of the well-formed CPR numbers in a
+    sequence at once, falling back to a scalar function for the others (which
+    are either of the wrong length or contain non-ASCII digits)."""
+    regular = [len(c) == 10 and c.isascii() and c.isdigit() for c in cprs]
+    text = "".join(c for c, r in zip(cprs, regular) if r).encode()
+    characters = np.frombuffer(text, dtype=np.uint8).reshape(-1, 10)
+    digits = characters.astype(np.int64) - ord("0")
+    batch_results = iter(batch(digits))
+    return [next(batch_results) if r else single(c)
+            for c, r in zip(cprs, regular)]
+
+
+def _birth_dates(digits: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the birth dates of an array of CPR numbers, in the form of
+    integers (YYYYMMDD), along with a mask of those dates that are valid. (This
+    is the batch version of get_birth_date.)"""
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 2] * 10 + digits[:, 3]
+    year = digits[:, 4] * 10 + digits[:, 5]
+    year_check = digits[:, 6]
+
+    year = year + np.select(
+            [year_check <= 3,
+             year_check == 4,
+             year_check <= 8],
+            [1900,
+             np.where(year > 36, 1900, 2000),
+             np.where(year > 57, 1800, 2000)],
+            np.where(year > 37, 1900, 2000))
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    valid_month = (month >= 1) & (month <= 12)
+    month_length = _days_in_month[np.where(valid_month, month, 0)] + (
+            leap & (month == 2))
+    valid = valid_month & (day >= 1) & (day <= month_length)
+    return year * 10000 + month * 100 + day, valid
+
+
+def _modulus11_many(digits: np.ndarray) -> np.ndarray:
+    return (digits @ _mod_11_weights) % 11 == 0
+
+
+_modulus11_outcomes = (
+    (False, "malformed birth_date"),
+    (True, "in exception_date"),
+    (True, "due to modulus11"),
+    (False, "due to modulus11"),
+)
+
+
+def modulus11_check_many(cprs: Sequence[str]) -> list[Tuple[bool, str]]:
+    """Performs modulus11_check on each of a sequence of CPR numbers at once,
+    returning exactly what it would have returned for each of them."""
+    def _batch(digits: np.ndarray) -> list[Tuple[bool, str]]:
+        birth_date, valid = _birth_dates(digits)
+        outcome = np.select(
+                [~valid, np.isin(birth_date, _exception_dates)],
+                [0, 1],
+                np.where(_modulus11_many(digits), 2, 3))
+        return [_modulus11_outcomes[o] for o in outcome.tolist()]
+    return _in_batches(cprs, _batch, modulus11_check)
+
+
 def cpr_bin_check(numbers: list[Match], cprs: list[Match], num_bins=None, cutoff=0.25):
     """Takes a list of N cpr-looking numbers and a subset accepted cpr-numbers,
     and divides them into N / (3 * log N) "bins" based on their position in the scanned object.
@@ -328,6 +419,86 @@ class CprProbabilityCalculator(object):
         else:
             return 0.1
 
+    _cpr_check_outcomes = (
+        "Illegal date",
+        "CPR newer than today",
+        0.5,
+        "Modulus 11 does not match",
+        "CPR is not a legal value",
+        1.0, 0.8, 0.6, 0.25, 0.1,
+    )
+
+    @staticmethod
+    def _legal_7s_many(year: np.ndarray) -> np.ndarray:
+        """Returns a mask of the legal values of CPR digit 7 for each of an
+        array of years, with one row per year and one column per digit. (This
+        is the batch version of _legal_7s.)"""
+        legal_7s = np.zeros((len(year), 10), dtype=bool)
+        for low, high, sevens in (
+                (1858, 1899, [5, 6, 7, 8]),
+                (1900, 1936, [0, 1, 2, 3]),
+                (1937, 1999, [0, 1, 2, 3, 4, 9]),
+                (2000, 2036, [4, 5, 6, 7, 8, 9]),
+                (2037, 2057, [5, 6, 7, 8])):
+            in_range = (year >= low) & (year <= high)
+            legal_7s[np.ix_(in_range, sevens)] = True
+        return legal_7s
+
+    def _cpr_check_batch(
+            self, digits: np.ndarray, do_mod11_check: bool) -> list[Union[str, float]]:
+        birth_date, valid = _birth_dates(digits)
+        today = date.today()
+        newer = birth_date > today.year * 10000 + today.month * 100 + today.day
+        exception = np.isin(birth_date, _exception_dates)
+        mod11_failed = (
+                np.zeros(len(digits), dtype=bool) if not do_mod11_check
+                else ~_modulus11_many(digits))
+
+        # Rather than building the list of legal CPR numbers for each date and
+        # looking for each number in it, work out where each number would be
+        # in its list. The list is sorted by digit 7 and then by serial number
+        # (the last three digits), so a number's index is the count of legal
+        # numbers with a smaller digit 7, plus the count of legal numbers with
+        # the same digit 7 and a smaller serial number
+        year_check = digits[:, 6]
+        serial = digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+        legal_7s = self._legal_7s_many(birth_date // 10000)
+        rows = np.arange(len(digits))
+        if do_mod11_check:
+            date_sum = digits[:, :6] @ _mod_11_weights[:6]
+            # residues[n, k] is the residue that the serial number of a legal
+            # number must have to complete the nth number's date and k
+            residues = -(date_sum[:, np.newaxis] + 4 * np.arange(10)) % 11
+            group_size = _serial_rank[residues, 1000]
+            rank = _serial_rank[residues[rows, year_check], serial]
+        else:
+            group_size = np.full((len(digits), 10), 1000)
+            rank = serial
+        before = np.arange(10) < year_check[:, np.newaxis]
+        index = (group_size * (legal_7s & before)).sum(axis=1) + rank
+
+        outcome = np.select(
+                [~valid, newer, exception, mod11_failed,
+                 ~legal_7s[rows, year_check],
+                 index <= 100, index <= 200, index <= 250, index <= 350],
+                [0, 1, 2, 3, 4, 5, 6, 7, 8],
+                9)
+        return [self._cpr_check_outcomes[o] for o in outcome.tolist()]
+
+    def cpr_check_many(
+            self, cprs: Sequence[str],
+            do_mod11_check=True) -> list[Union[str, float]]:
+        """Performs cpr_check on each of a sequence of CPR numbers at once,
+        returning exactly what it would have returned for each of them.
+
+        Checking a large number of candidates this way is much faster than
+        checking them one at a time, and doesn't need to build (and cache) the
+        lists of legal CPR numbers for each date."""
+        return _in_batches(
+                cprs,
+                lambda digits: self._cpr_check_batch(digits, do_mod11_check),
+                lambda cpr: self.cpr_check(cpr, do_mod11_check=do_mod11_check))
+
 
 if __name__ == "__main__":
     cpr_calc = CprProbabilityCalculator()
@@ -0,0 +1,21 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from ..rule import SimpleRule
+
+
+class MatchMemo(dict[SimpleRule, list[dict]]):
+    """A MatchMemo remembers the results of the SimpleRules that have been
+    evaluated against a single object, so that Rule.try_match doesn't need to
+    evaluate them again when they turn up in another part of a rule (or in
+    another call to Rule.try_match, after the object has been converted to
+    another representation).
+
+    A MatchMemo must only ever be used for one object. It also counts the
+    number of evaluations it has saved."""
+
+    def __init__(self):
+        super().__init__()
+        self.hits = 0
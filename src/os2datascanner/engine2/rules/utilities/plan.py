@@ -0,0 +1,173 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import re
+from functools import lru_cache
+from itertools import islice, tee
+
+from ..rule import Rule, SimpleRule, SimpleTextRule
+from ..regex import RegexRule
+from ..wordlists import OrderedWordlistRule, word_regex
+
+
+def find_text_heads(r: Rule) -> set[SimpleTextRule]:
+    """Returns the set of SimpleTextRules that Rule.try_match could evaluate
+    directly while reducing the given Rule.
+
+    (Unlike Rule.flatten, this does not descend into the Rules wrapped by
+    SimpleRules like DictLookupRule, as those are evaluated against a
+    different text.)"""
+    heads = set()
+    seen = set()
+    pending = [r]
+    while pending:
+        here = pending.pop()
+        if isinstance(here, bool) or here in seen:
+            continue
+        seen.add(here)
+
+        head, pve, nve = here.split()
+        if isinstance(head, SimpleTextRule):
+            heads.add(head)
+        pending.extend((pve, nve))
+    return heads
+
+
+_WORDLISTS = "wordlists"
+
+
+class TextRulePlan:
+    """A TextRulePlan groups together SimpleTextRules that can share a pass
+    over a text:
+
+    * all OrderedWordlistRules share a single tokenisation pass, with every
+      token being looked up in one combined index of words; and
+    * RegexRules (including CPRRules) with the same expression share a
+      single scan for candidate matches.
+
+    All other SimpleTextRules are evaluated on their own. In all cases, the
+    results are exactly those that SimpleRule.match would have produced.
+
+    (Merging different expressions into a single alternation does not make
+    Python's backtracking regular expression engine any faster, so this class
+    deliberately doesn't attempt to do that.)"""
+
+    def __init__(self, rules):
+        self._groups = {}
+        self._word_index = {}
+        for rule in dict.fromkeys(rules):
+            if type(rule).match is OrderedWordlistRule.match:
+                key = _WORDLISTS
+            elif type(rule).match is RegexRule.match:
+                key = (RegexRule.type_label, rule.expression)
+            else:
+                key = rule
+            self._groups.setdefault(key, []).append(rule)
+
+        wordlists = self._groups.pop(_WORDLISTS, [])
+        if len(wordlists) == 1:
+            # A single wordlist gains nothing from a combined index
+            self._groups[wordlists[0]] = wordlists
+        elif wordlists:
+            self._groups[_WORDLISTS] = wordlists
+            for rule in wordlists:
+                for word in rule.words:
+                    self._word_index.setdefault(word, []).append(rule)
+        self._group_of = {
+                rule: key for key, rules in self._groups.items() for rule in rules}
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def compile(cls, rule: Rule) -> 'TextRulePlan':
+        """Builds a TextRulePlan for every SimpleTextRule that might be
+        evaluated directly while reducing the given Rule. (TextRulePlans are
+        immutable, so the plans of recently seen Rules are reused.)"""
+        return cls(find_text_heads(rule))
+
+    @property
+    def rules(self) -> frozenset[SimpleTextRule]:
+        return frozenset(self._group_of)
+
+    def __contains__(self, rule: SimpleRule) -> bool:
+        return rule in self._group_of
+
+    def __len__(self):
+        return len(self._group_of)
+
+    def evaluate(
+            self, rule: SimpleTextRule, content: str, results: dict,
+            *, obj_limit=None) -> list[dict]:
+        """Returns (at most obj_limit of) the matches of the given
+        SimpleTextRule against a text.
+
+        The first time a rule is requested, every other rule that shares a
+        pass over the text with it is evaluated as well; their results are
+        stored in the results dictionary, which should be kept for as long as
+        the text stays the same."""
+        if rule not in results:
+            key = self._group_of[rule]
+            group = self._groups[key]
+            if key is _WORDLISTS:
+                results |= self._evaluate_wordlists(group, content, obj_limit)
+            elif len(group) > 1 and content is not None:
+                results |= self._evaluate_shared_expression(
+                        group, content, obj_limit)
+            else:
+                results[rule] = list(islice(rule.match(content), obj_limit))
+        return results[rule]
+
+    def execute(
+            self, content: str,
+            *, obj_limit=None) -> dict[SimpleTextRule, list[dict]]:
+        """Evaluates every SimpleTextRule in this plan against the given text,
+        returning a dictionary mapping each of them to (at most obj_limit of)
+        its matches."""
+        results = {}
+        for rule in self.rules:
+            self.evaluate(rule, content, results, obj_limit=obj_limit)
+        return results
+
+    def _evaluate_wordlists(self, group, content, obj_limit):
+        results = {rule: [] for rule in group}
+        if content is None:
+            return results
+
+        unsatisfied = len(results)
+        for m in word_regex.finditer(content):
+            if rules := self._word_index.get(str(m.group()).lower()):
+                unsatisfied -= self._record_word(
+                        rules, OrderedWordlistRule.make_match(m, content),
+                        results, obj_limit)
+                if not unsatisfied:
+                    break
+        return results
+
+    @staticmethod
+    def _record_word(rules, match_dict, results, obj_limit) -> int:
+        """Records a match for every wordlist rule that still wants one,
+        returning the number of rules that have now reached obj_limit."""
+        satisfied = 0
+        for rule in rules:
+            found = results[rule]
+            if obj_limit is None or len(found) < obj_limit:
+                # Each rule gets its own copy, as the matcher will postprocess
+                # the results in place
+                found.append(dict(match_dict))
+                if len(found) == obj_limit:
+                    satisfied += 1
+        return satisfied
+
+    @staticmethod
+    def _evaluate_shared_expression(group, content, obj_limit):
+        # All of these rules use the same expression, so we only need to
+        # search for candidates once. (tee() only buffers as many candidates
+        # as the laggiest consumer still needs, so obj_limit still lets us
+        # stop early)
+        candidate_streams = tee(
+                re.finditer(group[0].expression, content), len(group))
+        return {
+            rule: list(islice(rule.match_candidates(candidates, content), obj_limit))
+            for rule, candidates in zip(group, candidate_streams)
+        }
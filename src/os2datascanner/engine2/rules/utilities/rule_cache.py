@@ -0,0 +1,79 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from collections import OrderedDict
+from functools import cache
+from hashlib import blake2b
+import json
+import threading
+from typing import Optional
+
+from ... import settings
+from ..rule import Rule
+
+
+class RuleCache:
+    """A RuleCache is a bounded cache of Rule objects, keyed by a fingerprint
+    of their JSON representations.
+
+    Every message in a scan carries the JSON form of the scan's Rule, and
+    building a Rule from it compiles regular expressions, sets up word lists
+    and so on. As Rules are immutable once built, a process can instead build
+    each distinct Rule once and share it between all of the messages that
+    carry it. When the cache is full, the least recently used Rule is
+    forgotten."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._rules: OrderedDict[bytes, Rule] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(obj: dict) -> Optional[bytes]:
+        """Returns a canonical hash of the JSON representation of a Rule, or
+        None if it can't be hashed."""
+        try:
+            canonical = json.dumps(
+                    obj, sort_keys=True, separators=(",", ":"),
+                    ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+        return blake2b(canonical.encode(), digest_size=16).digest()
+
+    def from_json_object(self, obj: dict) -> Rule:
+        """As Rule.from_json_object, but returns a previously built Rule if
+        one with the same JSON representation is available."""
+        key = self.fingerprint(obj) if self._max_size > 0 else None
+        if key is None:
+            return Rule.from_json_object(obj)
+
+        with self._lock:
+            if (rule := self._rules.get(key)) is not None:
+                self._rules.move_to_end(key)
+                self.hits += 1
+                return rule
+
+        rule = Rule.from_json_object(obj)
+        with self._lock:
+            self.misses += 1
+            self._rules[key] = rule
+            while len(self._rules) > self._max_size:
+                self._rules.popitem(last=False)
+        return rule
+
+    def __len__(self):
+        return len(self._rules)
+
+    def clear(self):
+        with self._lock:
+            self._rules.clear()
+
+
+@cache
+def get_rule_cache() -> RuleCache:
+    """Returns this process's RuleCache."""
+    return RuleCache(settings.rules["cache"]["max_size"])
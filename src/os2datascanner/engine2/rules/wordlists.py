@@ -8,28 +8,10 @@ import re
 from typing import Iterator, Optional
 
 from .rule import Rule, SimpleTextRule
-from .datasets.loader import common as common_loader
+from .datasets.index import DatasetIndex, get_index
 from .utilities.properties import RulePrecedence, RuleProperties
 
-
-def load_words(dataset):
-    """
-    Loads a dataset as an iterable.
-
-    The content of the dataset is flattened, if it contains
-    any structured data.
-    """
-    loaded = common_loader.load_dataset("wordlists", dataset)
-
-    def _flatten(elem):
-        match elem:
-            case list():
-                for e in elem:
-                    yield from _flatten(e)
-            case _:
-                yield str(elem).lower()
-
-    yield from _flatten(loaded)
+word_regex = re.compile(r"\w+", re.IGNORECASE | re.DOTALL)
 
 
 @Rule.register_class
@@ -44,6 +26,7 @@ class OrderedWordlistRule(SimpleTextRule):
     """
     type_label = "ordered-wordlist"
     eq_properties = ("_dataset",)
+    reports_offsets = True
     properties = RuleProperties(
         precedence=RulePrecedence.RIGHT,
         standalone=False)
@@ -51,13 +34,18 @@ class OrderedWordlistRule(SimpleTextRule):
     def __init__(self, dataset: str, **super_kwargs):
         super().__init__(**super_kwargs)
         self._dataset = dataset
-        self._wordlists = frozenset(load_words(dataset))
-        self._compiled_expr = re.compile(r"\w+", re.IGNORECASE | re.DOTALL)
+        self._wordlists = get_index("wordlists", dataset, case="lower")
+        self._compiled_expr = word_regex
 
     @property
     def presentation_raw(self) -> str:
         return f"lists of words from dataset {self._dataset}"
 
+    @property
+    def words(self) -> DatasetIndex:
+        """The (lower-case) words that this rule looks for."""
+        return self._wordlists
+
     def match(self, content: str) -> Optional[Iterator[dict]]:  # noqa
 
         if content is None:
@@ -66,15 +54,21 @@ class OrderedWordlistRule(SimpleTextRule):
         for m in self._compiled_expr.finditer(content):
             lowered = str(m.group()).lower()
             if lowered in self._wordlists:
-                begin, end = m.span()
-                context_begin = max(begin - 50, 0)
-                context_end = min(end + 50, len(content))
-                yield {
-                    "match": m.group(),
-                    "offset": begin,
-                    "context": content[context_begin:context_end],
-                    "context_offset": min(begin, 50)
-                }
+                yield self.make_match(m, content)
+
+    @staticmethod
+    def make_match(m: re.Match, content: str) -> dict:
+        """Builds the match dictionary for a word found in the provided
+        content."""
+        begin, end = m.span()
+        context_begin = max(begin - 50, 0)
+        context_end = min(end + 50, len(content))
+        return {
+            "match": m.group(),
+            "offset": begin,
+            "context": content[context_begin:context_end],
+            "context_offset": min(begin, 50)
+        }
 
     def get_censor_intervals(self, context):
         return [m.span() for m in self._compiled_expr.finditer(context)
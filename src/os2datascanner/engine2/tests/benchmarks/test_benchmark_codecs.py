@@ -0,0 +1,76 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for the content encodings of pipeline messages: time taken to
+encode a message, send it and decode it again, and the size of its body on
+the wire, for each encoding that PikaPipelineThreads understand, for no
+encoding at all, and for gzip at its default compression level (which every
+stage used to use)."""
+import gzip
+import json
+import pytest
+
+from os2datascanner.engine2.model.smbc import SMBCSource, SMBCHandle
+from os2datascanner.engine2.pipeline import messages
+from os2datascanner.engine2.pipeline.utilities.pika import _coders
+from os2datascanner.engine2.rules.cpr import CPRRule
+from os2datascanner.engine2.rules.logical import AndRule, OrRule
+from os2datascanner.engine2.rules.regex import RegexRule
+from .utilities import HTML_CONTENT
+
+
+coders = _coders | {
+    "gzip (level 9)": (gzip.compress, gzip.decompress),
+    "none": (bytes, bytes),
+}
+
+rule = OrRule(
+        CPRRule(modulus_11=True, examine_context=True),
+        AndRule(RegexRule("hemmelig"), RegexRule("adgangskode")))
+scan_spec = messages.ScanSpecMessage(
+        scan_tag=messages.ScanTagFragment.make_dummy(),
+        source=SMBCSource("//fileserver/brugere", "DOMAIN\\scanner"),
+        rule=rule,
+        configuration={"skip_mime_types": ["image/*"]},
+        filter_rule=None,
+        progress=None)
+handle = SMBCHandle(
+        scan_spec.source, "Dokumenter/Projekter/2024/Budget - udkast 3.docx")
+
+
+def make_corpus():
+    """Returns the JSON forms of a ConversionMessage and of a MatchesMessage
+    for a document with a realistic number of matches."""
+    cpr = CPRRule(modulus_11=True, examine_context=True)
+    return {
+        "conversion": messages.ConversionMessage(
+                scan_spec=scan_spec, handle=handle,
+                progress=messages.ProgressFragment(
+                        rule=rule, matches=[])).to_json_object(),
+        "matches": messages.MatchesMessage(
+                scan_spec=scan_spec, handle=handle, matched=True,
+                matches=[messages.MatchFragment(
+                        rule=cpr,
+                        matches=list(cpr.match(HTML_CONTENT)))
+                         ]).to_json_object(),
+    }
+
+
+corpus = make_corpus()
+
+
+def round_trip(encoder, decoder, obj):
+    return json.loads(decoder(encoder(json.dumps(obj).encode())))
+
+
+@pytest.mark.parametrize("kind", corpus.keys())
+@pytest.mark.parametrize("name", coders.keys())
+def test_benchmark_codec(benchmark, kind, name):
+    """Encode and decode a pipeline message."""
+    encoder, decoder = coders[name]
+    obj = corpus[kind]
+    benchmark.group = f"message codecs: {kind}"
+    benchmark.extra_info["bytes"] = len(encoder(json.dumps(obj).encode()))
+    assert benchmark(round_trip, encoder, decoder, obj) == obj
@@ -0,0 +1,57 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for the validation of CPR candidates: checking the ten-digit
+numbers found in a large spreadsheet-like text one at a time and all at
+once."""
+import random
+
+from os2datascanner.engine2.rules.utilities.cpr_probability import (
+        CprProbabilityCalculator, modulus11_check, modulus11_check_many)
+
+
+def make_candidates(count=2000):
+    """Returns ten-digit numbers of the kind that a CSV export might contain:
+    about half of them look like dates."""
+    rng = random.Random(11)
+    return [
+        str(rng.randrange(0, 9999999999)).zfill(10) if i % 2 else
+        "{0:02}{1:02}{2:02}{3:04}".format(
+                rng.randrange(1, 29), rng.randrange(1, 13),
+                rng.randrange(100), rng.randrange(10000))
+        for i in range(count)]
+
+
+def validate_one_at_a_time(calculator, candidates):
+    return [
+        (modulus11_check(c), calculator.cpr_check(c))
+        for c in candidates]
+
+
+def validate_all_at_once(calculator, candidates):
+    return list(zip(
+            modulus11_check_many(candidates),
+            calculator.cpr_check_many(candidates)))
+
+
+def test_benchmark_validate_one_at_a_time(benchmark):
+    """Validate candidates with the scalar functions. (The calculator's cache
+    of legal CPR numbers is shared between rounds, as it would be in a
+    worker.)"""
+    candidates = make_candidates()
+    benchmark.group = "cpr validation"
+    benchmark.extra_info["candidates"] = len(candidates)
+    benchmark(validate_one_at_a_time, CprProbabilityCalculator(), candidates)
+
+
+def test_benchmark_validate_all_at_once(benchmark):
+    """Validate candidates with the batch functions."""
+    candidates = make_candidates()
+    calculator = CprProbabilityCalculator()
+    benchmark.group = "cpr validation"
+    benchmark.extra_info["candidates"] = len(candidates)
+    result = benchmark(validate_all_at_once, calculator, candidates)
+
+    assert result == validate_one_at_a_time(calculator, candidates)
@@ -0,0 +1,97 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for the web crawler: the cost of managing a large frontier, and
+the time taken to crawl a small site served (with some artificial latency) by a
+local stub HTTP server with one request in flight at a time and with several."""
+import http.server
+import threading
+import time
+import pytest
+import requests
+
+from os2datascanner.engine2.model.utilities.crawler import Crawler, WebCrawler
+from os2datascanner.engine2.utilities.backoff import WebRetrier
+
+PAGES = 60
+LINKS = 5
+LATENCY = 0.01
+
+
+class _ListCrawler(Crawler):
+    def visit_one(self, obj, ttl, hints):
+        yield obj
+
+
+def crawl_frontier(count):
+    crawler = _ListCrawler()
+    for i in range(count):
+        crawler.add(i)
+    return sum(1 for _ in crawler.visit())
+
+
+@pytest.mark.parametrize("count", [10_000, 200_000])
+def test_benchmark_crawler_frontier(benchmark, count):
+    """Visit a frontier of count objects that were all added up front."""
+    benchmark.group = "crawler-frontier"
+    assert benchmark.pedantic(crawl_frontier, args=(count,), rounds=3) == count
+
+
+class _SiteHandler(http.server.BaseHTTPRequestHandler):
+    """Serves a site of PAGES HTML pages, each of which links to the next LINKS
+    pages, after a delay of LATENCY seconds."""
+
+    def _respond(self, body: bool):
+        time.sleep(LATENCY)
+        page = int(self.path.strip("/") or 0)
+        content = "".join(
+                f'<a href="/{(page + i) % PAGES or ""}">{i}</a>'
+                for i in range(1, LINKS + 1)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def site():
+    server = http.server.ThreadingHTTPServer(("localhost", 0), _SiteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://localhost:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def crawl_site(url, workers):
+    with requests.Session() as session:
+        crawler = WebCrawler(
+                url, session, ttl=PAGES, workers=workers, per_host=workers,
+                retrier=WebRetrier(max_tries=1))
+        crawler.add(url)
+        return [url for _, url in crawler.visit()]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_benchmark_crawler_site(benchmark, site, workers):
+    """Crawl every page of a local site."""
+    benchmark.group = "crawler-site"
+    expected = crawl_site(site, 1)
+    assert len(expected) == PAGES
+    assert benchmark.pedantic(
+            crawl_site, args=(site, workers), rounds=3) == expected
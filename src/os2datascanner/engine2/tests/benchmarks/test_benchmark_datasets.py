@@ -0,0 +1,44 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for loading the datasets used by NameRule: parsing them into
+Python sets, as every NameRule used to, and opening their compiled indexes."""
+from os2datascanner.engine2.rules.datasets.index import get_index
+from os2datascanner.engine2.rules.datasets.loader import Loader
+
+_FIRST_NAMES = (
+    "da_20140101_dst_fornavne-mænd", "da_20140101_dst_fornavne-kvinder")
+_LAST_NAMES = ("da_20140101_dst_efternavne",)
+
+
+def load_sets():
+    loader = Loader()
+    return (
+            {n.upper() for ds in _FIRST_NAMES
+             for n in loader.load_dataset("names", ds)},
+            {n.upper() for ds in _LAST_NAMES
+             for n in loader.load_dataset("names", ds)})
+
+
+def open_indexes():
+    # Skip the per-process cache, so that the index files are opened (but not
+    # compiled) every time
+    get_index.cache_clear()
+    return (
+            get_index("names", *_FIRST_NAMES, case="upper"),
+            get_index("names", *_LAST_NAMES, case="upper"))
+
+
+def test_benchmark_load_name_sets(benchmark):
+    benchmark.group = "name datasets"
+    benchmark(load_sets)
+
+
+def test_benchmark_open_name_indexes(benchmark):
+    benchmark.group = "name datasets"
+    expected = load_sets()
+    result = benchmark(open_indexes)
+
+    assert [set(r) for r in result] == list(expected)
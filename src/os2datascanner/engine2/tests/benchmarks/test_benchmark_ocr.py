@@ -0,0 +1,47 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for OCR: throughput (in images per second) of starting a new
+OCR subprocess for every image, of feeding images to an OCRServer one at a
+time, and of feeding them to it in a single batch."""
+from pathlib import Path
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.conversions.text.ocr import tesseract_pymupdf
+from os2datascanner.engine2.conversions.utilities import ocr_server
+
+IMAGES = [
+    p.read_bytes()
+    for p in sorted((Path(__file__).parent.parent / "data" / "ocr" / "good").iterdir())]
+
+
+def recognise_all(images):
+    return [tesseract_pymupdf(image) for image in images]
+
+
+def recognise_batch(images):
+    return ocr_server.get_ocr_server().recognise_many(images)
+
+
+@pytest.mark.parametrize("server,recognise", [
+    (False, recognise_all),
+    (True, recognise_all),
+    (True, recognise_batch),
+], ids=["cli", "server", "batch"])
+def test_benchmark_ocr(benchmark, monkeypatch, server, recognise):
+    """OCR a handful of small images. (Divide the number of images by the mean
+    time to get the number of images per second.)"""
+    monkeypatch.setitem(settings.tesseract, "server", server)
+    benchmark.group = "ocr"
+    benchmark.extra_info["images"] = len(IMAGES)
+    try:
+        if server:
+            # Don't count the cost of starting the server
+            recognise_all(IMAGES[:1])
+        benchmark.pedantic(recognise, args=(IMAGES,), rounds=5)
+    finally:
+        if ocr_server._server is not None:
+            ocr_server._server.stop()
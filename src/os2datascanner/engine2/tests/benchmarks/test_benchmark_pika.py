@@ -0,0 +1,28 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for the throughput of a PikaPipelineThread: time taken to
+receive, handle, acknowledge and answer a burst of small messages, with an
+in-process broker standing in for RabbitMQ (so that only the overhead of the
+PikaPipelineThread itself is measured)."""
+import pytest
+
+from ..test_pika_thread import consume
+
+
+MESSAGES = 200
+
+
+@pytest.mark.parametrize("prefetch_count", [1, 16])
+def test_benchmark_pika_throughput(benchmark, prefetch_count):
+    """Send a burst of messages through a PikaPipelineThread."""
+    benchmark.group = "pika throughput"
+    channel = benchmark.pedantic(
+            consume, args=(MESSAGES,),
+            kwargs={"prefetch_count": prefetch_count},
+            rounds=3, iterations=1)
+    benchmark.extra_info["messages"] = MESSAGES
+    benchmark.extra_info["acks"] = len(channel.acks)
+    assert len(channel.published) == MESSAGES
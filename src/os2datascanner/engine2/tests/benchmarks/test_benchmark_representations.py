@@ -0,0 +1,68 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for the hand-over of representations from the processor to the
+matcher inside a worker: time taken and bytes copied per object, when the
+representations are passed along as they are and when they make a round trip
+through their JSON-friendly forms (as they did before RepresentationMessage
+took over their serialisation)."""
+import tracemalloc
+
+from os2datascanner.engine2.conversions.types import (
+        OutputType, decode_dict, encode_dict)
+from os2datascanner.engine2.conversions.utilities.navigable import (
+        make_values_navigable)
+from .utilities import HTML_CONTENT
+
+
+def make_representations():
+    """Returns representations of the kind that a conversion produces: a
+    navigable text whose parent also carries some related values."""
+    parent = make_values_navigable({
+        OutputType.Text: HTML_CONTENT,
+        OutputType.LastModified: None,
+        OutputType.Links: [],
+    })
+    return {k.value: v for k, v in parent.items()}
+
+
+def hand_over_native(representations):
+    return dict(representations)
+
+
+def hand_over_round_trip(representations):
+    return decode_dict(encode_dict(representations))
+
+
+def bytes_copied(func, representations) -> int:
+    """Returns the peak number of bytes allocated while handing over the
+    given representations."""
+    tracemalloc.start()
+    try:
+        result = func(representations)  # noqa: F841, kept alive for measuring
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_benchmark_hand_over_round_trip(benchmark):
+    """Hand over representations by encoding and decoding them."""
+    representations = make_representations()
+    benchmark.group = "representation hand-over"
+    benchmark.extra_info["bytes_copied"] = bytes_copied(
+            hand_over_round_trip, representations)
+    benchmark(hand_over_round_trip, representations)
+
+
+def test_benchmark_hand_over_native(benchmark):
+    """Hand over representations as they are."""
+    representations = make_representations()
+    benchmark.group = "representation hand-over"
+    benchmark.extra_info["bytes_copied"] = copied = bytes_copied(
+            hand_over_native, representations)
+    result = benchmark(hand_over_native, representations)
+
+    assert result[OutputType.Text.value] is representations[OutputType.Text.value]
+    assert copied < len(HTML_CONTENT)
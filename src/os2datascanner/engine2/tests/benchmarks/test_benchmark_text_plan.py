@@ -0,0 +1,56 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Benchmarking for TextRulePlan: throughput of evaluating a growing number of
+text rules against the same content, with and without a plan."""
+import pytest
+
+from os2datascanner.engine2.rules.cpr import CPRRule
+from os2datascanner.engine2.rules.regex import RegexRule
+from os2datascanner.engine2.rules.wordlists import OrderedWordlistRule
+from os2datascanner.engine2.rules.utilities.plan import TextRulePlan
+from .utilities import HTML_CONTENT
+
+
+def make_rules(count: int):
+    """Returns count distinct text rules: a mixture of CPRRule variants (which
+    share an expression), wordlists and other regular expressions, of the kind
+    that a typical scanner job combines."""
+    wordlists = [
+        OrderedWordlistRule(dataset)
+        for dataset in ("da_20211018_laegehaandbog_stikord",
+                        "en_20211018_unit_test_words")][:count // 4]
+    regexes = [
+        RegexRule(rf"\b[A-Z]{{2}}\d{{{n}}}\b")
+        for n in range(3, 3 + count // 4)]
+    cprs = [
+        CPRRule(surrounding_exceptions=[f"undtagelse{i}"])
+        for i in range(count - len(wordlists) - len(regexes))]
+    return cprs + wordlists + regexes
+
+
+def evaluate_individually(rules, content):
+    return {rule: list(rule.match(content)) for rule in rules}
+
+
+@pytest.mark.parametrize("count", [1, 2, 4, 8, 15])
+def test_benchmark_rules_individually(benchmark, count):
+    """Evaluate count text rules one at a time, one pass per rule."""
+    rules = make_rules(count)
+    benchmark.group = f"text rules: {count}"
+    benchmark.extra_info["bytes"] = len(HTML_CONTENT)
+    benchmark(evaluate_individually, rules, HTML_CONTENT)
+
+
+@pytest.mark.parametrize("count", [1, 2, 4, 8, 15])
+def test_benchmark_rules_with_plan(benchmark, count):
+    """Evaluate count text rules through a TextRulePlan."""
+    rules = make_rules(count)
+    plan = TextRulePlan(rules)
+    benchmark.group = f"text rules: {count}"
+    benchmark.extra_info["bytes"] = len(HTML_CONTENT)
+    results = benchmark(plan.execute, HTML_CONTENT)
+
+    assert results == evaluate_individually(rules, HTML_CONTENT)
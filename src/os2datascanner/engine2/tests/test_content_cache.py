@@ -0,0 +1,165 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import shutil
+import pytest
+from prometheus_client import REGISTRY
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.conversions.types import OutputType
+from os2datascanner.engine2.conversions.utilities.cache import ContentCache
+from os2datascanner.engine2.conversions.utilities.windows import WindowedText
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.core import resource as resource_module
+from os2datascanner.engine2.model.file import FilesystemHandle, FilesystemResource
+from os2datascanner.engine2.pipeline import processor
+
+
+here_path = os.path.dirname(__file__)
+text_file_path = os.path.join(here_path, "data", "cpr_same_birth_date.txt")
+
+
+@pytest.fixture(autouse=True)
+def secret_value(monkeypatch):
+    monkeypatch.setattr(settings, "secret_value", "Vejstrand")
+
+
+@pytest.fixture
+def copies(tmp_path):
+    """Returns Handles to three identical copies of the same text file in
+    different places, and one different file."""
+    paths = []
+    for name in ("a", "b", "c"):
+        (tmp_path / name).mkdir()
+        paths.append(shutil.copy(text_file_path, tmp_path / name / "fil.txt"))
+    other = tmp_path / "andet.txt"
+    other.write_text("Noget helt andet")
+    paths.append(other)
+    return [FilesystemHandle.make_handle(str(p)) for p in paths]
+
+
+def test_identical_content_converted_once(tmp_path, copies):
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+
+    with SourceManager() as sm:
+        texts = [cc.convert(h.follow(sm), OutputType.Text) for h in copies]
+
+    assert texts[0] == texts[1] == texts[2] != texts[3]
+    assert (cc.hits, cc.misses) == (2, 2)
+    assert hasattr(texts[1], "parent")
+
+
+def test_miss_reads_once(tmp_path, copies, monkeypatch):
+    """Identifying an object that isn't in the cache shouldn't mean that
+    converting it has to read it all over again."""
+    opened = []
+
+    def _open(path, *args, **kwargs):
+        opened.append(str(path))
+        return open(path, *args, **kwargs)
+    monkeypatch.setattr(resource_module, "open", _open, raising=False)
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+
+    with SourceManager() as sm:
+        resource = copies[0].follow(sm)
+        # (Computing the type of the object reads a little of it first)
+        resource.compute_type()
+        opened.clear()
+
+        assert cc.convert(resource, OutputType.Text)
+        # The local copy of the content is gone once it's been converted
+        assert not os.path.exists(opened[-1])
+
+    assert cc.misses == 1
+    assert opened.count(os.path.join(
+            copies[0].source.path, copies[0].relative_path)) == 1
+
+
+def test_uncached_output_types(tmp_path, copies):
+    cc = ContentCache(
+            tmp_path / "cache", max_size=1 << 20,
+            output_types=(OutputType.Text,))
+
+    with SourceManager() as sm:
+        for h in copies[:2]:
+            cc.convert(h.follow(sm), OutputType.LastModified)
+
+    assert (cc.hits, cc.misses) == (0, 0)
+    assert cc.size == 0
+
+
+def test_small_objects_not_cached(tmp_path, copies):
+    cc = ContentCache(
+            tmp_path / "cache", max_size=1 << 20,
+            min_size=os.path.getsize(text_file_path) + 1)
+
+    with SourceManager() as sm:
+        for h in copies:
+            cc.convert(h.follow(sm), OutputType.Text)
+
+    assert (cc.hits, cc.misses) == (0, 0)
+
+
+def test_eviction(tmp_path, copies):
+    """A full cache should evict its least recently used entries."""
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+    with SourceManager() as sm:
+        cc.convert(copies[0].follow(sm), OutputType.Text)
+        entry_size = cc.size
+
+        cc = ContentCache(tmp_path / "cache", max_size=entry_size)
+        cc.convert(copies[3].follow(sm), OutputType.Text)
+        assert cc.size <= entry_size
+
+        # The first text was evicted to make space for the second, so it has to
+        # be converted again
+        cc.convert(copies[1].follow(sm), OutputType.Text)
+        cc.convert(copies[3].follow(sm), OutputType.Text)
+    assert (cc.hits, cc.misses) == (0, 3)
+
+
+def test_corrupt_entry(tmp_path, copies):
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+    with SourceManager() as sm:
+        expected = cc.convert(copies[0].follow(sm), OutputType.Text)
+        for entry in (tmp_path / "cache").iterdir():
+            entry.write_bytes(b"not a representation")
+
+        assert cc.convert(copies[1].follow(sm), OutputType.Text) == expected
+    assert (cc.hits, cc.misses) == (0, 2)
+
+
+def test_streamed_text_not_identified(tmp_path, copies, monkeypatch):
+    """A text that will be streamed can't be stored, so the cache shouldn't
+    read the whole object to identify it first."""
+    monkeypatch.setitem(settings.conversions["streaming"], "threshold", 1)
+
+    def _fail(self):
+        raise AssertionError("content identifier computed")
+    monkeypatch.setattr(FilesystemResource, "compute_content_identifier", _fail)
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+
+    with SourceManager() as sm:
+        text = cc.convert(copies[0].follow(sm), OutputType.Text)
+
+    assert isinstance(text, WindowedText)
+    assert (cc.hits, cc.misses) == (0, 0)
+
+
+def test_metrics(tmp_path, copies, monkeypatch):
+    cc = ContentCache(tmp_path / "cache", max_size=1 << 20)
+    monkeypatch.setattr(processor, "get_content_cache", lambda: cc)
+
+    with SourceManager() as sm:
+        for h in copies:
+            cc.convert(h.follow(sm), OutputType.Text)
+
+    assert REGISTRY.get_sample_value(
+            "os2datascanner_pipeline_processor_content_cache_hits_total") == 2
+    assert REGISTRY.get_sample_value(
+            "os2datascanner_pipeline_processor_content_cache_misses_total") == 2
+    assert REGISTRY.get_sample_value(
+            "os2datascanner_pipeline_processor_content_cache_size") == cc.size
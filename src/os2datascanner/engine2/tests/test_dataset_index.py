@@ -0,0 +1,139 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import mmap
+import os
+import stat
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.rules.datasets import index
+from os2datascanner.engine2.rules.datasets.index import (
+        DatasetIndex, compile_index, get_index)
+from os2datascanner.engine2.rules.datasets.loader import (
+        DatasetNotFoundError, Loader)
+
+
+@pytest.fixture
+def index_directory(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+            settings.rules["datasets"], "index_directory", str(tmp_path))
+    get_index.cache_clear()
+    yield tmp_path
+    get_index.cache_clear()
+
+
+class TestDatasetIndex:
+    @pytest.mark.parametrize("words", [
+        [],
+        [""],
+        ["JENSEN"],
+        ["JENSEN", "SØRENSEN", "MØLLER", "jensen", "10. Juli Vej", "Ærø"],
+        [str(i) for i in range(5000)],
+    ])
+    def test_contents(self, words):
+        """A DatasetIndex should contain exactly the strings that it was
+        compiled from."""
+        di = DatasetIndex(compile_index(words))
+
+        assert len(di) == len(set(words))
+        assert set(di) == set(words)
+        for w in words:
+            assert w in di
+        for w in ("Jensen", "JENSE", "JENSENS", "x" * 40, "Æ"):
+            assert (w in di) == (w in words)
+        assert 1 not in di
+
+    def test_not_an_index(self):
+        with pytest.raises(ValueError):
+            DatasetIndex(b"OSDSIDX0" + bytes(8))
+
+
+class TestGetIndex:
+    @pytest.mark.parametrize("category,datasets,case", [
+        ("names", ("da_20140101_dst_efternavne",), "upper"),
+        ("names", ("da_20140101_dst_fornavne-mænd",
+                   "da_20140101_dst_fornavne-kvinder"), "upper"),
+        ("addresses", ("da_addresses",), "upper"),
+        ("wordlists", ("en_20211018_unit_test_words",), "lower"),
+    ])
+    def test_same_as_dataset(self, category, datasets, case, index_directory):
+        """An index should contain the same entries as the datasets it was
+        compiled from."""
+        normalise = str.upper if case == "upper" else str.lower
+        expected = {
+            normalise(str(w))
+            for ds in datasets
+            for entry in Loader().load_dataset(category, ds)
+            for w in (entry if isinstance(entry, list) else [entry])}
+
+        assert set(get_index(category, *datasets, case=case)) == expected
+
+    def test_shared(self, index_directory):
+        """An index should be compiled once, stored in the index directory, and
+        memory-mapped from there by everyone who needs it."""
+        first = get_index("addresses", "da_addresses", case="upper")
+        assert first is get_index("addresses", "da_addresses", case="upper")
+
+        get_index.cache_clear()
+        second = get_index("addresses", "da_addresses", case="upper")
+
+        assert len(list(index_directory.iterdir())) == 1
+        assert isinstance(second._buffer, mmap.mmap)
+        assert "AABYGADE" in second
+
+    def test_unwritable_directory(self, index_directory, monkeypatch):
+        """An index that can't be stored should still be usable."""
+        def _fail(*args, **kwargs):
+            raise PermissionError
+        monkeypatch.setattr(index, "NamedTemporaryFile", _fail)
+
+        di = get_index("wordlists", "en_20211018_unit_test_words", case="lower")
+
+        assert "tapir" in di
+        assert not list(index_directory.iterdir())
+
+    def test_missing_dataset(self, index_directory):
+        with pytest.raises(DatasetNotFoundError):
+            get_index("names", "xx_nonexistent", case="upper")
+
+
+class TestIndexDirectory:
+    @pytest.fixture
+    def default_directory(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(settings.rules["datasets"], "index_directory", "")
+        monkeypatch.setattr(index, "gettempdir", lambda: str(tmp_path))
+        get_index.cache_clear()
+        yield tmp_path / f"os2datascanner-datasets-{os.getuid()}"
+        get_index.cache_clear()
+
+    def test_private(self, default_directory):
+        """The default index directory should be created so that only the
+        current user can use it."""
+        get_index("wordlists", "en_20211018_unit_test_words", case="lower")
+
+        st = default_directory.stat()
+        assert st.st_uid == os.getuid()
+        assert stat.S_IMODE(st.st_mode) == 0o700
+        assert len(list(default_directory.iterdir())) == 1
+
+    def test_untrustworthy(self, default_directory):
+        """An existing default index directory that other users can write to
+        shouldn't be used."""
+        default_directory.mkdir()
+        default_directory.chmod(0o777)
+
+        di = get_index("wordlists", "en_20211018_unit_test_words", case="lower")
+
+        assert "tapir" in di
+        assert not list(default_directory.iterdir())
+
+    def test_symbolic_link(self, default_directory, tmp_path):
+        (tmp_path / "elsewhere").mkdir(mode=0o700)
+        default_directory.symlink_to(tmp_path / "elsewhere")
+
+        get_index("wordlists", "en_20211018_unit_test_words", case="lower")
+
+        assert not list((tmp_path / "elsewhere").iterdir())
@@ -3,11 +3,14 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, you can
 # obtain one at http://mozilla.org/MPL/2.0/.
 
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
 from exchangelib import (Identity, Credentials, OAuth2Credentials)
+from exchangelib.errors import ErrorItemNotFound
 
+from os2datascanner.engine2 import settings
 from os2datascanner.engine2.model import ews
 from os2datascanner.engine2.model.ews import EWSMailResource
 
@@ -76,3 +79,78 @@ class TestEWSMailResource:
             identifier = resource.compute_content_identifier()
 
         assert len(identifier) <= 256
+
+
+class FakeAccount:
+    """An object that looks enough like an ews._EWSAccount for
+    EWSMailResource, and that records the requests made through it."""
+
+    def __init__(self, folders):
+        self.folders = {}
+        self.listings = {}
+        self.prefetched = {}
+        self.requests = []
+
+        self._contents = folders
+        self.root = SimpleNamespace(get_folder=self._get_folder)
+
+    def _get_folder(self, folder):
+        self.requests.append(("GetFolder", folder.id))
+        return SimpleNamespace(
+                id=folder.id,
+                all=lambda: SimpleNamespace(only=lambda *fields: [
+                        SimpleNamespace(id=mail_id)
+                        for mail_id in self._contents[folder.id]]))
+
+    def fetch(self, ids, only_fields=None):
+        self.requests.append(("GetItem", [mail_id for mail_id, _ in ids]))
+        for mail_id, _ in ids:
+            if any(mail_id in mails for mails in self._contents.values()):
+                yield SimpleNamespace(
+                        id=mail_id, message_id=f"<{mail_id}@example.invalid>",
+                        mime_content=b"Subject: " + mail_id.encode())
+            else:
+                yield ErrorItemNotFound("no such item")
+
+
+class TestEWSMailPrefetching:
+    @pytest.fixture
+    def account(self, monkeypatch):
+        monkeypatch.setitem(settings.model["ews"], "batch_size", 3)
+        return FakeAccount({
+            "inbox": ["m0", "m1", "m2", "m3", "m4"],
+            "sent": ["s0"],
+        })
+
+    def _resource(self, account, path):
+        handle = MagicMock()
+        handle.relative_path = path
+        resource = EWSMailResource(handle, MagicMock())
+        resource._get_cookie = lambda: account
+        return resource
+
+    def test_batches(self, account):
+        """Messages should be fetched together with the ones after them in
+        their folder, and the folder should only be listed once."""
+        for mail_id in ("m0", "m1", "m2", "m3", "m4"):
+            resource = self._resource(account, f"inbox.{mail_id}")
+            assert resource.check()
+            with resource.make_stream() as fp:
+                assert fp.read() == b"Subject: " + mail_id.encode()
+
+        assert account.requests == [
+            ("GetFolder", "inbox"),
+            ("GetItem", ["m0", "m1", "m2"]),
+            ("GetItem", ["m3", "m4"]),
+        ]
+        assert account.prefetched == {}
+
+    def test_missing(self, account):
+        assert not self._resource(account, "inbox.m9").check()
+        with pytest.raises(ErrorItemNotFound):
+            self._resource(account, "inbox.m9").get_message_object()
+
+    def test_unbatched(self, account, monkeypatch):
+        monkeypatch.setitem(settings.model["ews"], "batch_size", 1)
+        self._resource(account, "sent.s0").get_message_object()
+        assert account.requests == [("GetItem", ["s0"])]
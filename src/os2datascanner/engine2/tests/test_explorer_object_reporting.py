@@ -0,0 +1,62 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Tests that the explorer reports the objects it publishes in batches, and
+that every object is reported after it's published and before the Source that
+contains it is reported as explored."""
+
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.pipeline import explorer, messages
+from os2datascanner.engine2.rules.regex import RegexRule
+
+from .model import DummySource
+
+
+def explore(count):
+    spec = messages.ScanSpecMessage(
+            scan_tag=messages.ScanTagFragment.make_dummy(),
+            source=DummySource(count, secret="hemmelighed"),
+            rule=RegexRule("dummy"),
+            configuration={},
+            progress=None,
+            filter_rule=None)
+    with SourceManager() as sm:
+        return list(explorer.message_received(spec, sm))
+
+
+@pytest.fixture(autouse=True)
+def batching(monkeypatch):
+    monkeypatch.setitem(settings.pipeline["explorer"], "status_batch", 10)
+    monkeypatch.setitem(settings.pipeline["explorer"], "status_interval", 3600)
+
+
+class TestObjectReporting:
+    @pytest.mark.parametrize("count", [0, 1, 10, 25])
+    def test_batches(self, count):
+        published = 0
+        reports = []
+        for message in explore(count):
+            match message:
+                case messages.ConversionMessage():
+                    published += 1
+                case messages.StatusMessage(new_objects=int() as n) if n:
+                    assert n <= published - sum(reports)
+                    reports.append(n)
+                case messages.StatusMessage(total_objects=int() as total):
+                    assert sum(reports) == published == total == count
+
+        assert reports == [10] * (count // 10) + (
+                [count % 10] if count % 10 else [])
+
+    def test_interval(self, monkeypatch):
+        """Objects should be reported straight away when the interval has
+        already passed, no matter how few of them there are."""
+        monkeypatch.setitem(settings.pipeline["explorer"], "status_interval", 0)
+        reports = [m.new_objects for m in explore(3)
+                   if isinstance(m, messages.StatusMessage) and m.new_objects]
+        assert reports == [1, 1, 1]
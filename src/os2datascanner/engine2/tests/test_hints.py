@@ -5,7 +5,13 @@
 
 import pytest
 
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.file import (
+        FilesystemSource, FilesystemHandle, FilesystemResource)
 from os2datascanner.engine2.model.smbc import SMBCSource, SMBCHandle
+from os2datascanner.engine2.model.utilities.stat_hints import stats_avoided
+from os2datascanner.engine2.utilities.datetime import parse_datetime
 
 
 @pytest.fixture
@@ -46,3 +52,72 @@ class TestHint:
 
         for k in hint_dict.keys():
             assert handle.hint(k) is None
+
+
+@pytest.fixture
+def explored(tmp_path):
+    (tmp_path / "file.txt").write_bytes(b"Hello, world!\n")
+    source = FilesystemSource(str(tmp_path))
+    with SourceManager() as sm:
+        handle, = source.handles(sm)
+    return handle
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    """Counts the number of times that FilesystemResource.unpack_stat is
+    called."""
+    calls = []
+    unpack_stat = FilesystemResource.unpack_stat
+
+    def _unpack_stat(self):
+        calls.append(self.handle)
+        return unpack_stat(self)
+    monkeypatch.setattr(FilesystemResource, "unpack_stat", _unpack_stat)
+    return calls
+
+
+class TestTrustedHints:
+    def test_explored_hints(self, explored, stats):
+        """Resources should answer questions about size and modification time
+        from the hints recorded when their Source was explored."""
+        avoided = stats_avoided["FilesystemResource"]
+        with SourceManager() as sm:
+            resource = explored.follow(sm)
+            assert resource.get_size() == 14
+            assert resource.get_last_modified() == parse_datetime(
+                    explored.hint("mtime"))
+
+        assert not stats
+        assert stats_avoided["FilesystemResource"] - avoided == 2
+
+    def test_known_metadata(self, explored, stats):
+        """Hints shouldn't be counted as having avoided a stat operation if
+        the Resource had already performed one."""
+        with SourceManager() as sm:
+            resource = explored.follow(sm)
+            resource.unpack_stat()
+            avoided = stats_avoided["FilesystemResource"]
+            assert resource.get_size() == 14
+
+        assert stats_avoided["FilesystemResource"] == avoided
+
+    def test_distrust(self, explored, stats, monkeypatch):
+        monkeypatch.setitem(settings.model["hints"], "trust", False)
+        with SourceManager() as sm:
+            assert explored.follow(sm).get_size() == 14
+        assert stats
+
+    def test_min_age(self, explored, stats, monkeypatch):
+        """Hints about a recently modified object shouldn't be trusted if the
+        staleness policy asks for older ones."""
+        monkeypatch.setitem(settings.model["hints"], "min_age", 3600)
+        with SourceManager() as sm:
+            assert explored.follow(sm).get_size() == 14
+        assert stats
+
+    def test_missing_hints(self, explored, stats):
+        handle = FilesystemHandle(explored.source, explored.relative_path)
+        with SourceManager() as sm:
+            assert handle.follow(sm).get_size() == 14
+        assert stats
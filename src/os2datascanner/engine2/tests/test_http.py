@@ -9,9 +9,10 @@ import http.server
 import unittest
 import contextlib
 import time
+import threading
 from random import choice
 from datetime import datetime
-from multiprocessing import Manager, Process
+from multiprocessing import Event, Process
 from requests import exceptions as rexc
 from unittest import mock
 from urllib3.util import connection
@@ -22,13 +23,13 @@ from os2datascanner.engine2.model.core import Handle, SourceManager
 from os2datascanner.engine2.model.http import (
         WebHandle, WebSource, try_make_relative)
 from os2datascanner.engine2.model.utilities.crawler import (
-        parse_html, make_outlinks)
+        WebCrawler, parse_html, make_outlinks)
 from os2datascanner.engine2.model.utilities.sitemap import (
     process_sitemap_url, _get_url_data)
 from os2datascanner.engine2.conversions.types import Link, OutputType
 from os2datascanner.engine2.conversions.registry import convert
 from os2datascanner.engine2.rules.links_follow import check
-from os2datascanner.engine2 import settings as engine2_settings
+from os2datascanner.engine2 import factory, settings as engine2_settings
 
 here_path = os.path.dirname(__file__)
 test_data_path = os.path.join(here_path, "data", "www")
@@ -471,11 +472,7 @@ def run_web_server(started):
         server = http.server.HTTPServer(("", 64346), HTTPTestRequestHandler)
 
         # The web server is started and listening; let the test runner know
-        started.acquire()
-        try:
-            started.notify()
-        finally:
-            started.release()
+        started.set()
 
         while True:
             server.handle_request()
@@ -486,18 +483,15 @@ def run_web_server(started):
 class Engine2HTTPSetup():
     @classmethod
     def setUpClass(cls):
-        with Manager() as manager:
-            started = manager.Condition()
-            started.acquire()
-            try:
-                cls._ws = Process(target=run_web_server, args=(started,))
-                cls._ws.start()
-
-                # Wait for the web server to check in and notify us that it's
-                # ready to be used
-                started.wait()
-            finally:
-                started.release()
+        # (A Manager-backed Condition would be shut down as soon as we'd been
+        # notified, possibly before the web server had finished using it)
+        started = Event()
+        cls._ws = Process(target=run_web_server, args=(started,))
+        cls._ws.start()
+
+        # Wait for the web server to check in and tell us that it's ready to be
+        # used
+        started.wait()
 
     @classmethod
     def tearDownClass(cls):
@@ -685,6 +679,45 @@ class Engine2HTTPExplorationTest(Engine2HTTPSetup, unittest.TestCase):
             source_with_path_mapped_site["handles"],
             "mapped Source with path should produce 2 handles")
 
+    def test_exploration_order(self):
+        "Fetching pages in the background should not change the order of the handles"
+
+        def explore(source, workers):
+            with mock.patch.dict(
+                    engine2_settings.model["http"], crawl_workers=workers):
+                with SourceManager() as sm:
+                    return [h.presentation_url for h in source.handles(sm)]
+
+        for source in (site["source"], mapped_site_with_images["source"],
+                       infinite_links_site["source"]):
+            with self.subTest(source=source):
+                self.assertEqual(explore(source, 1), explore(source, 4))
+
+    def test_background_sessions(self):
+        "Fetching pages in the background should not share a Session between threads"
+        used = {}
+
+        def _recording_session():
+            session = factory.make_session()
+            request = session.request
+
+            def _request(*args, **kwargs):
+                used.setdefault(id(session), set()).add(threading.get_ident())
+                return request(*args, **kwargs)
+            session.request = _request
+            return session
+
+        main = _recording_session()
+        wc = WebCrawler(
+                "http://localhost:64346/", main, ttl=TTL,
+                workers=4, session_factory=_recording_session)
+        wc.add("http://localhost:64346/")
+        list(wc.visit())
+
+        self.assertGreater(len(used), 1, "no background sessions were used")
+        for threads in used.values():
+            self.assertEqual(len(threads), 1, "a Session was shared")
+
     def test_page_with_anchor_links(self):
         with SourceManager() as sm:
             presentation_urls = [
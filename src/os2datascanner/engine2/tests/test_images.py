@@ -5,11 +5,19 @@
 
 import pytest
 import os.path
+import time
+import zipfile
+import pymupdf
 
+from os2datascanner.engine2 import settings
 from os2datascanner.engine2.model.core import SourceManager
-from os2datascanner.engine2.model.file import FilesystemSource
+from os2datascanner.engine2.model.file import FilesystemHandle, FilesystemSource
 from os2datascanner.engine2.conversions import convert
 from os2datascanner.engine2.conversions.types import OutputType
+from os2datascanner.engine2.conversions.utilities import ocr_server
+from os2datascanner.engine2.conversions.utilities.ocr_server import OCRServer
+from os2datascanner.engine2.pipeline import messages, worker
+from os2datascanner.engine2.rules.regex import RegexRule
 
 here_path = os.path.dirname(__file__)
 test_data_path = os.path.join(here_path, "data", "ocr")
@@ -25,6 +33,51 @@ class TestEngine2Images:
                 resource = h.follow(sm)
                 assert convert(resource, OutputType.Text) == expected_result
 
+    def test_ocr_conversions_without_server(self, monkeypatch):
+        monkeypatch.setitem(settings.tesseract, "server", False)
+        self.test_ocr_conversions()
+
+    def test_ocr_server_survives_failures(self):
+        """A corrupted image should not stop an OCRServer from recognising the
+        images that come after it."""
+        images = [
+            os.path.join(test_data_path, "corrupted", "cpr.trunc.png"),
+            os.path.join(test_data_path, "good", "cpr.png"),
+            os.path.join(test_data_path, "corrupted", "cpr.rgb16.trunc.bmp"),
+            os.path.join(test_data_path, "good", "cpr.jpg"),
+        ]
+        server = OCRServer(timeout=60)
+        try:
+            results = [
+                server.recognise(open(path, "rb").read()) for path in images]
+        finally:
+            server.stop()
+        assert results == [None, expected_result, None, expected_result]
+
+    def test_ocr_server_restarts(self):
+        """An OCRServer whose process has died should start a new one rather
+        than giving up on the next image."""
+        with open(os.path.join(test_data_path, "good", "cpr.png"), "rb") as fp:
+            image = fp.read()
+        server = OCRServer(timeout=60)
+        try:
+            assert server.recognise(image) == expected_result
+            server._process.kill()
+            server._process.wait()
+            assert server.recognise(image) == expected_result
+        finally:
+            server.stop()
+
+    def test_ocr_server_abort(self):
+        server = OCRServer(timeout=60)
+        try:
+            result = server.recognise(
+                    open(os.path.join(test_data_path, "good", "cpr.png"), "rb").read(),
+                    should_abort=lambda: True)
+        finally:
+            server.stop()
+        assert result is None
+
     def test_corrupted_ocr(self):
         fs = FilesystemSource(os.path.join(test_data_path, "corrupted"))
         with SourceManager() as sm:
@@ -57,3 +110,95 @@ class TestEngine2Images:
             for h in fs.handles(sm):
                 resource = h.follow(sm)
                 assert convert(resource, OutputType.Text) == expected_result
+
+
+FAKE_OCR_SERVER = """
+import struct, sys, time
+
+def read(n):
+    data = sys.stdin.buffer.read(n)
+    if len(data) != n:
+        sys.exit(0)
+    return data
+
+if sys.argv[1:] == ["--serve"] and "deaf" in __file__:
+    time.sleep(60)
+while True:
+    images = [read(struct.unpack(">I", read(4))[0])
+              for _ in range(struct.unpack(">I", read(4))[0])]
+    if b"crash" in images:
+        sys.exit(1)
+    for image in images:
+        text = b"%d:%s" % (len(images), image)
+        sys.stdout.buffer.write(struct.pack(">BI", 0, len(text)) + text)
+    sys.stdout.buffer.flush()
+"""
+
+
+class TestOCRServerProtocol:
+    """Tests of OCRServer's handling of batches, failures and time limits,
+    using a stand-in for the real OCR process."""
+
+    @pytest.fixture
+    def fake_server(self, tmp_path, monkeypatch):
+        servers = []
+
+        def _make(name="fake.py", **kwargs):
+            script = tmp_path / name
+            script.write_text(FAKE_OCR_SERVER)
+            monkeypatch.setattr(ocr_server, "_OCR_CLI", str(script))
+            servers.append(server := OCRServer(**kwargs))
+            return server
+        yield _make
+        for server in servers:
+            server.stop()
+
+    def test_batch(self, fake_server):
+        """All of the images given to recognise_many should be sent to the
+        server as a single batch."""
+        server = fake_server(timeout=10)
+        assert server.recognise_many([b"one", b"two", b"three"]) == [
+                "3:one", "3:two", "3:three"]
+        assert server.recognise(b"four") == "1:four"
+
+    def test_batch_failure(self, fake_server):
+        """If a batch fails, the images in it should be tried again one by
+        one, so that only the bad one is lost."""
+        server = fake_server(timeout=10)
+        assert server.recognise_many([b"one", b"crash", b"three"]) == [
+                "1:one", None, "1:three"]
+
+    def test_send_timeout(self, fake_server):
+        """Sending an image to a server that isn't reading should give up once
+        the image's time is up."""
+        server = fake_server("deaf.py", timeout=1)
+        start = time.monotonic()
+        assert server.recognise(bytes(4 * 1024 * 1024)) is None
+        assert time.monotonic() - start < 10
+
+    def test_recognise_ahead(self, fake_server, tmp_path, monkeypatch):
+        """The images in a document should be sent to the OCR server as a
+        batch when the worker explores it."""
+        monkeypatch.setattr(ocr_server, "_server", fake_server(timeout=10))
+        with zipfile.ZipFile(tmp_path / "images.zip", "w") as zf:
+            for i in range(3):
+                pix = pymupdf.Pixmap(
+                        pymupdf.csRGB, pymupdf.IRect(0, 0, 16, 16), False)
+                pix.clear_with(i * 100)
+                zf.writestr(f"{i}.png", pix.tobytes("png"))
+
+        spec = messages.ScanSpecMessage(
+                scan_tag=messages.ScanTagFragment.make_dummy(),
+                source=FilesystemSource(str(tmp_path)),
+                rule=RegexRule("^3:"), configuration={},
+                filter_rule=None, progress=None)
+        conversion = messages.ConversionMessage(
+                scan_spec=spec,
+                handle=FilesystemHandle(spec.source, "images.zip"),
+                progress=messages.ProgressFragment(rule=spec.rule, matches=[]))
+        with SourceManager() as sm:
+            matched = [m.handle.relative_path
+                       for m in worker.process(sm, conversion)
+                       if isinstance(m, messages.MatchesMessage) and m.matched]
+
+        assert sorted(matched) == ["0.png", "1.png", "2.png"]
@@ -0,0 +1,99 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.derived import libreoffice
+from os2datascanner.engine2.model.derived.utilities import libreoffice_pool
+
+
+class FakeServer:
+    started = []
+
+    def __init__(self):
+        self.owner = os.getpid()
+        self.conversions = 0
+        self.healthy = True
+        self.stopped = False
+        self.calls = []
+        FakeServer.started.append(self)
+
+    def is_healthy(self):
+        return self.healthy and not self.stopped
+
+    def run(self, *args):
+        self.conversions += 1
+        self.calls.append(args)
+        if "--broken" in args:
+            raise RuntimeError("conversion failed")
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    FakeServer.started = []
+    monkeypatch.setattr(libreoffice_pool, "LibreOfficeServer", FakeServer)
+    monkeypatch.setattr(libreoffice_pool, "_idle", [])
+    monkeypatch.setitem(settings.model["libreoffice"], "servers", 1)
+    monkeypatch.setitem(settings.model["libreoffice"], "recycle_after", 3)
+    return FakeServer.started
+
+
+class TestLibreOfficePool:
+    def test_reuse(self, pool):
+        for _ in range(2):
+            libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        assert len(pool) == 1
+        assert pool[0].calls == [("--convert-to", "html", "a.docx")] * 2
+
+    def test_recycle(self, pool):
+        for _ in range(4):
+            libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        assert len(pool) == 2
+        assert pool[0].stopped and pool[0].conversions == 3
+        assert not pool[1].stopped
+
+    def test_unhealthy_replaced(self, pool):
+        libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        pool[0].healthy = False
+        libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        assert len(pool) == 2
+        assert pool[0].stopped
+
+    def test_failure_stops_server(self, pool):
+        with pytest.raises(RuntimeError):
+            libreoffice.libreoffice("--broken")
+        assert pool[0].stopped
+        assert libreoffice_pool._idle == []
+
+    def test_concurrent_use(self, pool):
+        """A process that needs more servers at once than the pool holds
+        should get them, but only the pool's worth should be kept."""
+        with libreoffice_pool.server(), libreoffice_pool.server():
+            pass
+        assert len(pool) == 2
+        assert sum(s.stopped for s in pool) == 1
+
+    def test_inherited_servers_ignored(self, pool):
+        libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        pool[0].owner = -1
+        libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        assert len(pool) == 2
+        assert not pool[0].stopped
+
+    def test_disabled(self, pool, monkeypatch):
+        calls = []
+        monkeypatch.setitem(settings.model["libreoffice"], "servers", 0)
+        monkeypatch.setattr(
+                libreoffice, "run_custom",
+                lambda args, **kwargs: calls.append(args))
+        libreoffice.libreoffice("--convert-to", "html", "a.docx")
+        assert pool == []
+        assert calls[0][0] == "libreoffice"
+        assert calls[0][1].startswith("-env:UserInstallation=file://")
@@ -0,0 +1,157 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+from datetime import datetime, timezone
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.file import FilesystemSource, FilesystemHandle
+from os2datascanner.engine2.pipeline import explorer, messages, worker
+from os2datascanner.engine2.pipeline.utilities.manifest import (
+        Manifest, open_manifest)
+from os2datascanner.engine2.rules.last_modified import LastModifiedRule
+from os2datascanner.engine2.rules.logical import AndRule
+from os2datascanner.engine2.rules.regex import RegexRule
+
+
+rule = RegexRule("[Hh]ello")
+
+
+def cutoff(year):
+    return LastModifiedRule(datetime(year, 1, 1, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def manifest_directory(tmp_path, monkeypatch):
+    directory = tmp_path / "manifests"
+    monkeypatch.setitem(
+            settings.pipeline["manifest"], "directory", str(directory))
+    return directory
+
+
+@pytest.fixture
+def share(tmp_path):
+    path = tmp_path / "share"
+    path.mkdir()
+    (path / "hello.txt").write_text("Hello, world!\n")
+    (path / "goodbye.txt").write_text("Goodbye, world!\n")
+    return path
+
+
+def make_spec(share, rule):
+    return messages.ScanSpecMessage(
+            scan_tag=messages.ScanTagFragment.make_dummy(),
+            source=FilesystemSource(str(share)),
+            rule=rule,
+            configuration={},
+            filter_rule=None,
+            progress=None)
+
+
+def scan(spec):
+    """Explores a Source and processes every object found in it, returning
+    the names of those objects."""
+    names = []
+    with SourceManager() as sm:
+        for m in list(explorer.message_received(spec, sm)):
+            if isinstance(m, messages.ConversionMessage):
+                names.append(m.handle.name)
+                for _ in worker.message_received_raw(
+                        m.to_json_object(), None, sm):
+                    pass
+    return sorted(names)
+
+
+class TestManifest:
+    def test_record(self, manifest_directory):
+        source = FilesystemSource("/tmp")
+        handle = FilesystemHandle(
+                source, "a.txt",
+                hints={"size": 12, "mtime": "2024-01-01T00:00:00+0000"})
+        manifest = open_manifest(source, rule, {})
+
+        assert not manifest.is_unchanged(handle)
+        manifest.record(handle, "clean")
+        assert manifest.is_unchanged(handle)
+        assert manifest.get(handle)["verdict"] == "clean"
+
+        for hints in (
+                {"size": 13, "mtime": "2024-01-01T00:00:00+0000"},
+                {"size": 12, "mtime": "2024-01-02T00:00:00+0000"},
+                {"size": 12},):
+            assert not manifest.is_unchanged(
+                    FilesystemHandle(source, "a.txt", hints=hints))
+
+        manifest.record(handle, "problem")
+        assert not manifest.is_unchanged(handle)
+        manifest.close()
+
+    def test_scope(self):
+        """A scope shouldn't depend on a scan's Last-Modified cutoff, but
+        should depend on everything else about the scan."""
+        source = FilesystemSource("/tmp")
+
+        assert (Manifest.scope(source, AndRule(cutoff(2020), rule), {})
+                == Manifest.scope(source, AndRule(cutoff(2024), rule), {})
+                == Manifest.scope(source, rule, {}))
+        assert (Manifest.scope(source, rule, {})
+                != Manifest.scope(source, RegexRule("[Gg]oodbye"), {}))
+        assert (Manifest.scope(source, rule, {})
+                != Manifest.scope(FilesystemSource("/usr"), rule, {}))
+        assert (Manifest.scope(source, rule, {})
+                != Manifest.scope(
+                        source, rule, {"skip_mime_types": ["image/*"]}))
+
+    def test_disabled(self):
+        assert open_manifest(FilesystemSource("/tmp"), rule, {}) is None
+
+
+class TestIncrementalScans:
+    def test_unchanged_skipped(self, share, manifest_directory):
+        incremental = AndRule(cutoff(2000), rule)
+        assert scan(make_spec(share, incremental)) == [
+                "goodbye.txt", "hello.txt"]
+        assert scan(make_spec(share, incremental)) == []
+
+        (share / "goodbye.txt").write_text("Goodbye, cruel world!\n")
+        stat = os.stat(share / "goodbye.txt")
+        os.utime(share / "goodbye.txt", (stat.st_atime, stat.st_mtime + 10))
+        assert scan(make_spec(share, incremental)) == ["goodbye.txt"]
+
+    def test_forced_scan(self, share, manifest_directory):
+        """A scan without a Last-Modified cutoff should look at everything,
+        but should still record what it found for later scans."""
+        assert len(scan(make_spec(share, rule))) == 2
+        assert len(scan(make_spec(share, rule))) == 2
+        assert scan(make_spec(share, AndRule(cutoff(2000), rule))) == []
+
+    def test_problems_rescanned(self, share, manifest_directory, monkeypatch):
+        incremental = AndRule(cutoff(2000), rule)
+
+        def _fail(sm, msg, **kwargs):
+            yield messages.ProblemMessage(
+                    scan_tag=msg.scan_spec.scan_tag, source=None,
+                    handle=msg.handle, message="Something went wrong")
+        monkeypatch.setattr(worker, "process", _fail)
+        scan(make_spec(share, incremental))
+        monkeypatch.undo()
+
+        assert len(scan(make_spec(share, incremental))) == 2
+
+    def test_manifest_kept_open(self, share, manifest_directory, monkeypatch):
+        """A worker should open the manifest of a Source once per scan, not
+        once for every object in it."""
+        opened = []
+
+        def _open_manifest(*args):
+            opened.append(args)
+            return open_manifest(*args)
+        monkeypatch.setattr(worker, "open_manifest", _open_manifest)
+
+        spec = make_spec(share, AndRule(cutoff(2000), rule))
+        assert len(scan(spec)) == 2
+        assert len(opened) == 1
@@ -5,6 +5,14 @@
 
 from ..model.msgraph.files import MSGraphDriveHandle, MSGraphFilesSource, MSGraphDriveSource
 from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import pytest
+import requests
+
+from .. import settings
+from ..rules.last_modified import LastModifiedRule
+from ..rules.logical import AndRule
+from ..rules.regex import RegexRule
 
 
 class TestMSGraphDriveHandle:
@@ -77,3 +85,163 @@ class TestMSGraphDriveSource:
         assert len(filtered_folder) == 1
         assert fake_folder != filtered_folder
         assert filtered_folder[0]['id'] == 2
+
+
+BASE = "https://graph.microsoft.com/v1.0/"
+
+
+def item(iid, name, parent, *, kind="file", modified="2024-06-01T12:00:00Z"):
+    return {
+        "id": iid, "name": name,
+        "parentReference": {"id": parent},
+        "webUrl": f"https://example.sharepoint.com/{iid}",
+        "lastModifiedDateTime": modified,
+        kind: {},
+    } | ({"size": 100} if kind == "file" else {})
+
+
+class FakeGraph:
+    """Answers requests for delta query pages and individual items from
+    dictionaries, recording every request."""
+
+    def __init__(self, pages, items=None):
+        self.pages = pages
+        self.items = items or {}
+        self.requests = []
+
+    def _response(self, body):
+        response = MagicMock()
+        response.json.return_value = body
+        return response
+
+    def get(self, tail):
+        self.requests.append(tail)
+        if "/items/" in tail:
+            iid = tail.split("/items/")[1].split("?")[0]
+            return self._response(self.items[iid])
+        return self._response(self.pages[tail])
+
+    def follow_next_link(self, link):
+        self.requests.append(link)
+        if link not in self.pages:
+            response = requests.Response()
+            response.status_code = 410
+            raise requests.HTTPError(response=response)
+        return self._response(self.pages[link])
+
+
+@pytest.fixture
+def drive_source():
+    source = MSGraphFilesSource("client", "tenant", "secret")
+    return MSGraphDriveSource(
+            MSGraphDriveHandle(source, "drive", "Documents", "Lars"))
+
+
+@pytest.fixture
+def delta_directory(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+            settings.model["msgraph"], "delta_directory", str(tmp_path))
+    return tmp_path
+
+
+full_delta = {
+    "drives/drive/root/delta": {
+        "value": [
+            {"id": "root", "root": {}, "name": "root",
+             "webUrl": "https://example.sharepoint.com/root"},
+            item("f1", "a.docx", "root"),
+            # Listed before its folder
+            item("f2", "b.docx", "sub"),
+            item("sub", "Sub", "root", kind="folder"),
+        ],
+        "@odata.nextLink": BASE + "page2",
+    },
+    BASE + "page2": {
+        "value": [
+            item("f3", "c.docx", "sub"),
+            item("f4", "d.docx", "root") | {"deleted": {}},
+        ],
+        "@odata.deltaLink": BASE + "delta?token=1",
+    },
+}
+
+
+def explore(drive_source, graph, **kwargs):
+    sm = MagicMock()
+    sm.open.return_value = graph
+    return {h.relative_path: h for h in drive_source.handles(sm, **kwargs)}
+
+
+class TestDeltaExploration:
+    def test_full(self, drive_source):
+        """Every page of the delta query should be followed, and files should
+        get the paths of the folders they're in."""
+        handles = explore(drive_source, FakeGraph(full_delta))
+
+        assert set(handles) == {"a.docx", "Sub/b.docx", "Sub/c.docx"}
+        assert handles["a.docx"].container_url == (
+                "https://example.sharepoint.com/root?view=0")
+        assert handles["Sub/c.docx"].container_url == (
+                "https://example.sharepoint.com/sub")
+        assert handles["a.docx"].hint("size") == 100
+
+    def test_incremental(self, drive_source, delta_directory):
+        """A scan whose cutoff is no earlier than the start of the scan that
+        stored a delta link should only fetch the changes since then."""
+        first_scan = datetime(2024, 6, 2, tzinfo=timezone.utc)
+        rule = AndRule(LastModifiedRule(first_scan), RegexRule("x"))
+        explore(drive_source, FakeGraph(full_delta), rule=RegexRule("x"),
+                scan_time=first_scan)
+
+        graph = FakeGraph(
+                {
+                    BASE + "delta?token=1": {
+                        "value": [item(
+                                "f5", "e.docx", "deep",
+                                modified="2024-06-03T00:00:00Z")],
+                        "@odata.deltaLink": BASE + "delta?token=2",
+                    },
+                },
+                items={
+                    "deep": item("deep", "Deep", "sub", kind="folder"),
+                    "sub": item("sub", "Sub", "root", kind="folder"),
+                    "root": {"id": "root", "root": {}, "name": "root"},
+                })
+        handles = explore(
+                drive_source, graph, rule=rule,
+                scan_time=datetime(2024, 6, 4, tzinfo=timezone.utc))
+
+        assert set(handles) == {"Sub/Deep/e.docx"}
+        assert graph.requests[0] == BASE + "delta?token=1"
+
+    def test_unfinished_scan(self, drive_source, delta_directory):
+        """A delta link stored by a scan that started after the cutoff (and
+        so might not have finished) shouldn't be used."""
+        explore(drive_source, FakeGraph(full_delta), rule=RegexRule("x"),
+                scan_time=datetime(2024, 6, 2, tzinfo=timezone.utc))
+
+        graph = FakeGraph(full_delta)
+        explore(drive_source, graph,
+                rule=AndRule(
+                        LastModifiedRule(
+                                datetime(2024, 5, 1, tzinfo=timezone.utc)),
+                        RegexRule("x")))
+
+        assert graph.requests[0] == "drives/drive/root/delta"
+
+    def test_expired_link(self, drive_source, delta_directory):
+        first_scan = datetime(2024, 6, 2, tzinfo=timezone.utc)
+        explore(drive_source, FakeGraph(full_delta), rule=RegexRule("x"),
+                scan_time=first_scan)
+
+        graph = FakeGraph({
+            "drives/drive/root/delta": full_delta["drives/drive/root/delta"],
+            BASE + "page2": full_delta[BASE + "page2"],
+        })
+        handles = explore(
+                drive_source, graph,
+                rule=AndRule(LastModifiedRule(first_scan), RegexRule("x")))
+
+        assert graph.requests[:2] == [
+                BASE + "delta?token=1", "drives/drive/root/delta"]
+        assert handles == {}
@@ -7,10 +7,13 @@
 Unit tests for utilities for use with MS Graph.
 """
 
+import json
+from unittest.mock import MagicMock
 import requests
 import pytest
 
 from os2datascanner.engine2.model.msgraph import utilities as msgu
+from os2datascanner.engine2.model.msgraph.mail import MSGraphMailSource
 from os2datascanner.engine2.model.msgraph.graphiti import (baseclasses,
                                                            exceptions,
                                                            query_parameters)
@@ -44,6 +47,97 @@ class TestGraphUtilities:
         assert handler.handle().status_code == 200
 
 
+def make_response(status_code, body, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = json.dumps(body).encode()
+    return response
+
+
+class BatchSession:
+    """A fake requests.Session that answers JSON batches. Each sub-request is
+    answered with the result of calling its endpoint function, and individual
+    GET requests are recorded and answered in the same way."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.batches = []
+        self.gets = []
+
+    def post(self, url, *, json, **kwargs):
+        assert url.endswith("/$batch")
+        self.batches.append(json["requests"])
+        return make_response(200, {
+            "responses": [
+                {"id": r["id"]} | self.endpoint(r["url"], batched=True)
+                for r in reversed(json["requests"])
+            ]
+        })
+
+    def get(self, url, **kwargs):
+        self.gets.append(url)
+        item = self.endpoint(url, batched=False)
+        return make_response(item["status"], item["body"], item["headers"])
+
+
+def endpoint(url, *, batched):
+    if "throttled" in url and batched:
+        return {"status": 429, "headers": {"Retry-After": "0"}, "body": {}}
+    elif "missing" in url:
+        return {"status": 404, "headers": {}, "body": {"error": {}}}
+    return {
+        "status": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": {"value": [] if "empty" in url else [{"id": url}]},
+    }
+
+
+class TestBatchGet:
+    def test_batches(self):
+        """Requests should be sent in batches of at most 20, and their
+        responses should come back in the order that they were asked for."""
+        session = BatchSession(endpoint)
+        gc = msgu.MSGraphSource.GraphCaller(lambda: "token", session)
+
+        results = list(gc.batch_get(
+                (i, f"users/{i}/messages") for i in range(45)))
+
+        assert [len(b) for b in session.batches] == [20, 20, 5]
+        assert [k for k, _ in results] == list(range(45))
+        for k, response in results:
+            assert response.json()["value"] == [{"id": f"/users/{k}/messages"}]
+        assert not session.gets
+
+    def test_throttled_item_retried(self):
+        session = BatchSession(endpoint)
+        gc = msgu.MSGraphSource.GraphCaller(lambda: "token", session)
+
+        results = dict(gc.batch_get(
+                [("a", "users/a/drive"), ("b", "users/throttled/drive")]))
+
+        assert results["a"].status_code == 200
+        assert results["b"].status_code == 200
+        assert len(session.gets) == 1
+        assert session.gets[0].endswith("users/throttled/drive")
+
+    def test_mail_source_probes(self):
+        """MSGraphMailSource should only produce accounts that have mails."""
+        session = BatchSession(endpoint)
+        source = MSGraphMailSource(
+                "client", "tenant", "secret",
+                userlist=["full@example.com", "empty@example.com",
+                          "missing@example.com"])
+        sm = MagicMock()
+        sm.open.return_value = msgu.MSGraphSource.GraphCaller(
+                lambda: "token", session)
+
+        handles = list(source.handles(sm))
+
+        assert [h.relative_path for h in handles] == ["full@example.com"]
+        assert len(session.batches) == 1
+
+
 @pytest.fixture
 def builder():
     return MSGraphURLBuilder()
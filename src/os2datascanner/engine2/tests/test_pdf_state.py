@@ -0,0 +1,59 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os.path
+import pytest
+
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.file import (
+        FilesystemHandle, FilesystemSource)
+from os2datascanner.engine2.model.derived import pdf
+from os2datascanner.engine2.model.derived.pdf import PDFPageHandle, PDFSource
+
+
+test_data = FilesystemSource(os.path.join(os.path.dirname(__file__), "data"))
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Records every PDF document parsed by pdf.py, and whether or not it has
+    been closed since."""
+    documents = []
+    open_pdf_wrapped = pdf.open_pdf_wrapped
+
+    def _open_pdf_wrapped(obj):
+        documents.append(document := open_pdf_wrapped(obj))
+        return document
+    monkeypatch.setattr(pdf, "open_pdf_wrapped", _open_pdf_wrapped)
+    return documents
+
+
+class TestPDFState:
+    def test_parsed_once(self, parsed):
+        """Exploring a PDF and then checking its pages and reading their
+        metadata should only parse the document once."""
+        source = PDFSource(FilesystemHandle(test_data, "pdf/p-numre.pdf"))
+        with SourceManager() as sm:
+            handles = list(source.handles(sm))
+            assert len(handles) == 18
+            for handle in handles:
+                resource = handle.follow(sm)
+                assert resource.check()
+                resource.get_metadata()
+
+            assert not PDFPageHandle(source, "19").follow(sm).check()
+            assert len(parsed) == 1
+        assert parsed[0].is_closed
+
+    def test_evicted(self, parsed):
+        """A parsed document should be closed when the SourceManager closes
+        its PDFSource to make room for others."""
+        sources = [
+            PDFSource(FilesystemHandle(test_data, f"pdf/{name}"))
+            for name in ("p-numre.pdf", "somepdf.pdf", "embedded-cpr.pdf",)]
+        with SourceManager(width=1) as sm:
+            for source in sources:
+                PDFPageHandle(source, "1").follow(sm).check()
+            assert [d.is_closed for d in parsed] == [True, True, False]
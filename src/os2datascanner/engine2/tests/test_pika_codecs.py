@@ -0,0 +1,46 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import gzip
+import json
+import pika
+
+from os2datascanner.engine2.pipeline.utilities.pika import (
+        PikaPipelineThread, decode_body)
+
+
+body = {"scan_tag": {"time": "2026-01-01T00:00:00+01:00"}, "matched": True}
+raw = json.dumps(body).encode()
+
+
+def sent(thread):
+    """Returns the body and properties of the last message that the given
+    PikaPipelineThread was asked to send, decoded as a receiver would."""
+    _, _, encoded, _, properties, _ = thread._outgoing[-1]
+    properties = pika.BasicProperties(**properties)
+    return json.loads(decode_body(properties, encoded)), properties
+
+
+class TestCodecs:
+    def test_legacy_gzip(self):
+        """Messages compressed at gzip's default level, as every stage used to
+        send them, should still be understood."""
+        properties = pika.BasicProperties(content_encoding="gzip")
+        assert decode_body(properties, gzip.compress(raw)) == raw
+        assert properties.content_encoding is None
+
+    def test_unencoded(self):
+        assert decode_body(pika.BasicProperties(), raw) == raw
+
+    def test_round_trip(self):
+        thread = PikaPipelineThread(write=["os2ds_results"])
+        thread.enqueue_message("os2ds_results", body)
+        assert sent(thread) == (body, pika.BasicProperties(delivery_mode=2))
+
+    def test_uncompressed(self):
+        thread = PikaPipelineThread(write=["os2ds_results"])
+        thread.enqueue_message("os2ds_results", body, content_encoding="")
+        assert thread._outgoing[-1][2] == raw
+        assert sent(thread)[0] == body
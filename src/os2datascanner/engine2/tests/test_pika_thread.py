@@ -0,0 +1,192 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from collections import deque
+import json
+import threading
+import pika
+import pytest
+
+from os2datascanner.engine2.pipeline.utilities.pika import (
+        PikaPipelineThread, decode_body)
+
+
+class FakeChannel:
+    """Just enough of pika.channel.Channel for a PikaPipelineThread."""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self.is_open = True
+        self.prefetch_count = 0
+        self.consumers = {}
+        self.acks = []
+        self.published = []
+
+    def basic_qos(self, *, prefetch_count):
+        self.prefetch_count = prefetch_count
+
+    def queue_declare(self, queue, **kwargs):
+        pass
+
+    def exchange_declare(self, exchange, *args, **kwargs):
+        pass
+
+    def basic_consume(self, queue, callback, **kwargs):
+        self.consumers[queue] = callback
+        return queue
+
+    def basic_cancel(self, consumer_tag):
+        self.consumers.pop(consumer_tag, None)
+
+    def basic_publish(self, exchange, routing_key, properties, body):
+        self.published.append(
+                (routing_key, json.loads(decode_body(properties, body))))
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+        self._connection.settle(delivery_tag, multiple)
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        self._connection.settle(delivery_tag, False)
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeConnection:
+    """Just enough of pika.BlockingConnection for a PikaPipelineThread, with
+    an in-process broker behind it that delivers the messages given to
+    FakeConnection.deliver, respecting the channel's prefetch count."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._callbacks = []
+        self._waiting = deque()
+        self._unacked = set()
+        self._last_tag = 0
+        self._channel = FakeChannel(self)
+
+    def channel(self):
+        return self._channel
+
+    def close(self):
+        pass
+
+    def deliver(self, queue, body):
+        with self._condition:
+            self._waiting.append((queue, json.dumps(body).encode()))
+            self._condition.notify()
+
+    def settle(self, delivery_tag, multiple):
+        with self._condition:
+            if multiple:
+                self._unacked = {t for t in self._unacked if t > delivery_tag}
+            else:
+                self._unacked.discard(delivery_tag)
+
+    def add_callback_threadsafe(self, callback):
+        with self._condition:
+            self._callbacks.append(callback)
+            self._condition.notify()
+
+    def _deliverable(self):
+        prefetch_count = self._channel.prefetch_count
+        return self._waiting and (
+                not prefetch_count or len(self._unacked) < prefetch_count)
+
+    def process_data_events(self, time_limit=0):
+        with self._condition:
+            self._condition.wait_for(
+                    lambda: self._callbacks or self._deliverable(),
+                    time_limit)
+            callbacks, self._callbacks = self._callbacks, []
+            deliveries = []
+            while self._deliverable():
+                self._last_tag += 1
+                self._unacked.add(self._last_tag)
+                deliveries.append((self._last_tag, *self._waiting.popleft()))
+
+        for callback in callbacks:
+            callback()
+        for tag, queue, body in deliveries:
+            self._channel.consumers[queue](
+                    self._channel,
+                    pika.spec.Basic.Deliver(
+                            delivery_tag=tag, routing_key=queue),
+                    pika.BasicProperties(), body)
+
+
+class EchoRunner(PikaPipelineThread):
+    """Passes every message it receives on to the "out" queue, and stops
+    after handling a given number of them."""
+
+    def __init__(self, connection, *, stop_after=None, **kwargs):
+        super().__init__(read=["in"], write=["out"], **kwargs)
+        self._fake = connection
+        self._stop_after = stop_after
+        self.handled = 0
+
+    def make_connection(self):
+        return self._fake
+
+    def handle_message(self, routing_key, body):
+        yield ("out", body)
+
+    def after_message(self, routing_key, body):
+        self.handled += 1
+        if self.handled == self._stop_after:
+            self.enqueue_stop()
+
+
+def consume(count, **kwargs):
+    """Sends count messages through an EchoRunner, returning its channel."""
+    connection = FakeConnection()
+    for k in range(count):
+        connection.deliver("in", {"k": k})
+    EchoRunner(connection, stop_after=count, **kwargs).run_consumer()
+    return connection.channel()
+
+
+class TestPikaThread:
+    def test_consume(self):
+        channel = consume(20, prefetch_count=5)
+        assert channel.published == [("out", {"k": k}) for k in range(20)]
+        assert channel._connection._unacked == set()
+
+    def test_wake_up(self):
+        """Enqueued requests should be carried out as soon as they arrive, not
+        at the next tick."""
+        runner = EchoRunner(FakeConnection())
+        runner._TICK_INTERVAL = 60
+        runner.start()
+        try:
+            for _ in range(5):
+                runner.synchronise(timeout=5)
+        finally:
+            runner.enqueue_stop()
+            runner.join()
+
+    @pytest.mark.parametrize("order,expected", [
+        ([1, 2, 3], [(3, True)]),
+        # Deliveries 1 and 3 haven't been handled yet, so multiple=True would
+        # acknowledge them too early
+        ([2, 4], [(2, False), (4, False)]),
+        ([4, 1, 2], [(2, True), (4, False)]),
+    ])
+    def test_ack_batching(self, order, expected):
+        connection = FakeConnection()
+        runner = EchoRunner(connection, prefetch_count=4)
+        for k in range(4):
+            connection.deliver("in", {"k": k})
+        runner._basic_consume()
+        runner.connection.process_data_events()
+
+        runner._message_channel = runner.channel
+        for tag in order:
+            runner.enqueue_ack(tag)
+        runner.enqueue_stop()
+        runner.run()
+
+        assert runner.channel.acks == expected
@@ -6,7 +6,7 @@
 import random
 import pytest
 from os2datascanner.engine2.rules.utilities.cpr_probability import (
-        CprProbabilityCalculator)
+        CprProbabilityCalculator, modulus11_check, modulus11_check_many)
 
 
 def _cpr(time_from=None):
@@ -122,6 +122,54 @@ class TestCprTest:
         check = cpr_calc.cpr_check(cpr, do_mod11_check=False)
         assert check == 0.5
 
+
+def _candidates():
+    """Returns a mixture of CPR-like numbers: random ones, mostly with
+    plausible dates, and some special cases."""
+    rng = random.Random(2024)
+    return [
+        *(str(rng.randrange(0, 9999999999)).zfill(10) for _ in range(200)),
+        *(_cpr() for _ in range(100)),
+        *("{0:02}{1:02}{2:02}{3}{4:03}".format(
+                rng.randrange(0, 33), rng.randrange(0, 14), rng.randrange(100),
+                rng.randrange(10), rng.randrange(1000))
+          for _ in range(200)),
+        # Exception dates, leap days and the edges of the legal ranges
+        "0101900000", "0101643066", "0101643012", "1111111118",
+        "2902000000", "2902004000", "2902003000", "2902584000",
+        "0101584000", "3112575000", "0101374000", "3112369000",
+        # Things that the batch path hands over to the scalar one
+        "111111111", "11111111111", "١١١١١١١١١٨", "",
+    ]
+
+
+class TestCprBatch:
+    @pytest.mark.parametrize("do_mod11_check", [True, False])
+    def test_cpr_check_many(self, cpr_calc, do_mod11_check):
+        """Checking many numbers at once should give exactly the same results
+        as checking them one at a time."""
+        candidates = _candidates()
+
+        expected = [
+            cpr_calc.cpr_check(c, do_mod11_check=do_mod11_check)
+            for c in candidates]
+        actual = CprProbabilityCalculator().cpr_check_many(
+                candidates, do_mod11_check=do_mod11_check)
+
+        assert actual == expected
+        assert [type(v) for v in actual] == [type(v) for v in expected]
+
+    def test_modulus11_check_many(self):
+        candidates = _candidates()
+
+        assert modulus11_check_many(candidates) == [
+                modulus11_check(c) for c in candidates]
+
+    def test_empty(self, cpr_calc):
+        assert cpr_calc.cpr_check_many([]) == []
+        assert modulus11_check_many([]) == []
+
+
 # NOTE: This test fails too often, that we would not know if it is failing for real.
 # Furthermore it messes up the pipeline very often and decreases productivity.
 #
@@ -27,10 +27,11 @@ from os2datascanner.engine2.pipeline.messages import (
 from os2datascanner.engine2.rules.cpr import CPRRule
 from os2datascanner.engine2.rules.dict_lookup import EmailHeaderRule
 from os2datascanner.engine2.rules.meta import SizeRule, HasConversionRule
+from os2datascanner.engine2.conversions import convert
 from os2datascanner.engine2.conversions.types import OutputType
 
 from os2datascanner.engine2.pipeline.processor import (
-    message_received, message_received_raw, do_conversion)
+    message_received, message_received_raw, do_conversion, emit_representation)
 
 
 here_path = os.path.dirname(__file__)
@@ -216,3 +217,19 @@ def test_do_conversion_non_size_still_reinterprets():
 
     with pytest.raises(KeyError):
         do_conversion(handle.follow(sm), conversion, retrier, sm)
+
+
+def test_emit_representation_keeps_native_objects():
+    """Representations should be handed to the next stage as they are, and
+    only be converted to JSON-friendly forms when the message is
+    serialised."""
+    handle = FilesystemHandle.make_handle(text_file_path)
+    conversion = _conversion_message(handle, CPRRule())
+    sm = SourceManager()
+    text = convert(handle.follow(sm), OutputType.Text)
+
+    message, = emit_representation(conversion, text)
+
+    assert message.representations[OutputType.Text.value] is text
+    restored = RepresentationMessage.from_json_object(message.to_json_object())
+    assert restored.representations == message.representations
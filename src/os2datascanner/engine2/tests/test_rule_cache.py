@@ -0,0 +1,99 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from prometheus_client import REGISTRY
+
+from os2datascanner.engine2.model.file import FilesystemHandle
+from os2datascanner.engine2.pipeline import messages, worker  # noqa: F401
+from os2datascanner.engine2.rules.cpr import CPRRule
+from os2datascanner.engine2.rules.logical import AndRule, OrRule
+from os2datascanner.engine2.rules.regex import RegexRule
+from os2datascanner.engine2.rules.utilities.rule_cache import (
+        RuleCache, get_rule_cache)
+
+
+rule = AndRule(
+        CPRRule(exceptions=["1111111118"]),
+        OrRule(RegexRule("[Ss]ygehus"), RegexRule(r"\d{4}-\d{2}-\d{2}")))
+
+
+class TestRuleCache:
+    def test_reuse(self):
+        cache = RuleCache(4)
+
+        first = cache.from_json_object(rule.to_json_object())
+        second = cache.from_json_object(rule.to_json_object())
+
+        assert first == rule
+        assert second is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_canonical(self):
+        """The order of the keys in a JSON object shouldn't matter."""
+        cache = RuleCache(4)
+        obj = RegexRule("[Ss]ygehus").to_json_object()
+
+        assert cache.from_json_object(obj) is cache.from_json_object(
+                dict(reversed(obj.items())))
+
+    def test_distinct(self):
+        cache = RuleCache(4)
+
+        assert cache.from_json_object(
+                CPRRule().to_json_object()) is not cache.from_json_object(
+                CPRRule(modulus_11=False).to_json_object())
+        assert len(cache) == 2
+
+    def test_bounded(self):
+        """A full cache should forget its least recently used Rule."""
+        cache = RuleCache(2)
+        objs = [RegexRule(f"{i}").to_json_object() for i in range(3)]
+
+        r0 = cache.from_json_object(objs[0])
+        cache.from_json_object(objs[1])
+        assert cache.from_json_object(objs[0]) is r0
+        cache.from_json_object(objs[2])
+
+        assert len(cache) == 2
+        assert cache.from_json_object(objs[0]) is r0
+        assert cache.misses == 3
+        cache.from_json_object(objs[1])
+        assert cache.misses == 4
+
+    def test_disabled(self):
+        cache = RuleCache(0)
+        obj = rule.to_json_object()
+
+        assert cache.from_json_object(obj) is not cache.from_json_object(obj)
+        assert len(cache) == 0
+
+
+def test_messages_share_rules():
+    """Deserialising many messages that carry the same Rule should only build
+    that Rule once."""
+    spec = messages.ScanSpecMessage(
+            scan_tag=messages.ScanTagFragment.make_dummy(),
+            source=FilesystemHandle.make_handle("/tmp/a.txt").source,
+            rule=rule,
+            configuration={},
+            filter_rule=RegexRule("a"),
+            progress=None)
+    misses = get_rule_cache().misses
+
+    first, second = (
+        messages.ConversionMessage.from_json_object(
+                messages.ConversionMessage(
+                        scan_spec=spec,
+                        handle=FilesystemHandle.make_handle(f"/tmp/{name}"),
+                        progress=messages.ProgressFragment(
+                                rule=rule, matches=[])).to_json_object())
+        for name in ("a.txt", "b.txt"))
+
+    assert first.scan_spec.rule is second.scan_spec.rule
+    assert first.scan_spec.filter_rule is second.scan_spec.filter_rule
+    assert first.progress.rule is second.progress.rule
+    assert get_rule_cache().misses - misses <= 2
+    assert REGISTRY.get_sample_value(
+            "os2datascanner_pipeline_worker_rule_cache_hits_total") >= 4
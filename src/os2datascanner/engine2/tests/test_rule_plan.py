@@ -0,0 +1,124 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from os2datascanner.engine2.conversions.types import OutputType
+from os2datascanner.engine2.rules.address import AddressRule
+from os2datascanner.engine2.rules.cpr import CPRRule
+from os2datascanner.engine2.rules.credit_card import CreditCardRule
+from os2datascanner.engine2.rules.dict_lookup import EmailHeaderRule
+from os2datascanner.engine2.rules.logical import AllRule, AndRule, NotRule, OrRule
+from os2datascanner.engine2.rules.regex import RegexRule
+from os2datascanner.engine2.rules.utilities.plan import (
+        TextRulePlan, find_text_heads)
+from os2datascanner.engine2.rules.wordlists import OrderedWordlistRule
+
+
+content = """
+REGION NORDSTRAND -- PERSONFØLSOMT MATERIALE UNDER TAVSHEDSPLIGT
+
+Nordstrand Sygehus
+Strandvej 17
+9999 Vejstrand
+
+Patient: Jens Jensen, 111111-1118 (tidligere 2205995008)
+Konsultationsdato: 2021-10-18
+
+Ifølge analyseresultater lider patienten af akut arteriel insufficiens i alle
+ekstremiteterne. Han selv tilføjer, at han har ondt i albuen og leveren. Der er
+også indledende tegn på AUTOIMMUNT POLYGLANDULÆRT SYNDROM. Kol er udelukket.
+Kort: 4111 1111 1111 1111.
+Henvist til speciallæger på Strandvej 198, 1tv, 2000 Frederiksberg."""
+
+
+cpr_variants = [
+    CPRRule(),
+    CPRRule(modulus_11=False, ignore_irrelevant=False),
+    CPRRule(examine_context=False),
+    CPRRule(exceptions=["1111111118"]),
+]
+wordlist_rules = [
+    OrderedWordlistRule("da_20211018_laegehaandbog_stikord"),
+    OrderedWordlistRule("en_20211018_unit_test_words"),
+]
+other_rules = [
+    RegexRule("[Ss]ygehus"),
+    RegexRule(r"\d{4}-\d{2}-\d{2}"),
+    CreditCardRule(),
+    AddressRule(),
+]
+
+
+class TestTextRulePlan:
+    def test_text_heads(self):
+        """Only SimpleTextRules that Rule.try_match might evaluate directly
+        should be included in a plan."""
+        rule = AndRule(
+                cpr_variants[0],
+                OrRule(
+                        wordlist_rules[0],
+                        EmailHeaderRule(
+                                prop="subject", rule=RegexRule("hemmeligt"))))
+
+        assert find_text_heads(rule) == {cpr_variants[0], wordlist_rules[0]}
+
+    @pytest.mark.parametrize("obj_limit", [None, 1, 2])
+    def test_plan_matches_rules(self, obj_limit):
+        """Evaluating rules through a TextRulePlan should give exactly the
+        same results as evaluating them one by one."""
+        rules = cpr_variants + wordlist_rules + other_rules
+        plan = TextRulePlan(rules)
+
+        results = plan.execute(content, obj_limit=obj_limit)
+
+        assert set(results.keys()) == set(rules)
+        for rule in rules:
+            expected = list(rule.match(content))
+            if obj_limit is not None:
+                expected = expected[:obj_limit]
+            assert results[rule] == expected, rule
+
+    def test_plan_missing_content(self):
+        plan = TextRulePlan(cpr_variants + wordlist_rules)
+
+        assert all(v == [] for v in plan.execute(None).values())
+
+    @pytest.mark.parametrize("rule", [
+        AndRule(*cpr_variants[:2], *wordlist_rules),
+        OrRule(*cpr_variants, *wordlist_rules, *other_rules),
+        AllRule(*cpr_variants, *wordlist_rules, *other_rules),
+        AndRule(
+                NotRule(OrRule(RegexRule("hemmeligt"), cpr_variants[2])),
+                OrRule(wordlist_rules[1], cpr_variants[3])),
+    ])
+    @pytest.mark.parametrize("obj_limit", [None, 1])
+    def test_try_match_with_plan(self, rule, obj_limit):
+        """Rule.try_match should produce the same conclusion and the same
+        matches, for the same rules, with or without a TextRulePlan."""
+        expected = rule.try_match(
+                {OutputType.Text.value: content}, obj_limit=obj_limit)
+        actual = rule.try_match(
+                {OutputType.Text.value: content}, obj_limit=obj_limit,
+                plan=TextRulePlan.compile(rule))
+
+        assert actual == expected
+
+    def test_compile_reused(self):
+        """Compiling a plan for a Rule that's already been seen should reuse
+        the earlier plan."""
+        rule = OrRule(*cpr_variants, *wordlist_rules)
+
+        assert TextRulePlan.compile(rule) is TextRulePlan.compile(
+                OrRule(*cpr_variants, *wordlist_rules))
+
+    def test_single_wordlist(self):
+        """A plan with only one wordlist shouldn't build a combined word
+        index for it."""
+        plan = TextRulePlan(cpr_variants + wordlist_rules[:1])
+
+        assert not plan._word_index
+        assert plan.execute(content)[wordlist_rules[0]] == list(
+                wordlist_rules[0].match(content))
@@ -25,6 +25,7 @@ from os2datascanner.engine2.rules.regex import RegexRule
 from os2datascanner.engine2.rules.wordlists import OrderedWordlistRule
 from os2datascanner.engine2.rules.dict_lookup import EmailHeaderRule
 from os2datascanner.engine2.rules.passport import PassportRule
+from os2datascanner.engine2.rules.utilities.memo import MatchMemo
 
 from os2datascanner.engine2.model._staging.sbsysdb_rule import SBSYSDBRule
 
@@ -361,6 +362,26 @@ class TestRules:
         }
         assert set(r for r, _ in matches1) | set(r for r, _ in matches2) == expected
 
+    def test_resume_with_memo(self):
+        """A SimpleRule that appears in several branches of a rule should only
+        be evaluated once per object when a MatchMemo is used, even if its
+        branches are evaluated by different calls to try_match."""
+        cpr = CPRRule(modulus_11=False, ignore_irrelevant=False)
+        rule = OrRule(
+            AndRule(cpr, HasConversionRule(OutputType.MRZ)),
+            AndRule(cpr, RegexRule("forbryder")))
+        memo = MatchMemo()
+
+        representations = {"text": "2205995008: forbryder"}
+        remaining, matches1 = rule.try_match(representations, memo=memo)
+        representations["mrz"] = None
+        remaining, matches2 = remaining.try_match(representations, memo=memo)
+
+        assert remaining is True
+        evaluated = [r for r, _ in matches1 + matches2]
+        assert evaluated.count(cpr) == 1
+        assert memo.hits == 1
+
     @pytest.mark.parametrize("rule,tests", compound_candidates)
     def test_json_round_trip(self, rule, tests):
         json = rule.to_json_object()
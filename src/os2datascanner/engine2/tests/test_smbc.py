@@ -6,6 +6,7 @@
 import pytest
 from smbc import Attribute
 
+from os2datascanner.engine2 import settings
 from os2datascanner.engine2.model import smbc
 from os2datascanner.engine2.model.core import SourceManager
 
@@ -96,6 +97,27 @@ class TestSMBC:
             }
             assert source_handles == expected_handles
 
+    @pytest.mark.parametrize("unc", [
+        "//samba/general/smb-metadata",
+        "//samba/general/escaped",
+    ])
+    def test_parallel_exploration(self, unc, monkeypatch):
+        """Listing several directories at once should produce the same
+        handles, with the same hints, as walking the share sequentially."""
+        monkeypatch.setattr(smbc.SMBCSource, "allow_fake_attr", True)
+        source = smbc.SMBCSource(
+                unc, "os2", "swordfish",
+                skip_super_hidden=True, unc_is_home_root=True)
+
+        def explore(workers):
+            monkeypatch.setitem(settings.model["smbc"], "workers", workers)
+            with SourceManager() as sm:
+                return {h: h.to_json_object() for h in source.handles(sm)}
+
+        sequential = explore(1)
+        assert sequential
+        assert explore(4) == sequential
+
 
 class TestIncoherentAttributes:
     """Tests SMBCSource.is_skippable's handling of objects whose Windows
@@ -0,0 +1,102 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.core.errors import DeserialisationError
+from os2datascanner.engine2.model.file import FilesystemSource, FilesystemHandle
+from os2datascanner.engine2.pipeline import messages
+from os2datascanner.engine2.pipeline.utilities.spec_store import (
+        get_spec_store)
+from os2datascanner.engine2.pipeline.utilities.stage import dispatch
+from os2datascanner.engine2.rules.logical import AndRule
+from os2datascanner.engine2.rules.regex import RegexRule
+
+
+rule = AndRule(RegexRule("[Hh]ello"), RegexRule("[Ww]orld"))
+scan_spec = messages.ScanSpecMessage(
+        scan_tag=messages.ScanTagFragment.make_dummy(),
+        source=FilesystemSource("/mnt/share"),
+        rule=rule,
+        configuration={},
+        filter_rule=None,
+        progress=None)
+
+
+def conversions(count):
+    progress = messages.ProgressFragment(rule=rule, matches=[])
+    for k in range(count):
+        yield messages.ConversionMessage(
+                scan_spec=scan_spec,
+                handle=FilesystemHandle(scan_spec.source, f"{k}.txt"),
+                progress=progress)
+
+
+def send(generator):
+    """Serialises messages as a stage would, returning their JSON forms."""
+    return [json.loads(json.dumps(body)) for _, body in dispatch(
+            generator,
+            (messages.StatusMessage, ["os2ds_status"]),
+            (messages.ConversionMessage, ["os2ds_conversions"]))]
+
+
+@pytest.fixture
+def spec_store(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+            settings.pipeline["spec_store"], "directory", str(tmp_path))
+    get_spec_store.cache_clear()
+    yield get_spec_store()
+    get_spec_store().close()
+    get_spec_store.cache_clear()
+
+
+class TestSpecStore:
+    def test_disabled(self):
+        get_spec_store.cache_clear()
+        body, = send(conversions(1))
+        assert body["scan_spec"] == scan_spec.to_json_object()
+
+    def test_round_trip(self, spec_store):
+        bodies = send(conversions(3))
+        assert all(b["scan_spec"] == bodies[0]["scan_spec"]
+                   and "interned" in b["scan_spec"]
+                   and "interned" in b["progress"]["rule"] for b in bodies)
+
+        received = [messages.ConversionMessage.from_json_object(b)
+                    for b in bodies]
+        assert received == list(conversions(3))
+        # Receivers should build each scan spec once and then reuse it
+        assert all(r.scan_spec is received[0].scan_spec for r in received)
+
+    def test_other_messages(self, spec_store):
+        """Messages that might leave the engine should be sent in full."""
+        status = messages.StatusMessage(
+                scan_tag=scan_spec.scan_tag, total_objects=1)
+        body, = send([status])
+        assert body == status.to_json_object()
+
+    def test_other_process(self, spec_store):
+        """A process that didn't send a reference should read it from the
+        database."""
+        body, = send(conversions(1))
+        get_spec_store.cache_clear()
+
+        message = messages.ConversionMessage.from_json_object(body)
+        assert message.scan_spec == scan_spec
+        assert message.progress.rule == rule
+
+    def test_missing(self, spec_store):
+        body, = send(conversions(1))
+        body["scan_spec"]["interned"] = "0" * 32
+
+        with pytest.raises(DeserialisationError):
+            messages.ConversionMessage.from_json_object(body)
+
+    def test_smaller(self, spec_store):
+        full = json.dumps(next(conversions(1)).to_json_object())
+        interned = json.dumps(send(conversions(1))[0])
+        assert len(interned) < len(full) / 2
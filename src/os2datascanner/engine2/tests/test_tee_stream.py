@@ -0,0 +1,131 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+import os
+import hashlib
+import pytest
+
+from os2datascanner.engine2.conversions import convert
+from os2datascanner.engine2.conversions.types import OutputType
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.file import FilesystemHandle, FilesystemResource
+from os2datascanner.engine2.model.utilities.tee_stream import TeeStream
+
+
+here_path = os.path.dirname(__file__)
+text_file_path = os.path.join(here_path, "data", "cpr_same_birth_date.txt")
+
+with open(text_file_path, "rb") as fp:
+    content = fp.read()
+long_content = content * 20
+
+
+class TestTeeStream:
+    @pytest.mark.parametrize("read", [
+        lambda s: s.read(),
+        lambda s: list(iter(lambda: s.read(7), b"")),
+        lambda s: list(s),
+        lambda s: list(iter(lambda: s.readinto(bytearray(100)), 0)),
+    ])
+    def test_full_read(self, read):
+        observations = {}
+        read(TeeStream(
+                io.BytesIO(long_content), observations, identify=True))
+
+        assert observations == {
+            "head": long_content[:512],
+            "size": len(long_content),
+            "content_identifier": hashlib.blake2b(long_content).hexdigest(),
+        }
+
+    def test_unidentified_read(self):
+        """Content shouldn't be hashed unless its identifier is wanted."""
+        observations = {}
+        TeeStream(io.BytesIO(long_content), observations).read()
+
+        assert observations == {
+            "head": long_content[:512],
+            "size": len(long_content),
+        }
+
+    def test_partial_read(self):
+        observations = {}
+        TeeStream(io.BytesIO(long_content), observations).read(512)
+
+        assert observations == {"head": long_content[:512]}
+
+    def test_seek(self):
+        """A stream that's been read out of order shouldn't produce a content
+        identifier."""
+        observations = {}
+        stream = TeeStream(
+                io.BytesIO(long_content), observations, identify=True)
+        stream.seek(-10, io.SEEK_END)
+        stream.seek(0)
+        assert stream.read() == long_content
+
+        assert "content_identifier" not in observations
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Counts the number of times that FilesystemResource.make_path is called.
+    (FilesystemResource.make_stream calls it to open the file.)"""
+    calls = []
+    make_path = FilesystemResource.make_path
+
+    def _make_path(self):
+        calls.append(self.handle)
+        return make_path(self)
+    monkeypatch.setattr(FilesystemResource, "make_path", _make_path)
+    return calls
+
+
+def test_facts_shared_between_resources(opened):
+    """Once an object has been read in full, other Resources for it in the
+    same SourceManager should know its size, type and content identifier
+    without having to read it again."""
+    handle = FilesystemHandle.make_handle(text_file_path)
+    with SourceManager() as sm:
+        handle.follow(sm).want_content_identifier()
+        convert(handle.follow(sm), OutputType.Text)
+        reads = len(opened)
+
+        resource = handle.follow(sm)
+        assert resource.get_observed_size() == len(content)
+        assert resource.compute_type() == "text/plain"
+        assert (resource.compute_content_identifier()
+                == hashlib.blake2b(content).hexdigest())
+        assert len(opened) == reads
+
+        sm.forget_observations()
+        assert handle.follow(sm).get_observed_size() is None
+
+
+def test_unread_resource(opened):
+    handle = FilesystemHandle.make_handle(text_file_path)
+    with SourceManager() as sm:
+        resource = handle.follow(sm)
+        assert resource.get_observed_size() is None
+        assert (resource.compute_content_identifier()
+                == hashlib.blake2b(content).hexdigest())
+        assert resource.get_observed_size() == len(content)
+    assert len(opened) == 1
+
+
+def test_identifier_not_wanted(opened):
+    """An object read without anything wanting its content identifier should
+    only be read again if the identifier is asked for later."""
+    handle = FilesystemHandle.make_handle(text_file_path)
+    with SourceManager() as sm:
+        convert(handle.follow(sm), OutputType.Text)
+        resource = handle.follow(sm)
+        assert resource.get_observed_size() == len(content)
+        reads = len(opened)
+
+        assert (resource.compute_content_identifier()
+                == hashlib.blake2b(content).hexdigest())
+        assert len(opened) == reads + 1
@@ -0,0 +1,170 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from io import BytesIO
+import pytest
+
+from os2datascanner.engine2.conversions.types import OutputType, decode_dict, encode_dict
+from os2datascanner.engine2.conversions.utilities.windows import WindowedText
+from os2datascanner.engine2.model.file import FilesystemHandle
+from os2datascanner.engine2.rules.address import AddressRule
+from os2datascanner.engine2.rules.cpr import CPRRule
+from os2datascanner.engine2.rules.logical import OrRule
+from os2datascanner.engine2.rules.name import NameRule
+from os2datascanner.engine2.rules.regex import RegexRule
+from os2datascanner.engine2.rules.wordlists import OrderedWordlistRule
+
+
+content = """\
+Kære Jens Jensen (111111-1118),
+
+Vi har modtaget din ansøgning. Din ægtefælle, 2205995008, skal også underskrive
+den, før vi kan behandle den. Ifølge lægen lider du af akut arteriel
+insufficiens; det er noteret i sagen, og vi vender tilbage hurtigst muligt.
+Venlig hilsen
+Kommunen"""
+
+
+def windowed(
+        text: str, window_size: int, overlap: int,
+        opened: list = None) -> WindowedText:
+    def _opener():
+        if opened is not None:
+            opened.append(text)
+        return BytesIO(text.encode())
+    return WindowedText(
+            FilesystemHandle.make_handle("/tmp/stor.txt"),
+            opener=_opener, window_size=window_size, overlap=overlap)
+
+
+class TestWindowedText:
+    @pytest.mark.parametrize("window_size,overlap", [
+        (1, 0), (7, 3), (32, 16), (100, 0), (10000, 64)])
+    def test_windows_cover_text(self, window_size, overlap):
+        """Every character of the text should be owned by exactly one window,
+        and every window's offset should be accurate."""
+        windows = list(windowed(content, window_size, overlap))
+
+        assert "".join(
+                w.text[w.own_start:w.own_end] for w in windows) == content
+        for w in windows:
+            assert content[w.offset:w.offset + len(w.text)] == w.text
+            assert len(w.text) <= window_size + 2 * overlap
+        assert [w.final for w in windows] == [False] * (len(windows) - 1) + [True]
+
+    def test_windows_multibyte(self):
+        """Windows are counted in characters, not bytes, so characters that
+        straddle a read boundary must not be corrupted."""
+        windows = list(windowed("æøå" * 50, 5, 2))
+
+        assert "".join(w.text[w.own_start:w.own_end] for w in windows) == "æøå" * 50
+
+    def test_unbound(self):
+        wt = WindowedText(FilesystemHandle.make_handle("/tmp/stor.txt"))
+
+        with pytest.raises(ValueError):
+            list(wt)
+
+    def test_serialisation(self):
+        """WindowedTexts should survive a trip through a message."""
+        wt = windowed(content, 64, 16)
+
+        rt = decode_dict(encode_dict({OutputType.Text.value: wt}))[
+                OutputType.Text.value]
+
+        assert isinstance(rt, WindowedText)
+        assert rt.handle == wt.handle
+        assert rt.overlap == wt.overlap
+
+    @pytest.mark.parametrize("rule", [
+        CPRRule(),
+        CPRRule(modulus_11=False, ignore_irrelevant=False, examine_context=False),
+        RegexRule(r"\d{6}-?\d{4}"),
+        OrderedWordlistRule("da_20211018_laegehaandbog_stikord"),
+    ])
+    @pytest.mark.parametrize("window_size", [24, 40, 10000])
+    def test_matches_across_windows(self, rule, window_size):
+        """Matching a rule against a WindowedText should find the same
+        matches, at the same offsets, as matching it against the text, even
+        when matches cross the edge of a window."""
+        expected = [m["offset"] for m in rule.match(content)]
+
+        actual = [m["offset"] for m in rule.match_windows(
+                windowed(content, window_size, 60))]
+
+        assert actual == expected
+
+    def test_blacklist_across_windows(self):
+        """A blacklisted word anywhere in the text should suppress CPR numbers
+        in every window."""
+        text = content + "\n\nFakturanummer: 1"
+
+        assert not list(CPRRule().match_windows(windowed(text, 40, 20)))
+
+    def test_blacklist_read_once(self):
+        """Checking the whole text for blacklisted words shouldn't mean reading
+        it twice."""
+        opened = []
+
+        assert [m["offset"] for m in CPRRule().match_windows(
+                windowed(content, 40, 60, opened))] == [
+                        m["offset"] for m in CPRRule().match(content)]
+        assert len(opened) == 1
+
+    def test_try_match(self):
+        rule = CPRRule()
+
+        conclusion, matches = rule.try_match(
+                {OutputType.Text.value: windowed(content, 40, 60)})
+
+        assert conclusion is True
+        assert matches[0][1] == list(rule.match(content))
+
+    @pytest.mark.parametrize("rule", [
+        AddressRule(),
+        NameRule(),
+        NameRule(expansive=True),
+    ])
+    @pytest.mark.parametrize("window_size", [24, 40, 10000])
+    def test_rules_without_offsets(self, rule, window_size):
+        """Rules that don't always report accurate offsets should still find
+        exactly the matches that they would have found in the whole text."""
+        def key(m):
+            return m["match"], m.get("offset", 0)
+        text = (content + "\nKunden bor på Strandvej 17, 9999 Vejstrand.\n") * 3
+
+        # (NameRule doesn't yield its matches in a predictable order)
+        assert sorted(
+                rule.match_windows(windowed(text, window_size, 60)),
+                key=key) == sorted(rule.match(text), key=key)
+
+    def test_undecodable(self):
+        """A WindowedText that can't be decoded, like a small text that can't
+        be, shouldn't be matched at all."""
+        wt = WindowedText(
+                FilesystemHandle.make_handle("/tmp/stor.txt"),
+                opener=lambda: BytesIO(content.encode() + b"\xff\xfe"),
+                window_size=40, overlap=20)
+
+        conclusion, matches = CPRRule().try_match({OutputType.Text.value: wt})
+
+        assert conclusion is False
+        assert matches[0][1] == []
+
+    def test_undecodable_checked_once(self):
+        """Once a WindowedText has been found to be undecodable, other rules
+        shouldn't have to read it again to find that out."""
+        opened = []
+        wt = WindowedText(
+                FilesystemHandle.make_handle("/tmp/stor.txt"),
+                opener=lambda: opened.append(wt) or BytesIO(b"\xff" * 100),
+                window_size=40, overlap=20)
+
+        rule = OrRule(CPRRule(), RegexRule("Kommunen"))
+        conclusion, matches = rule.try_match({OutputType.Text.value: wt})
+
+        assert conclusion is False
+        assert [m for _, m in matches] == [[], []]
+        assert len(opened) == 1
@@ -0,0 +1,148 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os.path
+import pytest
+
+from os2datascanner.engine2 import settings
+from os2datascanner.engine2.model.core import SourceManager
+from os2datascanner.engine2.model.derived.pdf import PDFSource
+from os2datascanner.engine2.model.file import FilesystemHandle
+from os2datascanner.engine2.pipeline import messages, worker
+from os2datascanner.engine2.pipeline.utilities import page_pool
+from os2datascanner.engine2.pipeline.utilities.page_pool import PagePool
+from os2datascanner.engine2.rules.cpr import CPRRule
+
+
+here_path = os.path.dirname(__file__)
+pdf_file_path = os.path.join(here_path, "data", "pdf", "embedded-cpr.pdf")
+
+
+def _scan_spec():
+    return messages.ScanSpecMessage(
+            scan_tag=messages.ScanTagFragment.make_dummy(),
+            source=PDFSource(FilesystemHandle.make_handle(pdf_file_path)),
+            rule=CPRRule(),
+            configuration={},
+            progress=None,
+            filter_rule=None)
+
+
+def _explore(processes: int, monkeypatch, *, timeout=0):
+    monkeypatch.setitem(
+            settings.pipeline["worker"], "PDF_PAGE_TIMEOUT", timeout)
+    monkeypatch.setitem(
+            settings.pipeline["worker"], "PDF_PAGE_PROCESSES", processes)
+    monkeypatch.setitem(
+            settings.pipeline["worker"], "PDF_PAGE_THRESHOLD", 1)
+    monkeypatch.setattr(worker, "total_matches", 0)
+    with SourceManager() as sm:
+        results = [
+            (m.handle, m.matched)
+            for m in worker.explore(sm, _scan_spec())
+            if isinstance(m, messages.MatchesMessage)]
+    return results, worker.total_matches
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_page_pool_matches_sequential(processes, monkeypatch):
+    """Handling the pages of a PDF in a PagePool should produce the same
+    results, in the same order, as handling them in the worker."""
+    expected = _explore(0, monkeypatch)
+
+    assert _explore(processes, monkeypatch) == expected
+    assert expected[1] > 0
+
+
+def test_page_pool_reused(monkeypatch):
+    """The processes of a worker's PagePools should outlive each document."""
+    _explore(1, monkeypatch)
+    processes = page_pool._processes
+    _explore(1, monkeypatch)
+
+    assert page_pool._processes is processes
+    assert not processes.broken
+
+
+def test_page_pool_order(monkeypatch):
+    """Messages that aren't pages should come out of the PagePool in the same
+    position, relative to the pages, as they were explored in."""
+    explorer_handler = worker.explorer_handler
+
+    def _explorer_handler(msg, sm):
+        for m in explorer_handler(msg, sm):
+            yield m
+            # (Only the parent process sees this function, so don't make the
+            # pages themselves any different)
+            if (isinstance(msg.source, PDFSource)
+                    and isinstance(m, messages.ConversionMessage)):
+                yield messages.ProblemMessage(
+                        scan_tag=msg.scan_tag, source=None, handle=m.handle,
+                        message="after this page")
+    monkeypatch.setattr(worker, "explorer_handler", _explorer_handler)
+
+    def _results(processes):
+        monkeypatch.setitem(
+                settings.pipeline["worker"], "PDF_PAGE_PROCESSES", processes)
+        monkeypatch.setitem(
+                settings.pipeline["worker"], "PDF_PAGE_THRESHOLD", 1)
+        with SourceManager() as sm:
+            return [
+                (type(m).__name__, m.handle)
+                for m in worker.explore(sm, _scan_spec())
+                if isinstance(m, (messages.MatchesMessage,
+                                  messages.ProblemMessage))]
+
+    expected = _results(0)
+    assert any(name == "ProblemMessage" for name, _ in expected)
+    assert _results(2) == expected
+
+
+def test_page_pool_timeout(monkeypatch):
+    """Pages that the pool takes too long to handle should be handled by the
+    worker instead."""
+    expected = _explore(0, monkeypatch)
+    gave_up = []
+    give_up = PagePool._give_up
+
+    def _give_up(self):
+        gave_up.append(self)
+        give_up(self)
+    monkeypatch.setattr(PagePool, "_give_up", _give_up)
+
+    assert _explore(1, monkeypatch, timeout=1e-6) == expected
+    assert gave_up
+
+
+def test_page_pool_abort(monkeypatch):
+    """A scan cancelled while the pool is in use should stop handing pages to
+    it."""
+    spec = _scan_spec()
+    monkeypatch.setitem(settings.pipeline["worker"], "PDF_PAGE_PROCESSES", 1)
+    monkeypatch.setitem(settings.pipeline["worker"], "PDF_PAGE_THRESHOLD", 1)
+    monkeypatch.setattr(worker, "_cancelled_tags", set())
+    submitted = []
+    aborted = []
+    submit = PagePool.submit
+    abort = PagePool.abort
+
+    def _submit(self, message, **kwargs):
+        submitted.append(message)
+        submit(self, message, **kwargs)
+        # Cancel the scan as soon as the first page is in the pool
+        worker._cancelled_tags.add(spec.scan_tag)
+
+    def _abort(self):
+        aborted.append(self)
+        abort(self)
+    monkeypatch.setattr(PagePool, "submit", _submit)
+    monkeypatch.setattr(PagePool, "abort", _abort)
+
+    with SourceManager() as sm:
+        assert not [
+            m for m in worker.explore(sm, spec)
+            if isinstance(m, messages.MatchesMessage)]
+    assert len(submitted) == 1
+    assert aborted
@@ -34,54 +34,121 @@ SUMMARY = Summary("os2datascanner_scan_status_collector_admin",
                   "Messages through ScanStatus collector")
 
 
-def status_message_received_raw(body):  # noqa: CCR001, C901 complexity
-    """A status message for a scannerjob is created in Scanner.run().
-    Therefore, this method can focus merely on updating the ScanStatus object."""
-    message = messages.StatusMessage.from_json_object(body)
+_COUNTERS = (
+        "total_objects", "explored_sources", "total_sources",
+        "scanned_objects", "scanned_size",
+        "skipped_by_last_modified", "matches_found",)
+"""The ScanStatus fields that StatusMessages add to."""
+
+
+class _PendingUpdate:
+    """Collects the changes that a run of StatusMessages makes to a locked
+    ScanStatus, so that they can be written to the database together.
+
+    The ScanStatus itself is updated in memory as each message is applied, so
+    that decisions made along the way (whether to take a snapshot, whether the
+    scan has just finished) see exactly the values that they would have seen
+    had every message been written on its own."""
+
+    def __init__(self, scan_status: ScanStatus):
+        self.scan_status = scan_status
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.fields = {}
+        self.mime_stats = {}
+
+    def add(self, counter: str, value: int):
+        self.counters[counter] += value
+        # (Adding to a NULL column leaves it NULL, in the database and here)
+        if (current := getattr(self.scan_status, counter)) is not None:
+            setattr(self.scan_status, counter, current + value)
+
+    def set(self, field: str, value):
+        self.fields[field] = value
+        setattr(self.scan_status, field, value)
+
+    def add_process_stat(self, mime_type: str, seconds: float, size: int):
+        total_time, total_size, count = self.mime_stats.get(
+                mime_type, (timedelta(), 0, 0))
+        self.mime_stats[mime_type] = (
+                total_time + timedelta(seconds=seconds),
+                total_size + size,
+                count + 1)
+
+    def write(self):
+        """Writes every change collected so far to the database in one update
+        of the ScanStatus and one of each affected MIMETypeProcessStat."""
+        update = {
+            k: F(k) + v for k, v in self.counters.items() if v} | self.fields
+        if update:
+            ScanStatus.objects.filter(pk=self.scan_status.pk).update(**update)
+
+        for mime_type, (total_time, total_size, count) in (
+                self.mime_stats.items()):
+            # Each of these gets its own savepoint, so that a DataError (an
+            # overlong mime_type, for example) can't roll back the counters
+            # of every message in the batch
+            try:
+                with transaction.atomic():
+                    self._write_process_stat(
+                            mime_type, total_time, total_size, count)
+            except DataError as de:
+                logger.error(
+                    "Could not record process stats, due to DataError",
+                    error=de)
 
-    try:
-        scanner = Scanner.objects.get(pk=message.scan_tag.scanner.pk)
-    except Scanner.DoesNotExist:
-        # This is a residual message for a scanner that the administrator has
-        # deleted. Throw it away
-        return
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.fields = {}
+        self.mime_stats = {}
 
-    locked_qs = ScanStatus.objects.select_for_update(
-        of=('self',)
-    ).filter(
-        # The same scanner, at the same time, should be what we're looking for.
-        scanner=scanner,
-        scan_tag__time=body["scan_tag"]["time"]
-    )
-    # Queryset is evaluated immediately with .first() to lock the database entry.
-    scan_status = locked_qs.first()
+    def _write_process_stat(self, mime_type, total_time, total_size, count):
+        locked_stat_qs = MIMETypeProcessStat.objects.select_for_update(
+            ).filter(
+            scan_status=self.scan_status,
+            mime_type=mime_type
+            )
+        if locked_stat_qs.first():
+            locked_stat_qs.update(
+                total_time=F('total_time') + total_time,
+                total_size=F('total_size') + total_size,
+                object_count=F('object_count') + count
+            )
+        else:
+            MIMETypeProcessStat.objects.create(
+                scan_status=self.scan_status,
+                mime_type=mime_type,
+                total_size=total_size,
+                object_count=count,
+                total_time=total_time
+                )
 
+
+def _apply_counters(  # noqa: CCR001, too high cognitive complexity
+        pending: _PendingUpdate, message: messages.StatusMessage):
+    """Applies the counters carried by a StatusMessage to a pending update,
+    returning True if the message reported that an object was scanned."""
     object_scanned = message.object_size is not None and message.object_type is not None
 
     if message.total_objects is not None:
         # An explorer has finished exploring a Source. The presence of
         # total_objects is the only signal that says so.
         already_counted = message.objects_reported_individually
-        update = dict(
-                message=message.message,
-                last_modified=timezone.now(),
-                total_objects=F('total_objects') + (
-                        0 if already_counted else message.total_objects),
-                explored_sources=F('explored_sources') + 1)
+        pending.set("message", message.message)
+        pending.set("last_modified", timezone.now())
+        pending.add("total_objects",
+                    0 if already_counted else message.total_objects)
+        pending.add("explored_sources", 1)
         if message.status_is_error:
             # Both worker and explorer emit status messages.
             # Default value is false, and only the explorer may say otherwise.
             # To avoid unwanted overwriting we only update if the message carries True.
-            update['status_is_error'] = True
-        locked_qs.update(**update)
+            pending.set("status_is_error", True)
 
     elif object_scanned:
         # A worker has finished processing a Handle
-        locked_qs.update(
-                message=message.message,
-                last_modified=timezone.now(),
-                scanned_size=F('scanned_size') + message.object_size,
-                scanned_objects=F('scanned_objects') + 1)
+        pending.set("message", message.message)
+        pending.set("last_modified", timezone.now())
+        pending.add("scanned_size", message.object_size)
+        pending.add("scanned_objects", 1)
 
     if message.new_objects:
         # An explorer has published one or more objects. Like with new_sources below,
@@ -89,9 +156,8 @@ def status_message_received_raw(body):  # noqa: CCR001, C901 complexity
         # having been published says nothing about the walk that published it
         # being over, and counting one explored Source per object is what
         # reusing total_objects for this would have done.
-        locked_qs.update(
-                last_modified=timezone.now(),
-                total_objects=F('total_objects') + message.new_objects)
+        pending.set("last_modified", timezone.now())
+        pending.add("total_objects", message.new_objects)
 
     if message.new_sources and not message.sources_reported_individually:
         # An explorer has discovered one or more independent Sources. This is
@@ -101,136 +167,198 @@ def status_message_received_raw(body):  # noqa: CCR001, C901 complexity
         # message that also carries total_objects. Both must count, but the
         # terminal message of a current explorer repeats the total for the
         # backwards compatability with older admin versions, and we must not count that.
-        locked_qs.update(
-                last_modified=timezone.now(),
-                total_sources=F('total_sources') + message.new_sources)
+        pending.set("last_modified", timezone.now())
+        pending.add("total_sources", message.new_sources)
 
     if message.skipped_by_last_modified:
-        locked_qs.update(skipped_by_last_modified=F("skipped_by_last_modified") +
-                         message.skipped_by_last_modified)
+        pending.add("skipped_by_last_modified", message.skipped_by_last_modified)
 
     if message.matches_found is not None:
-        locked_qs.update(matches_found=F('matches_found') + message.matches_found)
-
-    # Get the frequency setting and decide whether to create a snapshot
-    snapshot_param = settings.SNAPSHOT_PARAMETER
-
-    if scan_status:
-        if message.process_time_worker is not None and message.object_type is not None:
-            # select for update to lock
-            locked_stat_qs = MIMETypeProcessStat.objects.select_for_update(
-                ).filter(
-                scan_status=scan_status,
-                mime_type=message.object_type
-                )
-            mime_type_process_stats = locked_stat_qs.first()
+        pending.add("matches_found", message.matches_found)
 
-            if mime_type_process_stats:
-                locked_stat_qs.update(
-                    total_time=F('total_time') + timedelta(seconds=message.process_time_worker),
-                    total_size=F('total_size') + message.object_size,
-                    object_count=F('object_count') + 1
-                )
-            else:
-                MIMETypeProcessStat.objects.create(
-                    scan_status=scan_status,
-                    mime_type=message.object_type,
-                    total_size=message.object_size,
-                    object_count=1,
-                    total_time=timedelta(seconds=message.process_time_worker)
-                    )
+    if message.process_time_worker is not None and message.object_type is not None:
+        pending.add_process_stat(
+                message.object_type, message.process_time_worker,
+                message.object_size)
 
-        if message.content_identifier:
-            # This whole block gets its own savepoint, so a DataError here
-            # (e.g. an overlong content_identifier or mime_type) can't roll
-            # back the scan-progress counters already updated above - the
-            # two shouldn't share a transaction/fate.
+    return object_scanned
+
+
+def _record_content_identifier(
+        scan_status: ScanStatus, message: messages.StatusMessage):
+    # This whole block gets its own savepoint, so a DataError here
+    # (e.g. an overlong content_identifier or mime_type) can't roll
+    # back the scan-progress counters - the two shouldn't share a
+    # transaction/fate.
+    try:
+        with transaction.atomic():
             try:
                 with transaction.atomic():
-                    try:
-                        with transaction.atomic():
-                            # Try to store the hash in the cache.
-                            HashCache.objects.create(
-                                scan_status=scan_status,
-                                content_identifier=message.content_identifier,
-                                file_size=message.object_size,
-                                mime_type=message.object_type
-                            )
-                    except IntegrityError:
-                        try:
-                            with transaction.atomic():
-                                # If the hash was not created, it's a duplicate.
-                                DuplicationStat.objects.create(
-                                    scan_status=scan_status,
-                                    content_identifier=message.content_identifier,
-                                    file_size=message.object_size,
-                                    mime_type=message.object_type,
-                                    occurrences=2,
-                                    process_time=timedelta(seconds=message.process_time_worker)
-                                )
-                        except IntegrityError:
-                            # The duplication was already recorded. Increment the occurrence
-                            # count.
-                            DuplicationStat.objects.filter(
-                                scan_status=scan_status,
-                                content_identifier=message.content_identifier,
-                                file_size=message.object_size,
-                                mime_type=message.object_type
-                            ).update(occurrences=F('occurrences') + 1,
-                                     process_time=F('process_time') + timedelta(
-                                         seconds=message.process_time_worker))
-            except DataError as de:
-                logger.error(
-                    "Could not record duplication stats, due to DataError",
-                    error=de)
+                    # Try to store the hash in the cache.
+                    HashCache.objects.create(
+                        scan_status=scan_status,
+                        content_identifier=message.content_identifier,
+                        file_size=message.object_size,
+                        mime_type=message.object_type
+                    )
+            except IntegrityError:
+                try:
+                    with transaction.atomic():
+                        # If the hash was not created, it's a duplicate.
+                        DuplicationStat.objects.create(
+                            scan_status=scan_status,
+                            content_identifier=message.content_identifier,
+                            file_size=message.object_size,
+                            mime_type=message.object_type,
+                            occurrences=2,
+                            process_time=timedelta(seconds=message.process_time_worker)
+                        )
+                except IntegrityError:
+                    # The duplication was already recorded. Increment the occurrence
+                    # count.
+                    DuplicationStat.objects.filter(
+                        scan_status=scan_status,
+                        content_identifier=message.content_identifier,
+                        file_size=message.object_size,
+                        mime_type=message.object_type
+                    ).update(occurrences=F('occurrences') + 1,
+                             process_time=F('process_time') + timedelta(
+                                 seconds=message.process_time_worker))
+    except DataError as de:
+        logger.error(
+            "Could not record duplication stats, due to DataError",
+            error=de)
+
+
+def _make_snapshot(scan_status: ScanStatus) -> ScanStatusSnapshot | None:
+    """Returns a snapshot of a ScanStatus if one should be taken now that it
+    has scanned another object, or None otherwise."""
+    # Snapshots are a scanned_objects time series, so only a message that
+    # advanced scanned_objects can add a point to it. An explorer
+    # announcing Sources one by one sends many messages before the
+    # first object is scanned, we don't want those to count.
+    n_total = scan_status.total_objects
+    if not n_total or n_total <= 0:
+        return None
+
+    # Calculate a frequency for how often to take a snapshot.
+    # n_total must be at least 2 for this to work.
+    frequency = n_total * math.log(settings.SNAPSHOT_PARAMETER, max(n_total, 2))
+    # Decide whether it is time to take a snapshot.
+    if scan_status.scanned_objects % max(1, math.floor(frequency)) != 0:
+        return None
+    return ScanStatusSnapshot(
+            scan_status=scan_status,
+            time_stamp=timezone.now(),
+            total_sources=scan_status.total_sources,
+            explored_sources=scan_status.explored_sources,
+            total_objects=scan_status.total_objects,
+            scanned_objects=scan_status.scanned_objects,
+            scanned_size=scan_status.scanned_size,
+            skipped_by_last_modified=scan_status.skipped_by_last_modified,
+    )
 
-        # We've just updated using locked_qs, refresh our saved instance before proceeding.
-        scan_status.refresh_from_db()
-
-        # Snapshots are a scanned_objects time series, so only a message that
-        # advanced scanned_objects can add a point to it. An explorer
-        # announcing Sources one by one sends many messages before the
-        # first object is scanned, we don't want those to count.
-        n_total = scan_status.total_objects
-        if object_scanned and n_total and n_total > 0:
-            # Calculate a frequency for how often to take a snapshot.
-            # n_total must be at least 2 for this to work.
-            frequency = n_total * math.log(snapshot_param, max(n_total, 2))
-            # Decide whether it is time to take a snapshot.
-            take_snap = scan_status.scanned_objects % max(1, math.floor(frequency))
-            if take_snap == 0:
-                ScanStatusSnapshot.objects.create(
-                    scan_status=scan_status,
-                    time_stamp=timezone.now(),
-                    total_sources=scan_status.total_sources,
-                    explored_sources=scan_status.explored_sources,
-                    total_objects=scan_status.total_objects,
-                    scanned_objects=scan_status.scanned_objects,
-                    scanned_size=scan_status.scanned_size,
-                    skipped_by_last_modified=scan_status.skipped_by_last_modified,
-                )
+
+def _finish(scanner: Scanner, scan_status: ScanStatus):
+    # Send email upon scannerjob completion
+    logger.info("Sending notification mail for finished scannerjob.")
+    FinishedScannerNotificationEmail(scanner, scan_status).notify()
+    scan_status.email_sent = True
+    scan_status.save(update_fields=["email_sent"])
+    # Clean up the hash cache for this scan
+    HashCache.objects.filter(scan_status=scan_status).delete()
+
+    # Clean up the per-scan conversion queue now that all work is done.
+    delete_per_scan_queue(scan_status.scan_tag)
+
+
+def _apply_status_messages(  # noqa: CCR001, too high cognitive complexity
+        scanner_pk, scan_time, batch: list[messages.StatusMessage]):
+    """Applies a run of StatusMessages for the same scan to its ScanStatus,
+    taking the row lock once and writing the result in as few updates as
+    possible. (The only points at which changes are written early are those
+    at which the scan finishes, as the notification mail and the cleanup that
+    follow must see them.)"""
+    try:
+        scanner = Scanner.objects.get(pk=scanner_pk)
+    except Scanner.DoesNotExist:
+        # This is a residual message for a scanner that the administrator has
+        # deleted. Throw it away
+        return
+
+    # Queryset is evaluated immediately with .first() to lock the database entry.
+    scan_status = ScanStatus.objects.select_for_update(
+        of=('self',)
+    ).filter(
+        # The same scanner, at the same time, should be what we're looking for.
+        scanner=scanner,
+        scan_tag__time=scan_time
+    ).first()
+    if not scan_status:
+        return
+
+    pending = _PendingUpdate(scan_status)
+    snapshots = []
+    for message in batch:
+        object_scanned = _apply_counters(pending, message)
+
+        if message.content_identifier:
+            _record_content_identifier(scan_status, message)
+
+        if object_scanned and (snapshot := _make_snapshot(scan_status)):
+            snapshots.append(snapshot)
 
         # TODO: No mails are sent when scans are cancelled -- should they?
         if scan_status.finished:
             if not scan_status.email_sent:
-                # Send email upon scannerjob completion
-                logger.info("Sending notification mail for finished scannerjob.")
-                FinishedScannerNotificationEmail(scanner, scan_status).notify()
-                scan_status.email_sent = True
-                scan_status.save()
-                # Clean up the hash cache for this scan
-                HashCache.objects.filter(scan_status=scan_status).delete()
-
-                # Clean up the per-scan conversion queue now that all work is done.
-                delete_per_scan_queue(scan_status.scan_tag)
+                pending.write()
+                _finish(scanner, scan_status)
             else:
                 logger.warning(
                     "BUG: received status message for a ScanStatus marked as complete!",
                     scan_status=scan_status, message=message)
 
+    pending.write()
+    ScanStatusSnapshot.objects.bulk_create(snapshots)
+
+
+def status_messages_received_raw(bodies: list[dict]):
+    """Updates ScanStatus objects from a batch of status messages. (A status
+    message for a scannerjob is created in Scanner.run(), so this function can
+    focus merely on updating the ScanStatus object.)
+
+    Messages for the same scan are applied together, in the order in which
+    they were received, under a single lock of its ScanStatus."""
+    scans = {}
+    for body in bodies:
+        message = messages.StatusMessage.from_json_object(body)
+        scans.setdefault(
+                (message.scan_tag.scanner.pk, body["scan_tag"]["time"]),
+                []).append(message)
+
+    # (Taking the locks in a fixed order means that two collectors can never
+    # each be waiting for a lock that the other one holds)
+    for (scanner_pk, scan_time), batch in sorted(scans.items()):
+        try:
+            with transaction.atomic():
+                _apply_status_messages(scanner_pk, scan_time, batch)
+        except DataError as de:
+            # DataError occurs when something went wrong trying to select
+            # or create/update data in the database. For now, we
+            # only log the error message.
+            logger.error(
+                "Could not get or create object, due to DataError",
+                error=de)
+
     yield from []
 
 
+def status_message_received_raw(body):
+    """A status message for a scannerjob is created in Scanner.run().
+    Therefore, this method can focus merely on updating the ScanStatus object."""
+    yield from status_messages_received_raw([body])
+
+
 def object_progress_received_raw(body):
     """Upserts (or, for a final heartbeat, removes) the ActiveObjectStatus row
     for the top-level object described by an ObjectProgressMessage.
@@ -333,6 +461,23 @@ class StatusCollectorRunner(PikaPipelineThread):
                     count=len(queues),
                     target=target_queue or "broadcast")
 
+    @override
+    def handle_messages(self, deliveries):
+        """Handles a batch of messages. Status messages are applied together
+        (see status_messages_received_raw); everything else is handled one
+        message at a time, as handle_message would."""
+        statuses = []
+        for routing_key, body in deliveries:
+            if (routing_key == "os2ds_status"
+                    and body.get("type") != "object_progress"):
+                statuses.append(body)
+            else:
+                yield from self.handle_message(routing_key, body)
+
+        if statuses:
+            with SUMMARY.time():
+                yield from status_messages_received_raw(statuses)
+
     @override
     def handle_message(self, routing_key, body):
         with SUMMARY.time():
@@ -376,4 +521,5 @@ class Command(BaseCommand):
 
         StatusCollectorRunner(
             read=["os2ds_status"],
-            prefetch_count=1024).run_consumer()
+            prefetch_count=1024,
+            batch_size=settings.STATUS_COLLECTOR_BATCH_SIZE).run_consumer()
@@ -0,0 +1,135 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from dataclasses import replace
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from os2datascanner.engine2.pipeline import messages
+from os2datascanner.projects.admin.adminapp.models.scannerjobs.scanner_helpers import (
+        ScanStatus, ScanStatusSnapshot, MIMETypeProcessStat)
+from os2datascanner.projects.admin.adminapp.management.commands import status_collector
+
+
+COLLECTOR = "os2datascanner.projects.admin.adminapp.management.commands.status_collector"
+
+
+def scanned(scan_tag, object_type="text/plain"):
+    return messages.StatusMessage(
+            scan_tag=scan_tag, message="", object_size=100,
+            object_type=object_type, process_time_worker=0.5,
+            matches_found=1).to_json_object()
+
+
+def published(scan_tag, count):
+    return messages.StatusMessage(
+            scan_tag=scan_tag, new_objects=count).to_json_object()
+
+
+def explored(scan_tag, count):
+    return messages.StatusMessage(
+            scan_tag=scan_tag, message="", total_objects=count,
+            objects_reported_individually=True).to_json_object()
+
+
+@pytest.fixture
+def scan(basic_scanner):
+    scan_tag = basic_scanner._construct_scan_tag()
+    scan_status = ScanStatus.objects.create(
+            scanner=basic_scanner, scan_tag=scan_tag.to_json_object(),
+            total_sources=1, matches_found=0)
+    return scan_tag, scan_status
+
+
+@pytest.fixture
+def other_scan(scan, basic_scanner):
+    scan_tag = replace(scan[0], time=scan[0].time + timedelta(seconds=1))
+    scan_status = ScanStatus.objects.create(
+            scanner=basic_scanner, scan_tag=scan_tag.to_json_object(),
+            total_sources=1, matches_found=0)
+    return scan_tag, scan_status
+
+
+@pytest.mark.django_db
+class TestStatusBatches:
+    def run(self, *batches):
+        with (
+                patch(f"{COLLECTOR}.delete_per_scan_queue") as delete,
+                patch(f"{COLLECTOR}.FinishedScannerNotificationEmail") as mail):
+            for batch in batches:
+                list(status_collector.status_messages_received_raw(batch))
+        return delete, mail
+
+    def test_counters(self, scan):
+        scan_tag, scan_status = scan
+        self.run([published(scan_tag, 5)] + [scanned(scan_tag)] * 3)
+
+        scan_status.refresh_from_db()
+        assert scan_status.total_objects == 5
+        assert scan_status.scanned_objects == 3
+        assert scan_status.scanned_size == 300
+        assert scan_status.matches_found == 3
+        assert not scan_status.finished
+
+        stat = MIMETypeProcessStat.objects.get(scan_status=scan_status)
+        assert stat.object_count == 3
+        assert stat.total_size == 300
+        assert stat.total_time.total_seconds() == 1.5
+
+    def test_same_as_one_at_a_time(self, scan, other_scan):
+        """Applying a batch of messages should leave the ScanStatus and its
+        snapshots exactly as applying the same messages one by one would."""
+        scan_tag, scan_status = scan
+        other_tag, other_status = other_scan
+
+        def bodies(tag):
+            return ([published(tag, 50)] + [scanned(tag)] * 20
+                    + [explored(tag, 50)])
+
+        self.run(bodies(scan_tag))
+        self.run(*[[body] for body in bodies(other_tag)])
+
+        fields = ("total_objects", "scanned_objects", "scanned_size",
+                  "explored_sources", "matches_found",)
+        scan_status.refresh_from_db()
+        other_status.refresh_from_db()
+        assert ([getattr(scan_status, f) for f in fields]
+                == [getattr(other_status, f) for f in fields])
+        assert (sorted(ScanStatusSnapshot.objects.filter(
+                        scan_status=scan_status).values_list(
+                                "scanned_objects", flat=True))
+                == sorted(ScanStatusSnapshot.objects.filter(
+                        scan_status=other_status).values_list(
+                                "scanned_objects", flat=True)))
+
+    def test_finished_mid_batch(self, scan):
+        """A scan that finishes partway through a batch should be finished
+        exactly once, and should see every message that came before."""
+        scan_tag, scan_status = scan
+        delete, mail = self.run(
+                [published(scan_tag, 2), explored(scan_tag, 2)]
+                + [scanned(scan_tag)] * 3)
+
+        scan_status.refresh_from_db()
+        assert scan_status.finished
+        assert scan_status.email_sent
+        assert scan_status.scanned_objects == 3
+        mail.assert_called_once()
+        delete.assert_called_once_with(scan_status.scan_tag)
+
+    def test_several_scans(self, scan, other_scan):
+        scan_tag, scan_status = scan
+        other_tag, other_status = other_scan
+
+        self.run([published(scan_tag, 1), published(other_tag, 2),
+                  scanned(other_tag), published(scan_tag, 3)])
+
+        scan_status.refresh_from_db()
+        other_status.refresh_from_db()
+        assert scan_status.total_objects == 4
+        assert other_status.total_objects == 2
+        assert other_status.scanned_objects == 1
@@ -5,6 +5,7 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 
 import structlog
+from django.conf import settings
 from django.db import transaction
 from django.core.management.base import BaseCommand
 from django.db.models import Q, Count
@@ -37,7 +38,90 @@ SUMMARY = Summary("os2datascanner_result_collector_report",
 ResolutionChoices = DocumentReport.ResolutionChoices
 
 
-def result_message_received_raw(body):
+class _ResultBatch:
+    """Caches the database objects that the result collector needs for every
+    result: the Organization and ScannerReference of each scan, and the locked
+    DocumentReport (if there is one) of each scanned object.
+
+    The DocumentReports for a whole batch of results can be locked and loaded
+    in a single query by calling prefetch(). Each prefetched DocumentReport is
+    only handed out once, as handling a result can change or delete it; later
+    results for the same object look it up again."""
+
+    def __init__(self):
+        self._organizations = {}
+        self._scanners = {}
+        self._reports = {}
+
+    def organization(self, scan_tag) -> Organization | None:
+        uuid = scan_tag.organisation.uuid
+        if uuid not in self._organizations:
+            self._organizations[uuid] = get_org_from_scantag(scan_tag)
+        return self._organizations[uuid]
+
+    def scanner(self, scan_tag, org: Organization) -> ScannerReference:
+        pk = scan_tag.scanner.pk
+        if pk not in self._scanners:
+            self._scanners[pk], _ = ScannerReference.objects.get_or_create(
+                scanner_pk=pk,
+                defaults={
+                    "scanner_name": scan_tag.scanner.name,
+                    "organization": org,
+                    "only_notify_superadmin": scan_tag.scanner.test,
+                }
+            )
+        return self._scanners[pk]
+
+    def report(self, scanner: ScannerReference, path) -> DocumentReport | None:
+        """Returns the locked DocumentReport for the given path under the given
+        ScannerReference, if there is one."""
+        try:
+            return self._reports.pop((scanner.pk, path))
+        except KeyError:
+            # The queryset is evaluated and locked here.
+            return DocumentReport.objects.select_for_update(
+                of=('self',)
+            ).filter(
+                path=path, scanner_job=scanner
+            ).order_by("-scan_time").first()
+
+    def prefetch(self, bodies: list[dict]):
+        """Locks and loads, in one query, the DocumentReports for every
+        object referred to by the given result bodies."""
+        paths = {}
+        for body in bodies:
+            tag, path = _identify_object(body)
+            if path and (org := self.organization(tag)):
+                paths.setdefault(self.scanner(tag, org).pk, set()).add(path)
+
+        if not paths:
+            return
+        query = Q()
+        for scanner_pk, scanner_paths in paths.items():
+            query |= Q(scanner_job_id=scanner_pk, path__in=scanner_paths)
+            self._reports.update(
+                    ((scanner_pk, path), None) for path in scanner_paths)
+        # (Locking the rows in a fixed order stops two collectors with
+        # overlapping batches from each waiting for a lock the other holds)
+        for dr in DocumentReport.objects.select_for_update(
+                of=('self',)).filter(query).order_by("pk"):
+            self._reports[(dr.scanner_job_id, dr.path)] = dr
+
+
+def result_messages_received_raw(bodies: list[dict]):
+    """Stores a batch of result bodies in a single transaction.
+
+    Looking up the Organization, ScannerReference and DocumentReport for each
+    result usually takes more queries than storing it does, so these lookups
+    are made once for the whole batch."""
+    with transaction.atomic():
+        batch = _ResultBatch()
+        batch.prefetch(bodies)
+        for body in bodies:
+            yield from result_message_received_raw(body, batch=batch)
+
+
+def result_message_received_raw(body, batch: _ResultBatch = None):
     """Method for restructuring and storing result body.
 
     The agreed structure is as follows:
@@ -73,11 +157,11 @@ def result_message_received_raw(body):
 
     with transaction.atomic():
         if queue == "matches":
-            handle_match_message(tag, body)
+            handle_match_message(tag, body, batch=batch)
         elif queue == "problem":
-            handle_problem_message(tag, body)
+            handle_problem_message(tag, body, batch=batch)
         elif queue == "metadata":
-            yield from handle_metadata_message(tag, body)
+            yield from handle_metadata_message(tag, body, batch=batch)
 
     yield from []
 
@@ -120,28 +204,21 @@ def outlook_categorize_enabled(owner: str) -> bool:
                         ).filter(num_categories__gte=2).exists()
 
 
-def handle_metadata_message(scan_tag, result):  # noqa: CCR001 too high cognitive complexity
+def handle_metadata_message(  # noqa: CCR001 too high cognitive complexity
+        scan_tag, result, batch: _ResultBatch = None):
+    batch = batch or _ResultBatch()
     message = messages.MetadataMessage.from_json_object(result)
     path = message.handle.crunch(hash=True)
     owner = owner_from_metadata(message)
 
-    org = get_org_from_scantag(scan_tag)
+    org = batch.organization(scan_tag)
     if not org:
         logger.warning("Received message without an organization. Discarding")
         return
 
-    scanner, _ = ScannerReference.objects.get_or_create(
-        scanner_pk=scan_tag.scanner.pk,
-        defaults={
-            "scanner_name": scan_tag.scanner.name,
-            "organization": org,
-            "only_notify_superadmin": scan_tag.scanner.test,
-        }
-    )
+    scanner = batch.scanner(scan_tag, org)
 
-    locked_qs = DocumentReport.objects.select_for_update(of=('self',))
-    # The queryset is evaluated and locked here.
-    previous_report = locked_qs.filter(path=path, scanner_job=scanner).first()
+    previous_report = batch.report(scanner, path)
 
     update_fields = {
         "scan_time": scan_tag.time,
@@ -262,7 +339,8 @@ def add_new_relations(aliases, new_objects, dr, tm):
             tm(documentreport_id=dr.pk, alias_id=alias.pk))
 
 
-def handle_match_message(scan_tag, result):  # noqa: CCR001, E501 too high cognitive complexity
+def handle_match_message(  # noqa: CCR001, E501 too high cognitive complexity
+        scan_tag, result, batch: _ResultBatch = None):
     """When we receive a match message we do one of 3 things.
     1. If there are neither old or new matches, we simply ignore the message.
     2. If the message contains matches,
@@ -272,26 +350,18 @@ def handle_match_message(scan_tag, result):  # noqa: CCR001, E501 too high cogni
     we update the scan time and withheld status.
     Then we mark it as handled, if the object has been changed since last scan.
     """
-    locked_qs = DocumentReport.objects.select_for_update(of=('self',))
+    batch = batch or _ResultBatch()
 
-    org = get_org_from_scantag(scan_tag)
+    org = batch.organization(scan_tag)
     if not org:
         logger.warning("Received message without an organization. Discarding")
         return None
 
-    scanner, _ = ScannerReference.objects.get_or_create(
-        scanner_pk=scan_tag.scanner.pk,
-        defaults={
-            "scanner_name": scan_tag.scanner.name,
-            "organization": org,
-            "only_notify_superadmin": scan_tag.scanner.test,
-        }
-    )
+    scanner = batch.scanner(scan_tag, org)
     message = messages.MatchesMessage.from_json_object(result)
     path = message.handle.crunch(hash=True)
 
-    # The queryset is evaluated and locked here.
-    previous_report = locked_qs.filter(path=path, scanner_job=scanner).first()
+    previous_report = batch.report(scanner, path)
 
     logger.debug(
         "new matchMsg",
@@ -421,8 +491,9 @@ def sort_matches_by_probability(body):
     return body
 
 
-def handle_problem_message(scan_tag, result):  # noqa: CCR001 too high cognitive complexity
-    locked_qs = DocumentReport.objects.select_for_update(of=('self',))
+def handle_problem_message(  # noqa: CCR001 too high cognitive complexity
+        scan_tag, result, batch: _ResultBatch = None):
+    batch = batch or _ResultBatch()
     obj: Handle | Source | None
     issue: messages.Issue
 
@@ -444,24 +515,14 @@ def handle_problem_message(scan_tag, result):  # noqa: CCR001 too high cognitive
 
     path = obj.crunch(hash=True) if obj else None
 
-    org = get_org_from_scantag(scan_tag)
+    org = batch.organization(scan_tag)
     if not org:
         logger.warning("Received message without an organization. Discarding")
         return None
 
-    scanner, _ = ScannerReference.objects.get_or_create(
-        scanner_pk=scan_tag.scanner.pk,
-        defaults={
-            "scanner_name": scan_tag.scanner.name,
-            "organization": org,
-            "only_notify_superadmin": scan_tag.scanner.test,
-        }
-    )
+    scanner = batch.scanner(scan_tag, org)
 
-    # Queryset is evaluated and locked here.
-    previous_report = (locked_qs.filter(
-            path=path, scanner_job=scanner).
-            order_by("-scan_time").first())
+    previous_report = batch.report(scanner, path)
 
     handle = issue.handle if issue.handle else None
     presentation = str(handle) if handle else "(source)"
@@ -566,6 +627,22 @@ def _identify_message(result):
         return None, None
 
 
+def _identify_object(result):
+    """Returns the scan tag of a result and the crunched path of the object
+    that it refers to, or (None, None) if either can't be determined."""
+    tag, _ = _identify_message(result)
+    reference = result.get("handle") or result.get("source")
+    if not tag or not reference:
+        return None, None
+    try:
+        obj = (Handle.from_json_object(reference) if result.get("handle")
+               else Source.from_json_object(reference))
+        return messages.ScanTagFragment.from_json_object(tag), obj.crunch(hash=True)
+    except (DeserialisationError, UnknownSchemeError):
+        # (The handler will deal with this result in the usual way)
+        return None, None
+
+
 def get_org_from_scantag(scan_tag):
     return Organization.objects.filter(uuid=scan_tag.organisation.uuid).first()
 
@@ -585,6 +662,13 @@ class ResultCollectorRunner(PikaPipelineThread):
                 with transaction.atomic():
                     yield from result_message_received_raw(body)
 
+    def handle_messages(self, deliveries):
+        with SUMMARY.time():
+            logger.debug("raw message batch received", size=len(deliveries))
+            yield from result_messages_received_raw(
+                    [body for routing_key, body in deliveries
+                     if routing_key == "os2ds_results"])
+
 
 class Command(BaseCommand):
     """Command for starting a result collector process."""
@@ -596,4 +680,5 @@ class Command(BaseCommand):
         ResultCollectorRunner(
             read=["os2ds_results"],
             write=["os2ds_email_tags"],
-            prefetch_count=8).run_consumer()
+            prefetch_count=max(8, settings.RESULT_COLLECTOR_BATCH_SIZE),
+            batch_size=settings.RESULT_COLLECTOR_BATCH_SIZE).run_consumer()
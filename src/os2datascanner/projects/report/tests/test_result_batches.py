@@ -0,0 +1,69 @@
+# Part of the OSdatascanner system, copyright © 2014-2026 Magenta ApS.
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, you can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from os2datascanner.engine2.model.file import FilesystemHandle
+from os2datascanner.engine2.pipeline import messages
+from ..reportapp.models.documentreport import DocumentReport
+from ..reportapp.management.commands import result_collector
+
+
+def match_body(match, handle):
+    return messages.replace(match, handle=handle).to_json_object() | {
+            "origin": "os2ds_matches"}
+
+
+def handles(common_handle, prefix, count):
+    return [FilesystemHandle(common_handle.source, f"{prefix}-{k}.txt")
+            for k in range(count)]
+
+
+def store(bodies):
+    return list(result_collector.result_messages_received_raw(bodies))
+
+
+@pytest.mark.django_db
+class TestResultBatches:
+    def test_batch(self, positive_match, common_handle):
+        bodies = [match_body(positive_match, h)
+                  for h in handles(common_handle, "batch", 5)]
+        # (A requeued result in the same batch should update, not duplicate)
+        store(bodies + bodies[:1])
+
+        assert DocumentReport.objects.count() == 5
+        assert all(dr.number_of_matches == 1
+                   for dr in DocumentReport.objects.all())
+
+    def test_same_object_twice(self, positive_match, scan_tag1, common_handle):
+        """Later results in a batch should see what earlier results for the
+        same object did."""
+        store([
+            match_body(positive_match, common_handle),
+            messages.ContentMissingMessage(
+                    scan_tag=scan_tag1,
+                    handle=common_handle).to_json_object() | {
+                    "origin": "os2ds_problems"},
+        ])
+
+        dr = DocumentReport.objects.get()
+        assert dr.resolution_status == (
+                DocumentReport.ResolutionChoices.REMOVED.value)
+
+    def test_fewer_queries(self, positive_match, common_handle):
+        with CaptureQueriesContext(connection) as one_by_one:
+            for h in handles(common_handle, "single", 10):
+                store([match_body(positive_match, h)])
+        with CaptureQueriesContext(connection) as batched:
+            store([match_body(positive_match, h)
+                   for h in handles(common_handle, "batch", 10)])
+
+        assert DocumentReport.objects.count() == 20
+        # (Each result should save at least its Organization and
+        # ScannerReference lookups)
+        assert len(one_by_one) - len(batched) >= 2 * 10
@@ -73,3 +73,4 @@ AMQP_PORT = _config['AMQP_PORT']
 AMQP_HEARTBEAT = _config['AMQP_HEARTBEAT']
 AMQP_VHOST = _config['AMQP_VHOST']
 AMQP_BACKOFF_PARAMS = _config.get('AMQP_BACKOFF_PARAMS', {})
+AMQP_CONTENT_ENCODING = _config.get('AMQP_CONTENT_ENCODING', "gzip")